@@ -0,0 +1,174 @@
+import math
+import time
+import asyncio
+import threading
+import contextvars
+from collections import Counter
+from contextlib import contextmanager, asynccontextmanager
+import metrics
+
+_deadline = contextvars.ContextVar("request_deadline", default=None)
+
+
+class Overloaded(Exception):
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(f"Server busy ({reason}), retry after {retry_after}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+
+# Request deadline shared by all stages of the current request (and threads it hands work to)
+@contextmanager
+def deadline(seconds: float = None):
+    token = _deadline.set(time.monotonic() + seconds if seconds else None)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining():
+    end = _deadline.get()
+    return None if end is None else end - time.monotonic()
+
+
+# Seconds a stage may take: its own budget, cut short by what is left of the request deadline
+def stage_budget(stage: str, budget: float = None):
+    left = remaining()
+    if left is not None and left <= 0:
+        metrics.inc("deadline_exceeded_total", stage=stage)
+        raise DeadlineExceeded(f"Request deadline exceeded before {stage}")
+    bounds = [b for b in (budget, left) if b is not None]
+    return min(bounds) if bounds else None
+
+
+class AdmissionController:
+    """Bounds concurrent chat requests: at most `max_active` run at once and up to `max_queue`
+    more wait for a slot for at most `queue_timeout` seconds. With `max_per_client` set, a
+    client's requests beyond that many running ones wait in the same queue until one of its
+    own finishes (0 = no per-client cap). Anything beyond the queue is rejected immediately
+    with `Overloaded`, whose `retry_after` estimates when a slot frees up from the average
+    time a request holds one.
+
+    `admit()` is for threaded servers and `admit_async()` for the event loop; a process
+    uses one or the other.
+    """
+
+    def __init__(self, max_active: int = 32, max_per_client: int = 0, max_queue: int = 64,
+                 queue_timeout: float = 10):
+        self.max_active = max_active
+        self.max_per_client = max_per_client
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.queued = 0
+        self.admitted = 0
+        self.rejected = Counter()
+        self._running = Counter()
+        self._hold_seconds = 1.0
+        self._cond = threading.Condition()
+        self._async_cond = None
+
+    def retry_after(self, reason: str):
+        waves = (self.queued + 1) / max(self.max_active, 1)
+        return max(1, math.ceil(self._hold_seconds * waves))
+
+    def _reject(self, reason: str):
+        self.rejected[reason] += 1
+        return Overloaded(reason, self.retry_after(reason))
+
+    def _enter(self, client: str):
+        if not self._has_slot(client) and self.queued >= self.max_queue:
+            raise self._reject("queue_full")
+        self.queued += 1
+
+    def _leave_queue(self, client: str, admitted: bool):
+        self.queued -= 1
+        if admitted:
+            self.active += 1
+            self.admitted += 1
+            self._running[client] += 1
+
+    def _exit(self, client: str, held: float):
+        self.active -= 1
+        self._running[client] -= 1
+        if self._running[client] <= 0:
+            del self._running[client]
+        self._hold_seconds = 0.9 * self._hold_seconds + 0.1 * held
+
+    def _has_slot(self, client: str):
+        return self.active < self.max_active and not (
+            self.max_per_client and self._running[client] >= self.max_per_client)
+
+    def acquire(self, client: str):
+        started = time.monotonic()
+        with self._cond:
+            self._enter(client)
+            admitted = self._cond.wait_for(lambda: self._has_slot(client), timeout=self.queue_timeout)
+            self._leave_queue(client, admitted)
+            if not admitted:
+                raise self._reject("queue_timeout")
+        metrics.observe("admission_wait_seconds", time.monotonic() - started)
+        return client, time.monotonic()
+
+    def release(self, ticket):
+        client, admitted_at = ticket
+        with self._cond:
+            self._exit(client, time.monotonic() - admitted_at)
+            # Waiters held back by their per-client cap cannot take this slot, so wake them all
+            self._cond.notify_all()
+
+    @contextmanager
+    def admit(self, client: str):
+        ticket = self.acquire(client)
+        try:
+            yield
+        finally:
+            self.release(ticket)
+
+    async def acquire_async(self, client: str):
+        if self._async_cond is None:
+            self._async_cond = asyncio.Condition()
+        started = time.monotonic()
+        async with self._async_cond:
+            self._enter(client)
+            try:
+                await asyncio.wait_for(self._async_cond.wait_for(lambda: self._has_slot(client)),
+                                       self.queue_timeout)
+                admitted = True
+            except asyncio.TimeoutError:
+                admitted = False
+            except BaseException:
+                self._leave_queue(client, False)
+                raise
+            self._leave_queue(client, admitted)
+            if not admitted:
+                raise self._reject("queue_timeout")
+        metrics.observe("admission_wait_seconds", time.monotonic() - started)
+        return client, time.monotonic()
+
+    async def release_async(self, ticket):
+        client, admitted_at = ticket
+        async with self._async_cond:
+            self._exit(client, time.monotonic() - admitted_at)
+            self._async_cond.notify_all()
+
+    @asynccontextmanager
+    async def admit_async(self, client: str):
+        ticket = await self.acquire_async(client)
+        try:
+            yield
+        finally:
+            await self.release_async(ticket)
+
+    def collect(self):
+        return [
+            ("admission_active", "gauge", {}, self.active),
+            ("admission_queued", "gauge", {}, self.queued),
+            ("admission_admitted_total", "counter", {}, self.admitted),
+        ] + [("admission_rejected_total", "counter", {"reason": reason}, count)
+             for reason, count in sorted(self.rejected.items())]
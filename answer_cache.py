@@ -0,0 +1,247 @@
+import os
+import re
+import json
+import time
+import atexit
+import asyncio
+import tempfile
+import threading
+from collections import OrderedDict
+import numpy as np
+
+
+def normalize_query(query: str) -> str:
+    query = query.replace("I", "ı").replace("İ", "i").lower()
+    query = re.sub(r"[^\w\s]", " ", query)
+    return " ".join(query.split())
+
+
+class _InFlight:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class AnswerCache:
+    def __init__(self, max_size: int = 512, ttl: float = 3600, similarity_threshold: float = 0.95,
+                 persist_path: str = None, index_version: str = None, save_delay: float = 5.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self.persist_path = persist_path
+        self.save_delay = save_delay
+        self.index_version = index_version
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._in_flight = {}
+        self._async_in_flight = {}
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._save_timer = None
+        self._save_pid = None
+        if persist_path:
+            self.load()
+            atexit.register(self.save)
+
+    def _key(self, query: str, top_k: int, scope: str = ""):
+        return f"{top_k}:{scope}:{normalize_query(query)}"
+
+    def _expired(self, entry, now):
+        return self.ttl is not None and now - entry["created"] > self.ttl
+
+    def _evict(self, now):
+        for key in [k for k, e in self._entries.items() if self._expired(e, now)]:
+            del self._entries[key]
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def set_index_version(self, index_version: str):
+        with self._lock:
+            if index_version == self.index_version:
+                return
+            self._entries.clear()
+            self.index_version = index_version
+        self._schedule_save()
+
+    # `scope` separates answers computed under different retrieval filters
+    def get(self, query: str, top_k: int, embedding=None, scope: str = ""):
+        now = time.time()
+        key = self._key(query, top_k, scope)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and not self._expired(entry, now):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry["response"], entry["sources"]
+
+            if embedding is not None and self.similarity_threshold is not None:
+                match = self._nearest(embedding, top_k, scope, now)
+                if match is not None:
+                    self._entries.move_to_end(match)
+                    self.near_hits += 1
+                    entry = self._entries[match]
+                    return entry["response"], entry["sources"]
+
+            self.misses += 1
+            return None
+
+    def _nearest(self, embedding, top_k, scope, now):
+        candidates = [(k, e) for k, e in self._entries.items()
+                      if e["top_k"] == top_k and e.get("scope", "") == scope
+                      and e["embedding"] is not None and not self._expired(e, now)]
+        if not candidates:
+            return None
+
+        query = np.asarray(embedding, dtype=np.float32)
+        matrix = np.asarray([e["embedding"] for _, e in candidates], dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(query)
+        scores = matrix @ query / np.maximum(norms, 1e-12)
+        best = int(np.argmax(scores))
+        if scores[best] >= self.similarity_threshold:
+            return candidates[best][0]
+        return None
+
+    def put(self, query: str, top_k: int, response, sources, embedding=None, scope: str = ""):
+        now = time.time()
+        with self._lock:
+            self._entries[self._key(query, top_k, scope)] = {
+                "top_k": top_k,
+                "scope": scope,
+                "response": response,
+                "sources": sources,
+                "embedding": None if embedding is None else [float(x) for x in embedding],
+                "created": now,
+            }
+            self._evict(now)
+        self._schedule_save()
+
+    # Concurrent callers with the same normalized query wait for the first one's result
+    # instead of each running retrieval + generation.
+    def get_or_compute(self, query: str, top_k: int, compute, embedding=None, scope: str = ""):
+        cached = self.get(query, top_k, embedding, scope)
+        if cached is not None:
+            return cached
+
+        key = self._key(query, top_k, scope)
+        with self._lock:
+            flight = self._in_flight.get(key)
+            owner = flight is None
+            if owner:
+                flight = self._in_flight[key] = _InFlight()
+
+        if not owner:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = compute()
+            self.put(query, top_k, *flight.result, embedding=embedding, scope=scope)
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            flight.event.set()
+
+    async def get_or_compute_async(self, query: str, top_k: int, compute, embedding=None, scope: str = ""):
+        cached = self.get(query, top_k, embedding, scope)
+        if cached is not None:
+            return cached
+
+        key = self._key(query, top_k, scope)
+        flight = self._async_in_flight.get(key)
+        if flight is not None:
+            return await asyncio.shield(flight)
+
+        flight = self._async_in_flight[key] = asyncio.get_running_loop().create_future()
+        try:
+            result = await compute()
+            self.put(query, top_k, *result, embedding=embedding, scope=scope)
+            flight.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            flight.cancel()
+            raise
+        except Exception as e:
+            flight.set_exception(e)
+            # Mark the exception as retrieved when nobody else was waiting on it
+            flight.exception()
+            raise
+        finally:
+            del self._async_in_flight[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        self._schedule_save()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "near_hits": self.near_hits,
+                "misses": self.misses,
+            }
+
+    # Changes are written `save_delay` seconds later in a background timer, so a burst of puts
+    # costs one write and requests never wait on the disk. save() also runs at exit.
+    def _schedule_save(self):
+        if not self.persist_path:
+            return
+        with self._lock:
+            # A timer scheduled before a fork doesn't run in the child
+            if self._save_timer is not None and self._save_pid == os.getpid():
+                return
+            self._save_pid = os.getpid()
+            self._save_timer = threading.Timer(self.save_delay, self.save)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
+    def save(self):
+        if not self.persist_path:
+            return
+        with self._lock:
+            self._save_timer = None
+            payload = {"index_version": self.index_version, "entries": list(self._entries.items())}
+        directory = os.path.dirname(os.path.abspath(self.persist_path))
+        tmp_path = None
+        try:
+            with self._save_lock:
+                with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=directory, suffix=".tmp",
+                                                 delete=False) as f:
+                    tmp_path = f.name
+                    json.dump(payload, f, ensure_ascii=False)
+                os.replace(tmp_path, self.persist_path)
+                tmp_path = None
+        except (OSError, TypeError, ValueError) as e:
+            print(f"[!] Could not save answer cache {self.persist_path}: {e}")
+        finally:
+            if tmp_path is not None:
+                try:
+                    os.unlink(tmp_path)
+                except OSError:
+                    pass
+
+    def load(self):
+        if not os.path.exists(self.persist_path):
+            return
+        try:
+            with open(self.persist_path, "r", encoding="utf-8") as f:
+                payload = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"[!] Ignoring unreadable answer cache {self.persist_path}: {e}")
+            return
+        if self.index_version is not None and payload.get("index_version") != self.index_version:
+            return
+        now = time.time()
+        with self._lock:
+            self._entries = OrderedDict(payload.get("entries", []))
+            self._evict(now)
@@ -1,28 +1,99 @@
 import os
-from flask import Flask, render_template, request, jsonify
+import json
+from flask import Flask, Response, render_template, request, jsonify, stream_with_context
 from flask_cors import CORS
-from rag_pipeline import respond_with_sources, document_store
+import metrics
+import admission
+import rag_pipeline
+from rag_pipeline import respond_with_sources, stream_with_sources, corpus_catalog
+from query_filters import request_episodes
+from batch_qa import BATCH_MAX_QUESTIONS, answer_batch, normalize_items
 
 app = Flask(__name__)
 CORS(app)
 
-GUEST_IMAGES = {
-    1: {"name": "Kaan Bıçakçı", "image": "kaan_bicakci.jpg"},
-    2: {"name": "Bilge Yücel", "image": "bilge_yucel.jpg"},
-    3: {"name": "Alara Dirik", "image": "alara_dirik.jpg"},
-    4: {"name": "Olgun Aydın", "image": "olgun_aydin.jpg"},
-    5: {"name": "Eren Akbaba", "image": "eren_akbaba.jpg"},
-    6: {"name": "Taner Sekmen", "image": "taner_sekmen.jpg"},
-    7: {"name": "Murat Şahin", "image": "murat_sahin.jpg"},
-    8: {"name": "Göker Güner", "image": "goker_guner.jpg"},
-}
-
+# With gunicorn --preload, load the model and indexes once in the master before forking workers
+if os.environ.get("RAG_PRELOAD") == "1":
+    rag_pipeline.preload()
 
 @app.route("/")
 def index():
     return render_template("index.html")
 
 
+def attach_images(sources):
+    episodes = corpus_catalog.get().by_episode
+    sources_with_images = []
+    for src in sources:
+        ep = src["episode"]
+        sources_with_images.append({
+            "episode": ep,
+            "guest": src["guest"],
+            "image": episodes.get(ep, {}).get("image", "default.jpg"),
+            "score": src["score"]
+        })
+    return sources_with_images
+
+
+# 304 when the client already has this ETag; otherwise the payload with the ETag to revalidate
+def conditional(req, payload, etag):
+    headers = {"ETag": f'"{etag}"', "Cache-Control": "no-cache"}
+    if req.if_none_match.contains_weak(etag):
+        return "", 304, headers
+    return payload, 200, headers
+
+
+# /api/status without touching Chroma: counts come from the catalog. `count_documents` is only
+# called for an index built before catalogs existed.
+def status_payload(ready: bool, count_documents=None):
+    catalog = corpus_catalog.get()
+    if not ready:
+        state, documents = "starting", 0
+    else:
+        state = "ok"
+        documents = catalog.data["documents"] if catalog.version is not None else count_documents()
+    payload = {
+        "status": state,
+        "documents": documents,
+        "index_version": catalog.version,
+        "guests": [{"name": ep["guest"], "image": ep["image"]} for ep in catalog.episodes]
+    }
+    return payload, f"{catalog.etag}-{state}-{documents}"
+
+
+def episodes_payload():
+    catalog = corpus_catalog.get()
+    return {"index_version": catalog.version, "documents": catalog.data["documents"],
+            "words": catalog.data["words"], "episodes": catalog.episodes}, catalog.etag
+
+
+# Clients opt into conversation sessions by sending "session_id" (null on the first turn)
+# and echoing back the id returned with each answer
+def request_session(data):
+    if "session_id" not in data:
+        return None
+    return rag_pipeline.conversations.get_or_create(data.get("session_id"))
+
+
+# Admission limits are per client address. Behind a trusted reverse proxy, set
+# TRUST_FORWARDED_FOR=1 to use the first X-Forwarded-For address instead.
+TRUST_FORWARDED_FOR = os.getenv("TRUST_FORWARDED_FOR", "0") == "1"
+
+
+def request_client(req):
+    forwarded = req.headers.get("X-Forwarded-For") if TRUST_FORWARDED_FOR else None
+    return forwarded.split(",")[0].strip() if forwarded else (req.remote_addr or "unknown")
+
+
+def overloaded(e):
+    return {"error": "Server busy, please retry", "retry_after": e.retry_after}, 429, \
+        {"Retry-After": str(e.retry_after)}
+
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
 @app.route("/api/chat", methods=["POST"])
 def chat():
     data = request.json
@@ -31,37 +102,157 @@ def chat():
     if not query.strip():
         return jsonify({"error": "Empty query"}), 400
     
-    response, sources = respond_with_sources(query, top_k=5)
+    try:
+        episodes = request_episodes(data, query)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     
-    sources_with_images = []
-    for src in sources:
-        ep = src["episode"]
-        guest_info = GUEST_IMAGES.get(ep, {"name": src["guest"], "image": "default.jpg"})
-        sources_with_images.append({
-            "episode": ep,
-            "guest": src["guest"],
-            "image": guest_info["image"],
-            "score": src["score"]
-        })
+    session = request_session(data)
+    metrics.begin_request()
+    try:
+        with rag_pipeline.chat_admission.admit(request_client(request)):
+            with admission.deadline(rag_pipeline.REQUEST_DEADLINE), metrics.timed("request"):
+                response, sources = respond_with_sources(query, top_k=5, episodes=episodes, session=session)
+    except admission.Overloaded as e:
+        return overloaded(e)
+    except admission.DeadlineExceeded as e:
+        return jsonify({"error": str(e)}), 504
     
-    return jsonify({
+    resp = jsonify({
         "response": response,
-        "sources": sources_with_images
+        "sources": attach_images(sources),
+        "episodes": episodes,
+        "session_id": session.id if session else None,
+        "usage": metrics.request_usage()
     })
+    timing = metrics.server_timing()
+    if timing:
+        resp.headers["Server-Timing"] = timing
+    return resp
+
+
+@app.route("/api/chat/stream", methods=["POST"])
+def chat_stream():
+    data = request.json
+    query = data.get("query", "")
+    
+    if not query.strip():
+        return jsonify({"error": "Empty query"}), 400
+    
+    try:
+        episodes = request_episodes(data, query)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    session = request_session(data)
+    try:
+        ticket = rag_pipeline.chat_admission.acquire(request_client(request))
+    except admission.Overloaded as e:
+        return overloaded(e)
+    
+    def generate():
+        metrics.begin_request()
+        try:
+            with admission.deadline(rag_pipeline.REQUEST_DEADLINE):
+                yield sse_event("filters", {"episodes": episodes})
+                if session is not None:
+                    yield sse_event("session", {"session_id": session.id})
+                for kind, payload in stream_with_sources(query, top_k=5, episodes=episodes, session=session):
+                    if kind == "sources":
+                        yield sse_event("sources", attach_images(payload))
+                    else:
+                        yield sse_event("token", payload)
+            yield sse_event("done", {"usage": metrics.request_usage()})
+        except Exception as e:
+            yield sse_event("error", {"error": str(e)})
+    
+    response = Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+    # The slot is held until the stream ends or the client goes away
+    response.call_on_close(lambda: rag_pipeline.chat_admission.release(ticket))
+    return response
+
+
+# Body: {"questions": [...]} with strings or {"query", "id", "episode(s)", "guest(s)"} objects.
+# Streams one JSON line per question, in completion order, each tagged with its "id".
+@app.route("/api/chat/batch", methods=["POST"])
+def chat_batch():
+    data = request.json or {}
+    try:
+        items = normalize_items(data.get("questions") or [])
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    if not items:
+        return jsonify({"error": "No questions"}), 400
+    if len(items) > BATCH_MAX_QUESTIONS:
+        return jsonify({"error": f"At most {BATCH_MAX_QUESTIONS} questions per batch"}), 400
+    
+    # The batch's own slot covers retrieval and rejects early when the server is full. It is
+    # handed back before generation, where each question in flight takes a slot of its own, so
+    # the batch never counts against its own per-client cap.
+    client = request_client(request)
+    try:
+        held = [rag_pipeline.chat_admission.acquire(client)]
+    except admission.Overloaded as e:
+        return overloaded(e)
+    
+    def release_batch_slot():
+        try:
+            ticket = held.pop()
+        except IndexError:
+            return
+        rag_pipeline.chat_admission.release(ticket)
+    
+    def generate():
+        for result in answer_batch(items, top_k=5, admit=lambda: rag_pipeline.chat_admission.admit(client),
+                                   on_prepared=release_batch_slot):
+            if "sources" in result:
+                result["sources"] = attach_images(result["sources"])
+            yield json.dumps(result, ensure_ascii=False) + "\n"
+    
+    response = Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+    response.call_on_close(release_batch_slot)
+    return response
 
 
 @app.route("/api/status")
 def status():
-    doc_count = document_store.count_documents()
-    return jsonify({
-        "status": "ok",
-        "documents": doc_count,
-        "guests": list(GUEST_IMAGES.values())
-    })
+    ready = rag_pipeline.is_ready()
+    if not ready:
+        rag_pipeline.init_in_background()
+    payload, etag = status_payload(ready, rag_pipeline.count_documents)
+    return conditional(request, payload, etag)
+
+
+@app.route("/api/episodes")
+def episodes():
+    payload, etag = episodes_payload()
+    return conditional(request, payload, etag)
+
+
+@app.route("/api/ready")
+def ready():
+    if rag_pipeline.is_ready():
+        return jsonify({"ready": True})
+    
+    rag_pipeline.init_in_background()
+    error = rag_pipeline.init_error
+    return jsonify({"ready": False, "error": str(error) if error else None}), 503
+
+
+@app.route("/api/metrics")
+def prometheus_metrics():
+    if not metrics.METRICS_ENABLED:
+        return jsonify({"error": "Metrics are disabled"}), 404
+    return Response(metrics.render_prometheus(), mimetype="text/plain; version=0.0.4")
 
 
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 5000))
-    print(f"Documents loaded: {document_store.count_documents()}")
+    print(f"Documents loaded: {rag_pipeline.count_documents()}")
     print(f"Starting server on port {port}")
     app.run(host="0.0.0.0", port=port, debug=False)
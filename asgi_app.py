@@ -0,0 +1,193 @@
+import os
+import json
+from quart import Quart, Response, render_template, request, jsonify
+from quart_cors import cors
+from app import (attach_images, conditional, corpus_catalog, episodes_payload, overloaded, request_client,
+                 request_session, sse_event, status_payload)
+from query_filters import request_episodes
+from batch_qa import BATCH_MAX_QUESTIONS, answer_batch_async, normalize_items
+import metrics
+import admission
+import rag_pipeline
+from rag_pipeline import respond_with_sources_async, stream_with_sources_async, run_in_cpu_pool
+
+# Async counterpart of app.py, served by an ASGI server:
+#   hypercorn asgi_app:app --bind 0.0.0.0:5000
+app = cors(Quart(__name__), allow_origin="*")
+
+
+@app.route("/")
+async def index():
+    return await render_template("index.html")
+
+
+@app.route("/api/chat", methods=["POST"])
+async def chat():
+    data = await request.get_json()
+    query = data.get("query", "")
+
+    if not query.strip():
+        return jsonify({"error": "Empty query"}), 400
+
+    try:
+        episodes = request_episodes(data, query)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    session = request_session(data)
+    metrics.begin_request()
+    try:
+        async with rag_pipeline.chat_admission.admit_async(request_client(request)):
+            with admission.deadline(rag_pipeline.REQUEST_DEADLINE), metrics.timed("request"):
+                response, sources = await respond_with_sources_async(query, top_k=5, episodes=episodes,
+                                                                     session=session)
+    except admission.Overloaded as e:
+        return overloaded(e)
+    except admission.DeadlineExceeded as e:
+        return jsonify({"error": str(e)}), 504
+
+    resp = jsonify({
+        "response": response,
+        "sources": attach_images(sources),
+        "episodes": episodes,
+        "session_id": session.id if session else None,
+        "usage": metrics.request_usage()
+    })
+    timing = metrics.server_timing()
+    if timing:
+        resp.headers["Server-Timing"] = timing
+    return resp
+
+
+@app.route("/api/chat/stream", methods=["POST"])
+async def chat_stream():
+    data = await request.get_json()
+    query = data.get("query", "")
+
+    if not query.strip():
+        return jsonify({"error": "Empty query"}), 400
+
+    try:
+        episodes = request_episodes(data, query)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    session = request_session(data)
+    try:
+        ticket = await rag_pipeline.chat_admission.acquire_async(request_client(request))
+    except admission.Overloaded as e:
+        return overloaded(e)
+
+    async def generate():
+        metrics.begin_request()
+        try:
+            with admission.deadline(rag_pipeline.REQUEST_DEADLINE):
+                yield sse_event("filters", {"episodes": episodes})
+                if session is not None:
+                    yield sse_event("session", {"session_id": session.id})
+                async for kind, payload in stream_with_sources_async(query, top_k=5, episodes=episodes,
+                                                                     session=session):
+                    if kind == "sources":
+                        yield sse_event("sources", attach_images(payload))
+                    else:
+                        yield sse_event("token", payload)
+            yield sse_event("done", {"usage": metrics.request_usage()})
+        except Exception as e:
+            yield sse_event("error", {"error": str(e)})
+        finally:
+            await rag_pipeline.chat_admission.release_async(ticket)
+
+    response = await app.make_response((generate(), {
+        "Content-Type": "text/event-stream",
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    }))
+    response.timeout = None
+    return response
+
+
+@app.route("/api/chat/batch", methods=["POST"])
+async def chat_batch():
+    data = await request.get_json() or {}
+    try:
+        items = normalize_items(data.get("questions") or [])
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if not items:
+        return jsonify({"error": "No questions"}), 400
+    if len(items) > BATCH_MAX_QUESTIONS:
+        return jsonify({"error": f"At most {BATCH_MAX_QUESTIONS} questions per batch"}), 400
+
+    # Same slot accounting as app.py: the batch's slot covers retrieval only, then each
+    # question in flight holds one
+    client = request_client(request)
+    try:
+        held = [await rag_pipeline.chat_admission.acquire_async(client)]
+    except admission.Overloaded as e:
+        return overloaded(e)
+
+    async def release_batch_slot():
+        if held:
+            await rag_pipeline.chat_admission.release_async(held.pop())
+
+    async def generate():
+        try:
+            async for result in answer_batch_async(
+                    items, top_k=5, admit=lambda: rag_pipeline.chat_admission.admit_async(client),
+                    on_prepared=release_batch_slot):
+                if "sources" in result:
+                    result["sources"] = attach_images(result["sources"])
+                yield json.dumps(result, ensure_ascii=False) + "\n"
+        finally:
+            await release_batch_slot()
+
+    response = await app.make_response((generate(), {"Content-Type": "application/x-ndjson"}))
+    response.timeout = None
+    return response
+
+
+@app.before_serving
+async def start_pipeline():
+    rag_pipeline.init_in_background()
+
+
+@app.route("/api/status")
+async def status():
+    ready = rag_pipeline.is_ready()
+    # Only an index without a catalog still needs the (blocking) document count
+    if ready and corpus_catalog.get().version is None:
+        documents = await run_in_cpu_pool(rag_pipeline.count_documents)
+        payload, etag = status_payload(ready, lambda: documents)
+    else:
+        payload, etag = status_payload(ready)
+    return conditional(request, payload, etag)
+
+
+@app.route("/api/episodes")
+async def episodes():
+    payload, etag = episodes_payload()
+    return conditional(request, payload, etag)
+
+
+@app.route("/api/ready")
+async def ready():
+    if rag_pipeline.is_ready():
+        return jsonify({"ready": True})
+
+    rag_pipeline.init_in_background()
+    error = rag_pipeline.init_error
+    return jsonify({"ready": False, "error": str(error) if error else None}), 503
+
+
+@app.route("/api/metrics")
+async def prometheus_metrics():
+    if not metrics.METRICS_ENABLED:
+        return jsonify({"error": "Metrics are disabled"}), 404
+    return Response(metrics.render_prometheus(), mimetype="text/plain; version=0.0.4")
+
+
+if __name__ == "__main__":
+    port = int(os.environ.get("PORT", 5000))
+    print(f"Starting async server on port {port}")
+    app.run(host="0.0.0.0", port=port, debug=False)
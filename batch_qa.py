@@ -0,0 +1,222 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import argparse
+from contextlib import nullcontext, asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import metrics
+import rag_pipeline
+from rag_pipeline import embed_queries, retrieve_batch, assemble_context, build_prompt, collect_sources, run_in_cpu_pool
+from query_filters import request_episodes, build_filters
+from rate_limit import RateLimiter
+
+# Generation limits for batch runs: Gemini calls in flight, and calls started per minute
+# (0 = no rate limit)
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", 8))
+BATCH_RATE_PER_MINUTE = float(os.getenv("BATCH_RATE_PER_MINUTE", 0))
+BATCH_MAX_QUESTIONS = 500
+
+
+def question_id(item):
+    key = json.dumps([item["query"], item.get("episodes"), item.get("episode"), item.get("guests"),
+                      item.get("guest")], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:12]
+
+
+# Accepts plain strings or {"query" | "question", "id", "episode(s)", "guest(s)"} objects.
+# Questions without an id get one derived from their text and filters, so it is stable across runs.
+def normalize_items(raw_items):
+    items = []
+    for raw in raw_items:
+        item = {"query": raw} if isinstance(raw, str) else dict(raw)
+        query = item.get("query") or item.pop("question", None)
+        if not isinstance(query, str) or not query.strip():
+            raise ValueError(f"Question without text: {raw!r}")
+        item["query"] = query
+        item["id"] = str(item["id"]) if item.get("id") is not None else question_id(item)
+        items.append(item)
+    return items
+
+
+def load_questions(path):
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            raw = [json.loads(line) for line in f if line.strip()]
+        elif path.endswith(".json"):
+            raw = json.load(f)
+        else:
+            raw = [line.strip() for line in f if line.strip()]
+    return normalize_items(raw)
+
+
+# Embeds every question in one batched encode and retrieves for all of them at once. Returns
+# the generation jobs plus results for questions that failed before generation.
+def prepare(items, top_k: int = 5):
+    rag_pipeline.init()
+    jobs, failed = [], []
+    for item in items:
+        try:
+            episodes = request_episodes(item, item["query"])
+        except ValueError as e:
+            failed.append({"id": item["id"], "query": item["query"], "error": str(e)})
+            continue
+        jobs.append({"item": item, "episodes": episodes})
+    if not jobs:
+        return jobs, failed
+
+    queries = [job["item"]["query"] for job in jobs]
+    embeddings = embed_queries(queries)
+    docs = retrieve_batch(queries, top_k=top_k, embeddings=embeddings,
+                          filters=[build_filters(job["episodes"]) for job in jobs])
+    for job, job_docs in zip(jobs, docs):
+        context = assemble_context(job_docs)
+        job["sources"] = collect_sources(context)
+        job["prompt"] = build_prompt(job["item"]["query"], context)
+    return jobs, failed
+
+
+def _result(job, response=None, error=None, started=None):
+    result = {"id": job["item"]["id"], "query": job["item"]["query"], "episodes": job["episodes"],
+              "sources": job["sources"]}
+    if error is None:
+        result["response"] = response
+    else:
+        result["error"] = error
+    if started is not None:
+        result["llm_seconds"] = round(time.perf_counter() - started, 3)
+    return result
+
+
+# Yields one result dict per question as soon as its answer arrives (completion order).
+# `admit`, when given, returns a context manager held around each question's Gemini call (the
+# servers pass an admission slot); a question that is not admitted gets an error result.
+# `on_prepared` is called once retrieval is done, before the first Gemini call.
+# Closing the generator early drops the questions that have not started yet.
+def answer_batch(items, top_k: int = 5, concurrency: int = BATCH_CONCURRENCY,
+                 rate_per_minute: float = BATCH_RATE_PER_MINUTE, llm=None, admit=None, on_prepared=None):
+    llm = llm or rag_pipeline.generator
+    jobs, failed = prepare(items, top_k)
+    if on_prepared is not None:
+        on_prepared()
+    yield from failed
+    limiter = RateLimiter.per_minute(rate_per_minute)
+
+    def generate(job):
+        limiter.acquire()
+        started = time.perf_counter()
+        try:
+            with admit() if admit else nullcontext():
+                with metrics.timed("llm"):
+                    return _result(job, llm.run(parts=job["prompt"])["replies"][0], started=started)
+        except Exception as e:
+            return _result(job, error=str(e), started=started)
+
+    pool = ThreadPoolExecutor(max_workers=max(concurrency, 1), thread_name_prefix="batch-llm")
+    try:
+        for future in as_completed([pool.submit(generate, job) for job in jobs]):
+            yield future.result()
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+@asynccontextmanager
+async def _no_admission():
+    yield
+
+
+async def answer_batch_async(items, top_k: int = 5, concurrency: int = BATCH_CONCURRENCY,
+                             rate_per_minute: float = BATCH_RATE_PER_MINUTE, llm=None, admit=None,
+                             on_prepared=None):
+    await run_in_cpu_pool(rag_pipeline.init)
+    llm = llm or rag_pipeline.generator
+    jobs, failed = await run_in_cpu_pool(prepare, items, top_k)
+    if on_prepared is not None:
+        await on_prepared()
+    for result in failed:
+        yield result
+    limiter = RateLimiter.per_minute(rate_per_minute)
+    semaphore = asyncio.Semaphore(max(concurrency, 1))
+
+    async def generate(job):
+        async with semaphore:
+            await limiter.acquire_async()
+            started = time.perf_counter()
+            try:
+                async with admit() if admit else _no_admission():
+                    async with rag_pipeline.llm_semaphore:
+                        with metrics.timed("llm"):
+                            response = (await llm.run_async(parts=job["prompt"]))["replies"][0]
+                return _result(job, response, started=started)
+            except Exception as e:
+                return _result(job, error=str(e), started=started)
+
+    tasks = [asyncio.ensure_future(generate(job)) for job in jobs]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+# IDs already answered in an earlier (possibly interrupted) run; failed lines are retried
+def completed_ids(path):
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except ValueError:
+                continue  # line cut short by a crash
+            if "error" not in result:
+                done.add(result["id"])
+    return done
+
+
+def run_file(input_path, output_path, top_k=5, concurrency=BATCH_CONCURRENCY,
+             rate_per_minute=BATCH_RATE_PER_MINUTE):
+    items = load_questions(input_path)
+    done = completed_ids(output_path)
+    pending = [item for item in items if item["id"] not in done]
+    print(f"[*] {len(items)} questions, {len(items) - len(pending)} already answered, {len(pending)} to go")
+    if not pending:
+        return
+
+    if os.path.dirname(output_path):
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    with open(output_path, "a+", encoding="utf-8") as out:
+        # Terminate a partial last line so the next result starts on its own line
+        if out.tell() > 0:
+            out.seek(out.tell() - 1)
+            if out.read(1) != "\n":
+                out.write("\n")
+        answered = errors = 0
+        started = time.perf_counter()
+        for result in answer_batch(pending, top_k=top_k, concurrency=concurrency, rate_per_minute=rate_per_minute):
+            out.write(json.dumps(result, ensure_ascii=False) + "\n")
+            out.flush()
+            errors += "error" in result
+            answered += 1
+            print(f"    [{answered}/{len(pending)}] {result['id']} {'ERROR ' + result['error'] if 'error' in result else 'ok'}")
+    elapsed = time.perf_counter() - started
+    print(f"[✓] {answered - errors} answered, {errors} failed in {elapsed:.1f}s -> {output_path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Answer a file of questions in batch, resumable")
+    parser.add_argument("input", help=".txt (one question per line), .json list or .jsonl of questions")
+    parser.add_argument("output", help="JSONL results; existing answers in it are skipped")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY)
+    parser.add_argument("--rate", type=float, default=BATCH_RATE_PER_MINUTE,
+                        help="max Gemini calls started per minute (0 = unlimited)")
+    args = parser.parse_args()
+    run_file(args.input, args.output, args.top_k, args.concurrency, args.rate)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+import time
+import threading
+from collections import OrderedDict
+from typing import List
+from haystack import component
+from haystack.components.embedders import SentenceTransformersTextEmbedder
+
+
+class _Pending:
+    def __init__(self, text: str):
+        self.text = text
+        self.event = threading.Event()
+        self.embedding = None
+        self.error = None
+
+
+@component
+class BatchingTextEmbedder:
+    """Drop-in wrapper for SentenceTransformersTextEmbedder.
+
+    Embeddings are memoized by whitespace-normalized text in a bounded LRU, and
+    concurrent cache misses arriving within `batch_window_ms` are encoded together
+    in one forward pass instead of one batch-of-one pass per request thread.
+    """
+
+    def __init__(self, embedder: SentenceTransformersTextEmbedder, cache_size: int = 1024,
+                 batch_window_ms: float = 5, max_batch_size: int = 32):
+        self.embedder = embedder
+        self.cache_size = cache_size
+        self.batch_window = batch_window_ms / 1000
+        self.max_batch_size = max_batch_size
+        self.hits = 0
+        self.misses = 0
+        self.batches = 0
+        self._cache = OrderedDict()
+        self._pending = []
+        self._collecting = False
+        self._lock = threading.Lock()
+
+    def warm_up(self):
+        self.embedder.warm_up()
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        return " ".join(text.split())
+
+    def _cache_get(self, key):
+        with self._lock:
+            embedding = self._cache.get(key)
+            if embedding is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+            return embedding
+
+    def _cache_put(self, key, embedding):
+        self._cache[key] = embedding
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def _encode(self, texts: List[str]):
+        e = self.embedder
+        if getattr(e, "embedding_backend", None) is None:
+            e.warm_up()
+        return e.embedding_backend.embed(
+            [e.prefix + text + e.suffix for text in texts],
+            batch_size=e.batch_size,
+            show_progress_bar=False,
+            normalize_embeddings=e.normalize_embeddings,
+            precision=e.precision,
+            **(e.encode_kwargs or {})
+        )
+
+    def _flush(self):
+        with self._lock:
+            batch = self._pending[:self.max_batch_size]
+            self._pending = self._pending[self.max_batch_size:]
+            self._collecting = more = bool(self._pending)
+
+        texts = list(dict.fromkeys(p.text for p in batch))
+        try:
+            embeddings = dict(zip(texts, self._encode(texts)))
+            with self._lock:
+                self.batches += 1
+                for text, embedding in embeddings.items():
+                    self._cache_put(text, embedding)
+            for p in batch:
+                p.embedding = embeddings[p.text]
+        except Exception as err:
+            for p in batch:
+                p.error = err
+        finally:
+            for p in batch:
+                p.event.set()
+
+        # Requests that queued up past max_batch_size get their own flush
+        if more:
+            self._flush()
+
+    def embed(self, text: str):
+        key = self.normalize(text)
+        embedding = self._cache_get(key)
+        if embedding is not None:
+            return embedding
+
+        pending = _Pending(key)
+        with self._lock:
+            self._pending.append(pending)
+            leader = not self._collecting
+            self._collecting = True
+
+        if leader:
+            time.sleep(self.batch_window)
+            self._flush()
+
+        pending.event.wait()
+        if pending.error is not None:
+            raise pending.error
+        return pending.embedding
+
+    def embed_batch(self, texts: List[str]):
+        keys = [self.normalize(text) for text in texts]
+        found = {}
+        for key in dict.fromkeys(keys):
+            embedding = self._cache_get(key)
+            if embedding is not None:
+                found[key] = embedding
+
+        missing = [key for key in dict.fromkeys(keys) if key not in found]
+        if missing:
+            embeddings = self._encode(missing)
+            with self._lock:
+                self.batches += 1
+                for key, embedding in zip(missing, embeddings):
+                    self._cache_put(key, embedding)
+                    found[key] = embedding
+        return [found[key] for key in keys]
+
+    @component.output_types(embedding=List[float])
+    def run(self, text: str):
+        return {"embedding": self.embed(text)}
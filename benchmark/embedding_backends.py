@@ -0,0 +1,78 @@
+import os
+import json
+import time
+import argparse
+from pathlib import Path
+
+import embedding_backend
+from create_database import DATA_DIR, EPISODES, EMBEDDING_MODEL, SPLIT_LENGTH
+from benchmark.questions import QUESTIONS
+from benchmark.run import summarize
+
+
+def sample_chunks(count):
+    words = Path(DATA_DIR / EPISODES[0]["file"]).read_text(encoding="utf-8").split()
+    chunks = [" ".join(words[i:i + SPLIT_LENGTH]) for i in range(0, len(words), SPLIT_LENGTH)]
+    return (chunks * (count // max(len(chunks), 1) + 1))[:count]
+
+
+def bench_backend(backend, args, chunks):
+    model_path, st_backend, model_kwargs = embedding_backend.resolve(EMBEDDING_MODEL, backend)
+    embedder = embedding_backend.text_embedder(EMBEDDING_MODEL, backend, progress_bar=False)
+    started = time.perf_counter()
+    embedder.warm_up()
+    load_s = time.perf_counter() - started
+
+    latencies = []
+    for _ in range(args.repeat):
+        for question in QUESTIONS:
+            start = time.perf_counter()
+            embedder.run(text=question)
+            latencies.append(time.perf_counter() - start)
+
+    backend_model = embedder.embedding_backend
+    start = time.perf_counter()
+    backend_model.embed(chunks, batch_size=args.batch_size, show_progress_bar=False, normalize_embeddings=True)
+    batch_s = time.perf_counter() - start
+
+    similarity = None
+    if st_backend == "onnx":
+        similarity = embedding_backend.compare_to_reference(EMBEDDING_MODEL, model_path, backend, model_kwargs,
+                                                            texts=QUESTIONS)
+    return {
+        "effective_backend": st_backend if st_backend == "torch" else backend,
+        "load_s": load_s,
+        "query": summarize(latencies),
+        "chunks_per_s": len(chunks) / batch_s,
+        "min_cosine": float(similarity.min()) if similarity is not None else 1.0,
+        "mean_cosine": float(similarity.mean()) if similarity is not None else 1.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query latency, ingest throughput and drift per embedding backend")
+    parser.add_argument("--backends", nargs="+", default=list(embedding_backend.BACKENDS),
+                        choices=embedding_backend.BACKENDS)
+    parser.add_argument("--repeat", type=int, default=5, help="passes over the question set")
+    parser.add_argument("--chunks", type=int, default=128, help="transcript chunks embedded for throughput")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--output", help="write results as JSON to this path")
+    args = parser.parse_args()
+
+    chunks = sample_chunks(args.chunks)
+    results = {backend: bench_backend(backend, args, chunks) for backend in args.backends}
+
+    print(f"{'backend':<11}{'p50 ms':>9}{'p95 ms':>9}{'chunks/s':>10}{'min cos':>9}{'mean cos':>10}")
+    for backend, r in results.items():
+        print(f"{backend:<11}{r['query']['p50_ms']:>9.2f}{r['query']['p95_ms']:>9.2f}{r['chunks_per_s']:>10.1f}"
+              f"{r['min_cosine']:>9.4f}{r['mean_cosine']:>10.4f}")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"Results saved to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+import time
+import asyncio
+import hashlib
+from types import SimpleNamespace
+
+WORDS = [
+    "veri", "bilimi", "kariyer", "model", "proje", "deneyim", "öğrenmek", "ekip",
+    "Bölüm", "konuk", "önemli", "sektör", "mülakat", "kod", "analiz", "üretim",
+]
+
+
+class FakeGeminiGenerator:
+    """Deterministic local stand-in for GeminiGenerator.
+
+    Latency is `latency_ms` plus `per_token_ms` per generated token, and the reply is
+    derived from a hash of the prompt, so runs are reproducible and need no API key.
+    """
+
+    def __init__(self, latency_ms: float = 800, per_token_ms: float = 2, tokens: int = 200):
+        self.latency = latency_ms / 1000
+        self.per_token = per_token_ms / 1000
+        self.tokens = tokens
+        self.calls = 0
+
+    def _tokens(self, parts: str):
+        seed = hashlib.sha256(parts.encode("utf-8")).digest()
+        return [WORDS[seed[i % len(seed)] % len(WORDS)] + " " for i in range(self.tokens)]
+
+    def run(self, parts: str):
+        self.calls += 1
+        time.sleep(self.latency + self.per_token * self.tokens)
+        return {"replies": ["".join(self._tokens(parts))]}
+
+    def stream(self, parts: str):
+        self.calls += 1
+        time.sleep(self.latency)
+        for token in self._tokens(parts):
+            time.sleep(self.per_token)
+            yield token
+
+    async def run_async(self, parts: str):
+        self.calls += 1
+        await asyncio.sleep(self.latency + self.per_token * self.tokens)
+        return {"replies": ["".join(self._tokens(parts))]}
+
+    async def stream_async(self, parts: str):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        for token in self._tokens(parts):
+            await asyncio.sleep(self.per_token)
+            yield token
+
+
+class FakeAPIError(Exception):
+    def __init__(self, code: int, message: str):
+        super().__init__(f"{code} {message}")
+        self.code = code
+
+
+class FakeGenaiClient:
+    """Local stand-in for `genai.Client` covering what GeminiGenerator uses: generate_content
+    (plain, streaming and `.aio`) and `caches.create/update`.
+
+    Tokens are counted as whitespace-separated words. Caches smaller than `min_cache_tokens`
+    are rejected like the real API does, caches expire after their ttl, and usage metadata
+    reports `cached_content_token_count`, so prompt caching, refresh and fallback can be
+    exercised with `GeminiGenerator(client=FakeGenaiClient())`. Each call sleeps `latency`
+    seconds, and exceptions appended to `failures` are raised by the next calls in order,
+    for timeouts and retries.
+    """
+
+    def __init__(self, min_cache_tokens: int = 0, reply: str = "cevap", chunks: int = 3, latency: float = 0):
+        self.min_cache_tokens = min_cache_tokens
+        self.reply = reply
+        self.chunks = chunks
+        self.latency = latency
+        self.failures = []
+        self.cached = {}
+        self.caches_created = 0
+        self.requests = []
+        self.models = _FakeModels(self)
+        self.caches = _FakeCaches(self)
+        self.aio = SimpleNamespace(models=_FakeAsyncModels(self))
+
+    @staticmethod
+    def _count(text):
+        return len(text.split()) if text else 0
+
+    def _respond(self, contents, config):
+        self.requests.append(config)
+        if self.failures:
+            raise self.failures.pop(0)
+        prefix_tokens, cached_tokens = self._count(getattr(config, "system_instruction", None)), 0
+        name = getattr(config, "cached_content", None)
+        if name:
+            entry = self.cached.get(name)
+            if entry is None or entry["expires"] < time.time():
+                self.cached.pop(name, None)
+                raise FakeAPIError(404, f"CachedContent not found (or expired): {name}")
+            prefix_tokens = cached_tokens = entry["tokens"]
+        return SimpleNamespace(
+            prompt_token_count=prefix_tokens + self._count(contents),
+            cached_content_token_count=cached_tokens or None,
+            candidates_token_count=self._count(self.reply),
+        )
+
+    def _chunks(self, usage):
+        words = self.reply.split()
+        step = max(1, -(-len(words) // self.chunks))
+        pieces = [" ".join(words[i:i + step]) + " " for i in range(0, len(words), step)]
+        return [SimpleNamespace(text=piece, usage_metadata=usage if i == len(pieces) - 1 else None)
+                for i, piece in enumerate(pieces)]
+
+
+class _FakeModels:
+    def __init__(self, client):
+        self.client = client
+
+    def generate_content(self, model, contents, config=None):
+        time.sleep(self.client.latency)
+        return SimpleNamespace(text=self.client.reply, usage_metadata=self.client._respond(contents, config))
+
+    def generate_content_stream(self, model, contents, config=None):
+        # Like the SDK, the request (and any error) happens on the first iteration
+        def chunks():
+            time.sleep(self.client.latency)
+            yield from self.client._chunks(self.client._respond(contents, config))
+        return chunks()
+
+
+class _FakeAsyncModels:
+    def __init__(self, client):
+        self.client = client
+
+    async def generate_content(self, model, contents, config=None):
+        await asyncio.sleep(self.client.latency)
+        return SimpleNamespace(text=self.client.reply, usage_metadata=self.client._respond(contents, config))
+
+    async def generate_content_stream(self, model, contents, config=None):
+        async def chunks():
+            await asyncio.sleep(self.client.latency)
+            for chunk in self.client._chunks(self.client._respond(contents, config)):
+                yield chunk
+        return chunks()
+
+
+class _FakeCaches:
+    def __init__(self, client):
+        self.client = client
+
+    @staticmethod
+    def _ttl(config):
+        return float(str(config.ttl).rstrip("s"))
+
+    def create(self, model, config):
+        tokens = self.client._count(config.system_instruction)
+        if tokens < self.client.min_cache_tokens:
+            raise FakeAPIError(400, f"Cached content is too small: {tokens} < {self.client.min_cache_tokens} tokens")
+        self.client.caches_created += 1
+        name = f"cachedContents/{self.client.caches_created}"
+        self.client.cached[name] = {"tokens": tokens, "expires": time.time() + self._ttl(config)}
+        return SimpleNamespace(name=name)
+
+    def update(self, name, config):
+        entry = self.client.cached.get(name)
+        if entry is None or entry["expires"] < time.time():
+            raise FakeAPIError(404, f"CachedContent not found: {name}")
+        entry["expires"] = time.time() + self._ttl(config)
+        return SimpleNamespace(name=name)
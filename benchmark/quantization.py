@@ -0,0 +1,45 @@
+import os
+import json
+import argparse
+
+import embedding_backend
+from rag_pipeline import EMBEDDING_MODEL, NUMPY_INDEX_PATH
+from numpy_index import NumpyIndex, evaluate_quantization
+from benchmark.questions import QUESTIONS
+
+
+def embed_questions():
+    embedder = embedding_backend.text_embedder(EMBEDDING_MODEL, progress_bar=False)
+    embedder.warm_up()
+    return [embedder.run(text=question)["embedding"] for question in QUESTIONS]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall and latency of quantized NumPy search vs the float baseline")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--rescore-factor", type=int, help="candidates rescored per result (default: index setting)")
+    parser.add_argument("--repeat", type=int, default=5, help="passes over the question set, for stable latencies")
+    parser.add_argument("--output", help="write results as JSON to this path")
+    args = parser.parse_args()
+
+    index = NumpyIndex.load(NUMPY_INDEX_PATH)
+    if args.rescore_factor:
+        index.rescore_factor = args.rescore_factor
+    queries = embed_questions() * args.repeat
+    report = evaluate_quantization(index, queries, top_k=args.top_k)
+
+    print(f"{len(index)} chunks, {len(QUESTIONS)} questions x {args.repeat}, top_k={args.top_k}, "
+          f"rescore_factor={index.rescore_factor}")
+    print(f"{'mode':<8}{'recall':>8}{'p50 ms':>10}{'p95 ms':>10}{'RAM MB':>10}")
+    for mode, r in report.items():
+        print(f"{mode:<8}{r['recall']:>8.3f}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['resident_mb']:>10.2f}")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results saved to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+QUESTIONS = [
+    "Jr lar nasıl iş bulur?",
+    "Veri bilimine kariyer değiştirerek geçmek isteyenlere ne önerilir?",
+    "MLOps neden önemli ve nereden öğrenmeye başlamalı?",
+    "Alara Dirik Hugging Face'te ne üzerine çalıştı?",
+    "Bir veri bilimci için yazılım mühendisliği bilgisi ne kadar gerekli?",
+    "Kaggle yarışmaları iş bulmaya yardımcı olur mu?",
+    "Yurt dışında çalışmak isteyenler nelere dikkat etmeli?",
+    "Açık kaynak projelere katkı vermek kariyere nasıl etki ediyor?",
+    "Büyük dil modelleri veri bilimi işlerini nasıl değiştiriyor?",
+    "Mülakatlarda en sık sorulan teknik konular neler?",
+    "Akademiden sektöre geçiş nasıl oldu?",
+    "Portföy projesi olarak ne tür çalışmalar yapılmalı?",
+    "Deep learning öğrenmek için hangi kaynaklar öneriliyor?",
+    "Bir veri ekibinde roller nasıl ayrılıyor?",
+    "Freelance veri bilimi işleri nasıl bulunur?",
+    "İstatistik bilgisi olmadan veri bilimci olunur mu?",
+    "Startup'ta çalışmakla kurumsal şirkette çalışmak arasındaki farklar neler?",
+    "Göker Güner hangi projelerden bahsetti?",
+    "Model deployment sürecinde en çok karşılaşılan sorunlar neler?",
+    "LinkedIn'i etkili kullanmak için neler yapılmalı?",
+]
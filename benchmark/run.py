@@ -0,0 +1,230 @@
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import threading
+import subprocess
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import rag_pipeline
+from answer_cache import AnswerCache
+from benchmark.fake_llm import FakeGeminiGenerator
+from benchmark.questions import QUESTIONS
+
+
+class StageTimer:
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds):
+        with self._lock:
+            self.samples[stage].append(seconds)
+
+    def wrap(self, stage, fn):
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.record(stage, time.perf_counter() - start)
+        return timed
+
+
+class TimedLLM:
+    def __init__(self, llm, timer):
+        self.llm = llm
+        self.run = timer.wrap("generation", llm.run)
+        self.stream = llm.stream
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * q / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def summarize(values):
+    return {
+        "count": len(values),
+        "mean_ms": sum(values) / len(values) * 1000 if values else None,
+        "p50_ms": percentile(values, 50) * 1000 if values else None,
+        "p95_ms": percentile(values, 95) * 1000 if values else None,
+        "p99_ms": percentile(values, 99) * 1000 if values else None,
+        "max_ms": max(values) * 1000 if values else None,
+    }
+
+
+def rss_mb():
+    current = None
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    current = int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak = peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    return {"current": current, "peak": peak}
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def ingest_settings():
+    try:
+        with open(rag_pipeline.INGEST_MANIFEST_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)["settings"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def instrument(timer, args):
+    rag_pipeline.init()
+    rag_pipeline.embed_query = timer.wrap("query_embedding", rag_pipeline.embed_query)
+    rag_pipeline.retrieve = timer.wrap("retrieval", rag_pipeline.retrieve)
+    rag_pipeline.assemble_context = timer.wrap("context_assembly", rag_pipeline.assemble_context)
+    rag_pipeline.build_prompt = timer.wrap("prompt_build", rag_pipeline.build_prompt)
+    rag_pipeline.generator = TimedLLM(
+        FakeGeminiGenerator(latency_ms=args.llm_latency_ms, per_token_ms=args.llm_token_ms, tokens=args.llm_tokens),
+        timer
+    )
+    if not args.cache:
+        rag_pipeline.answer_cache = AnswerCache(max_size=0, similarity_threshold=None)
+        rag_pipeline.query_embedder.cache_size = 0
+
+
+def make_request_fn(args):
+    if args.url:
+        def post(query):
+            req = urllib.request.Request(
+                args.url.rstrip("/") + "/api/chat",
+                data=json.dumps({"query": query}).encode("utf-8"),
+                headers={"Content-Type": "application/json"}
+            )
+            with urllib.request.urlopen(req, timeout=120) as resp:
+                if resp.status != 200:
+                    raise RuntimeError(f"HTTP {resp.status}")
+                return json.load(resp)
+        return post
+
+    if args.mode == "pipeline":
+        return lambda query: rag_pipeline.respond_with_sources(query, top_k=args.top_k)
+
+    from app import app
+    local = threading.local()
+
+    def post(query):
+        if not hasattr(local, "client"):
+            local.client = app.test_client()
+        resp = local.client.post("/api/chat", json={"query": query})
+        if resp.status_code != 200:
+            raise RuntimeError(f"HTTP {resp.status_code}")
+        return resp.get_json()
+    return post
+
+
+def run_benchmark(args):
+    timer = StageTimer()
+    if not args.url:
+        instrument(timer, args)
+    send = make_request_fn(args)
+
+    queries = [QUESTIONS[i % len(QUESTIONS)] for i in range(args.requests)]
+    errors = []
+
+    def one(query):
+        start = time.perf_counter()
+        try:
+            send(query)
+        except Exception as e:
+            errors.append(repr(e))
+            return
+        timer.record("end_to_end", time.perf_counter() - start)
+
+    for query in QUESTIONS[:args.warmup]:
+        send(query)
+    timer.samples.clear()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(one, queries))
+    elapsed = time.perf_counter() - started
+
+    completed = len(timer.samples["end_to_end"])
+    return {
+        "config": {
+            "mode": "http" if args.url else args.mode,
+            "url": args.url,
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "top_k": args.top_k,
+            "answer_cache": args.cache,
+            "fake_llm": {"latency_ms": args.llm_latency_ms, "per_token_ms": args.llm_token_ms, "tokens": args.llm_tokens},
+            "label": args.label,
+            "commit": git_commit(),
+            "index_version": rag_pipeline.get_index_version() if rag_pipeline.is_ready() else None,
+            "ingest_settings": ingest_settings(),
+        },
+        "stages": {stage: summarize(values) for stage, values in timer.samples.items()},
+        "completed": completed,
+        "errors": len(errors),
+        "error_samples": errors[:5],
+        "elapsed_s": elapsed,
+        "requests_per_s": completed / elapsed if elapsed else None,
+        "rss_mb": rss_mb(),
+    }
+
+
+def print_report(result):
+    cfg = result["config"]
+    print(f"mode={cfg['mode']} concurrency={cfg['concurrency']} requests={cfg['requests']} "
+          f"commit={cfg['commit']}")
+    print(f"{'stage':<16}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for stage, s in result["stages"].items():
+        print(f"{stage:<16}{s['count']:>7}{s['p50_ms']:>10.1f}{s['p95_ms']:>10.1f}{s['p99_ms']:>10.1f}")
+    print(f"throughput: {result['requests_per_s']:.2f} req/s, errors: {result['errors']}, "
+          f"rss: {result['rss_mb']['current']} MB (peak {result['rss_mb']['peak']:.0f} MB)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark with a fake LLM")
+    parser.add_argument("--mode", choices=["pipeline", "http"], default="pipeline")
+    parser.add_argument("--url", help="benchmark a running server instead of an in-process Flask client")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--cache", action="store_true", help="keep the answer/embedding caches enabled")
+    parser.add_argument("--llm-latency-ms", type=float, default=800)
+    parser.add_argument("--llm-token-ms", type=float, default=2)
+    parser.add_argument("--llm-tokens", type=int, default=200)
+    parser.add_argument("--label", help="free-form tag stored with the results (e.g. chunking setup)")
+    parser.add_argument("--output", help="write results as JSON to this path")
+    args = parser.parse_args()
+
+    result = run_benchmark(args)
+    print_report(result)
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"Results saved to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from pathlib import Path
+
+
+# Per-episode chunk and word counts for everything in the index, written by create_database.py
+# next to the other index artifacts
+def build_catalog(manifest, episodes, data_dir):
+    entries = []
+    for ep in episodes:
+        ingested = manifest["episodes"].get(ep["file"])
+        if ingested is None:
+            continue
+        path = Path(data_dir) / ep["file"]
+        entries.append({
+            "episode": ep["episode"],
+            "guest": ep["guest"],
+            "image": ep.get("image", "default.jpg"),
+            "file": ep["file"],
+            "chunks": len(ingested["chunks"]),
+            "words": len(path.read_text(encoding="utf-8").split()) if path.exists() else None,
+        })
+    entries.sort(key=lambda entry: entry["episode"])
+    return {
+        "version": manifest["version"],
+        "documents": sum(entry["chunks"] for entry in entries),
+        "words": sum(entry["words"] or 0 for entry in entries),
+        "episodes": entries,
+    }
+
+
+def write_catalog(catalog, path):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(catalog, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+class Catalog:
+    def __init__(self, data):
+        self.data = data
+        self.version = data.get("version")
+        self.episodes = data["episodes"]
+        self.by_episode = {entry["episode"]: entry for entry in self.episodes}
+        self.etag = hashlib.sha256(
+            json.dumps(data, ensure_ascii=False, sort_keys=True).encode("utf-8")
+        ).hexdigest()[:16]
+
+    # Registry-only catalog for an index built before catalogs existed: no counts, no version
+    @classmethod
+    def from_registry(cls, episodes):
+        return cls({
+            "version": None,
+            "documents": None,
+            "words": None,
+            "episodes": [{"episode": ep["episode"], "guest": ep["guest"], "image": ep.get("image", "default.jpg"),
+                          "file": ep["file"], "chunks": None, "words": None} for ep in episodes],
+        })
+
+
+class CatalogStore:
+    """Serves the catalog file from memory and picks up a rebuilt one.
+
+    At most every `check_interval` seconds the file's mtime and size are compared with the
+    loaded copy; a changed file is parsed in full and then swapped in with one assignment,
+    so readers see either the old catalog or the new one. The file itself is replaced
+    atomically by write_catalog(). Without a catalog file the episode registry is served.
+    """
+
+    def __init__(self, path, registry, check_interval: float = 2.0):
+        self.path = path
+        self.registry = registry
+        self.check_interval = check_interval
+        self.reloads = 0
+        self._catalog = None
+        self._signature = None
+        self._checked = None
+        self._lock = threading.Lock()
+
+    def _signature_now(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _load(self, signature):
+        if signature is None:
+            return Catalog.from_registry(self.registry)
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return Catalog(json.load(f))
+        except (OSError, ValueError, KeyError) as e:
+            print(f"[!] Could not load catalog {self.path}: {e}")
+            return self._catalog or Catalog.from_registry(self.registry)
+
+    def get(self) -> Catalog:
+        now = time.monotonic()
+        if self._checked is not None and now - self._checked < self.check_interval:
+            return self._catalog
+        with self._lock:
+            if self._checked is None or now - self._checked >= self.check_interval:
+                signature = self._signature_now()
+                if self._catalog is None or signature != self._signature:
+                    self._catalog = self._load(signature)
+                    self._signature = signature
+                    self.reloads += 1
+                self._checked = now
+            return self._catalog
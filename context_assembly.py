@@ -0,0 +1,93 @@
+from typing import List
+from haystack import Document, component
+
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def _span(doc: Document):
+    start = doc.meta.get("split_idx_start")
+    if start is None:
+        return None
+    return start, start + len(doc.content)
+
+
+@component
+class ContextAssembler:
+    """Merges overlapping/adjacent chunks of one episode and packs them under a token budget.
+
+    The splitter stores each chunk's character offset in its source transcript
+    (`split_idx_start`), so chunks from the same source whose ranges touch or overlap
+    are stitched into one span and the shared overlap is sent to the LLM once.
+    Spans are then added in score order until `token_budget` is used up.
+    """
+
+    def __init__(self, token_budget: int = 3000, min_tail_tokens: int = 200):
+        self.token_budget = token_budget
+        self.min_tail_tokens = min_tail_tokens
+
+    def merge(self, documents: List[Document]) -> List[Document]:
+        groups = {}
+        standalone = []
+        for doc in {d.id: d for d in documents}.values():
+            if _span(doc) is None:
+                standalone.append(doc)
+                continue
+            # file_path first: chunks kept across an edit still carry the old file's source_id
+            key = (doc.meta.get("episode"), doc.meta.get("file_path") or doc.meta.get("source_id"))
+            groups.setdefault(key, []).append(doc)
+
+        merged = []
+        for docs in groups.values():
+            docs.sort(key=lambda d: d.meta["split_idx_start"])
+            current = None
+            for doc in docs:
+                start, end = _span(doc)
+                if current is not None and start <= current["end"]:
+                    if end > current["end"]:
+                        current["content"] += doc.content[current["end"] - start:]
+                        current["end"] = end
+                    current["docs"].append(doc)
+                    continue
+                if current is not None:
+                    merged.append(self._to_document(current))
+                current = {"start": start, "end": end, "content": doc.content, "docs": [doc]}
+            if current is not None:
+                merged.append(self._to_document(current))
+
+        return merged + standalone
+
+    @staticmethod
+    def _to_document(span) -> Document:
+        first = span["docs"][0]
+        if len(span["docs"]) == 1:
+            return first
+        meta = dict(first.meta)
+        meta["split_idx_start"] = span["start"]
+        meta["merged_ids"] = [d.id for d in span["docs"]]
+        scores = [d.score for d in span["docs"] if d.score is not None]
+        return Document(content=span["content"], meta=meta, score=max(scores) if scores else None)
+
+    def pack(self, documents: List[Document]) -> List[Document]:
+        ranked = sorted(documents, key=lambda d: d.score if d.score is not None else float("-inf"), reverse=True)
+        packed = []
+        remaining = self.token_budget
+        for doc in ranked:
+            tokens = estimate_tokens(doc.content)
+            if tokens <= remaining:
+                packed.append(doc)
+                remaining -= tokens
+            elif remaining >= self.min_tail_tokens:
+                content = doc.content[:remaining * CHARS_PER_TOKEN].rsplit(" ", 1)[0]
+                packed.append(Document(id=doc.id, content=content, meta=doc.meta, score=doc.score))
+                remaining = 0
+            if remaining < self.min_tail_tokens:
+                break
+        return packed
+
+    @component.output_types(documents=List[Document])
+    def run(self, documents: List[Document]):
+        return {"documents": self.pack(self.merge(documents))}
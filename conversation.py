@@ -0,0 +1,172 @@
+import re
+import json
+import time
+import uuid
+import threading
+from collections import OrderedDict, deque
+
+MEMORY_PROMPT = '''Bir podcast soru-cevap asistanının konuşma hafızasını güncelliyorsun.
+
+Mevcut özet:
+{summary}
+
+Özete eklenecek eski konuşma turları:
+{folded}
+
+Son konuşma turları:
+{recent}
+
+Kullanıcının yeni sorusu: {query}
+
+Sadece şu JSON nesnesini döndür:
+{{"summary": "<mevcut özet ile eski turları birleştiren, en fazla {summary_words} kelimelik Türkçe özet>",
+ "query": "<yeni soruyu konuşmaya bakmadan anlaşılacak şekilde yeniden yaz; zamirleri ve atıfları açık isimlerle değiştir>"}}'''
+
+
+def _clip(text: str, max_chars: int) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= max_chars else text[:max_chars].rsplit(" ", 1)[0] + " …"
+
+
+def _parse_json(text: str):
+    match = re.search(r"\{.*\}", text, re.S)
+    data = json.loads(match.group(0) if match else text)
+    return str(data.get("summary", "")), str(data.get("query", ""))
+
+
+class Session:
+    def __init__(self, session_id: str, recent_turns: int):
+        self.id = session_id
+        self.summary = ""
+        self.turns = deque()
+        self.recent_turns = recent_turns
+        self.updated = time.time()
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.turns)
+
+    def add_turn(self, query: str, response: str):
+        with self.lock:
+            self.turns.append((query, response))
+            self.updated = time.time()
+
+
+class ConversationMemory:
+    """Per-session conversation state with a constant-size footprint in the prompt.
+
+    The last `recent_turns` turns are kept verbatim (answers clipped to `turn_max_chars`);
+    anything older is folded into a rolling summary capped at `summary_max_chars`. Before a
+    follow-up is answered, one small LLM call both folds the overflowing turns into the
+    summary and rewrites the question into a standalone retrieval query, so embedding,
+    retrieval and the answer cache see a self-contained question.
+
+    Sessions live in an LRU of at most `max_sessions` entries and expire after `ttl`
+    seconds of inactivity.
+    """
+
+    def __init__(self, max_sessions: int = 1000, ttl: float = 7200, recent_turns: int = 3,
+                 summary_max_chars: int = 1200, turn_max_chars: int = 600, summary_words: int = 120):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.recent_turns = recent_turns
+        self.summary_max_chars = summary_max_chars
+        self.turn_max_chars = turn_max_chars
+        self.summary_words = summary_words
+        self.evictions = 0
+        self.rewrites = 0
+        self.rewrite_failures = 0
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def _evict(self, now):
+        while self._sessions:
+            oldest = next(iter(self._sessions.values()))
+            if len(self._sessions) <= self.max_sessions and now - oldest.updated <= self.ttl:
+                break
+            self._sessions.popitem(last=False)
+            self.evictions += 1
+
+    # Unknown or expired ids start a fresh session under a new id
+    def get_or_create(self, session_id: str = None) -> Session:
+        now = time.time()
+        with self._lock:
+            self._evict(now)
+            session = self._sessions.get(session_id) if session_id else None
+            if session is None:
+                session = Session(uuid.uuid4().hex, self.recent_turns)
+                self._sessions[session.id] = session
+                self._evict(now)
+            self._sessions.move_to_end(session.id)
+            session.updated = now
+            return session
+
+    def _format_turns(self, turns):
+        return "\n".join(f"Kullanıcı: {_clip(q, self.turn_max_chars)}\nAsistan: {_clip(r, self.turn_max_chars)}"
+                         for q, r in turns) or "-"
+
+    def history(self, session: Session) -> str:
+        with session.lock:
+            recent = list(session.turns)[-self.recent_turns:]
+            summary = session.summary
+        if not recent and not summary:
+            return ""
+        parts = [f"Özet: {summary}"] if summary else []
+        return "\n".join(parts + [self._format_turns(recent)]) if recent else parts[0]
+
+    def _memory_prompt(self, session: Session, query: str):
+        with session.lock:
+            turns = list(session.turns)
+            summary = session.summary
+        folded = turns[:-self.recent_turns] if len(turns) > self.recent_turns else []
+        prompt = MEMORY_PROMPT.format(
+            summary=summary or "-",
+            folded=self._format_turns(folded),
+            recent=self._format_turns(turns[len(folded):]),
+            query=_clip(query, self.turn_max_chars),
+            summary_words=self.summary_words
+        )
+        return prompt, len(folded)
+
+    def _apply(self, session: Session, query: str, reply, n_folded: int):
+        try:
+            summary, rewritten = _parse_json(reply)
+            self.rewrites += 1
+        except (ValueError, AttributeError, TypeError):
+            summary, rewritten = None, ""
+            self.rewrite_failures += 1
+        with session.lock:
+            folded = [session.turns.popleft() for _ in range(min(n_folded, len(session.turns)))]
+            if summary is None:
+                # Keep the state bounded even when the model reply is unusable
+                summary = " ".join([session.summary] + [f"Soru: {q}" for q, _ in folded])
+            session.summary = _clip(summary or session.summary, self.summary_max_chars)
+        return rewritten.strip() or query
+
+    # Returns the standalone query to retrieve with. First turns skip the LLM call entirely.
+    def prepare(self, session: Session, query: str, llm) -> str:
+        if not len(session):
+            return query
+        prompt, n_folded = self._memory_prompt(session, query)
+        try:
+            reply = llm.run(parts=prompt)["replies"][0]
+        except Exception:
+            reply = None
+        return self._apply(session, query, reply, n_folded)
+
+    async def prepare_async(self, session: Session, query: str, llm) -> str:
+        if not len(session):
+            return query
+        prompt, n_folded = self._memory_prompt(session, query)
+        try:
+            reply = (await llm.run_async(parts=prompt))["replies"][0]
+        except Exception:
+            reply = None
+        return self._apply(session, query, reply, n_folded)
+
+    def stats(self):
+        return {"sessions": len(self._sessions), "evictions": self.evictions, "rewrites": self.rewrites,
+                "rewrite_failures": self.rewrite_failures}
@@ -1,10 +1,21 @@
 import os
+import json
+import time
+import shutil
+import hashlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
+import numpy as np
 from dotenv import load_dotenv
 from haystack.components.converters import TextFileToDocument
 from haystack.components.preprocessors import DocumentSplitter
-from haystack.components.embedders import SentenceTransformersDocumentEmbedder
+from haystack.document_stores.types import DuplicatePolicy
 from haystack_integrations.document_stores.chroma import ChromaDocumentStore
+import embedding_backend
+from catalog import build_catalog, write_catalog
+from keyword_index import KeywordIndex
+from numpy_index import NumpyIndex, QUANTIZATION_MODES, evaluate_quantization
 
 load_dotenv()
 
@@ -13,63 +24,350 @@ DATA_DIR = Path("data/Final")
 CHROMA_PERSIST_PATH = "chroma_db"
 CHROMA_COLLECTION_NAME = "datacommit_all"
 EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+MANIFEST_PATH = Path(CHROMA_PERSIST_PATH) / "ingest_manifest.json"
+KEYWORD_INDEX_PATH = Path(CHROMA_PERSIST_PATH) / "keyword_index.json"
+NUMPY_INDEX_PATH = Path(CHROMA_PERSIST_PATH) / "numpy_index"
+CATALOG_PATH = Path(CHROMA_PERSIST_PATH) / "catalog.json"
 
+SPLIT_BY = "word"
+SPLIT_LENGTH = 800
+SPLIT_OVERLAP = 200
+SPLIT_THRESHOLD = 10
+
+# Streaming ingestion: chunks are embedded EMBED_BATCH_SIZE at a time across EMBED_WORKERS
+# processes (1 = in-process) and written to Chroma as each batch finishes
+EMBED_BATCH_SIZE = int(os.environ.get("EMBED_BATCH_SIZE", 64))
+EMBED_WORKERS = int(os.environ.get("EMBED_WORKERS", 1))
+MAX_BATCHES_IN_FLIGHT = 2 * max(EMBED_WORKERS, 1)
+
+# NumPy index storage: "none" (float32 only), "int8" or "binary" codes for the candidate scan,
+# with the float vectors kept on disk for rescoring. Changing it re-quantizes the stored vectors.
+EMBEDDING_QUANTIZATION = os.environ.get("EMBEDDING_QUANTIZATION", "none")
+QUANTIZATION_EVAL_QUERIES = 200
+
+# The episode registry: ingestion, query filters and (through the catalog) the web app's guest
+# list and images all read it from here
 EPISODES = [
-    {"file": "datacommit_1_kaan_bicakci_speakers_cleaned_named.txt", "guest": "Kaan Bıçakçı", "episode": 1},
-    {"file": "datacommit_2_bilge_yucel_speakers_cleaned_named.txt", "guest": "Bilge Yücel", "episode": 2},
-    {"file": "datacommit_3_alara_dirik_speakers_cleaned_named.txt", "guest": "Alara Dirik", "episode": 3},
-    {"file": "datacommit_4_olgun_aydin_speakers_cleaned_named.txt", "guest": "Olgun Aydın", "episode": 4},
-    {"file": "datacommit_5_eren_akbaba_speakers_cleaned_named.txt", "guest": "Eren Akbaba", "episode": 5},
-    {"file": "datacommit_6_taner_sekmen_speakers_cleaned_named.txt", "guest": "Taner Sekmen", "episode": 6},
-    {"file": "datacommit_7_murat_sahin_speakers_cleaned_named.txt", "guest": "Murat Şahin", "episode": 7},
-    {"file": "datacommit_8_goker_guner_speakers_cleaned_named.txt", "guest": "Göker Güner", "episode": 8},
+    {"file": "datacommit_1_kaan_bicakci_speakers_cleaned_named.txt", "guest": "Kaan Bıçakçı", "episode": 1,
+     "image": "kaan_bicakci.jpg"},
+    {"file": "datacommit_2_bilge_yucel_speakers_cleaned_named.txt", "guest": "Bilge Yücel", "episode": 2,
+     "image": "bilge_yucel.jpg"},
+    {"file": "datacommit_3_alara_dirik_speakers_cleaned_named.txt", "guest": "Alara Dirik", "episode": 3,
+     "image": "alara_dirik.jpg"},
+    {"file": "datacommit_4_olgun_aydin_speakers_cleaned_named.txt", "guest": "Olgun Aydın", "episode": 4,
+     "image": "olgun_aydin.jpg"},
+    {"file": "datacommit_5_eren_akbaba_speakers_cleaned_named.txt", "guest": "Eren Akbaba", "episode": 5,
+     "image": "eren_akbaba.jpg"},
+    {"file": "datacommit_6_taner_sekmen_speakers_cleaned_named.txt", "guest": "Taner Sekmen", "episode": 6,
+     "image": "taner_sekmen.jpg"},
+    {"file": "datacommit_7_murat_sahin_speakers_cleaned_named.txt", "guest": "Murat Şahin", "episode": 7,
+     "image": "murat_sahin.jpg"},
+    {"file": "datacommit_8_goker_guner_speakers_cleaned_named.txt", "guest": "Göker Güner", "episode": 8,
+     "image": "goker_guner.jpg"},
 ]
 
 
-def create_database():
-    document_store = ChromaDocumentStore(
-        persist_path=CHROMA_PERSIST_PATH,
-        collection_name=CHROMA_COLLECTION_NAME
-    )
+# The ONNX backends produce slightly different vectors than torch (and int8 differs per
+# quantization config), so stored vectors are only reusable under the same backend.
+# EMBEDDING_QUANTIZATION is not part of this: it is checked against the vector index itself.
+def ingest_settings():
+    backend = embedding_backend.EMBEDDING_BACKEND
+    return {
+        "split_by": SPLIT_BY,
+        "split_length": SPLIT_LENGTH,
+        "split_overlap": SPLIT_OVERLAP,
+        "split_threshold": SPLIT_THRESHOLD,
+        "embedding_model": EMBEDDING_MODEL,
+        "embedding_backend": backend,
+        "onnx_quantization": embedding_backend.ONNX_QUANTIZATION_CONFIG if backend == "onnx-int8" else None,
+    }
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_manifest():
+    if not MANIFEST_PATH.exists():
+        return None
+    with open(MANIFEST_PATH, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(manifest):
+    chunk_ids = sorted(cid for ep in manifest["episodes"].values() for cid in ep["chunks"])
+    manifest["version"] = hashlib.sha256(
+        json.dumps([manifest["settings"], chunk_ids]).encode("utf-8")
+    ).hexdigest()[:16]
     
-    if document_store.count_documents() > 0:
-        print(f"Database already has {document_store.count_documents()} chunks")
-        print("Delete 'chroma_db' folder to re-ingest")
-        return document_store
+    MANIFEST_PATH.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = MANIFEST_PATH.with_suffix(".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, MANIFEST_PATH)
+
+
+# Haystack's default ID hashes all of a chunk's metadata, including the hash of the whole file,
+# so any edit would rename every chunk of the episode. These IDs depend only on the episode, the
+# chunk's text and its offset, so an edited transcript keeps the chunks before the edit.
+def chunk_id(ep, doc):
+    key = json.dumps([ep["file"], ep["episode"], ep["guest"], doc.meta.get("split_idx_start"), doc.content],
+                     ensure_ascii=False)
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def split_episode(ep, file_path, txt_converter, text_splitter):
+    raw_docs = txt_converter.run(sources=[str(file_path)])["documents"]
     
-    all_docs = []
-    txt_converter = TextFileToDocument()
-    text_splitter = DocumentSplitter(
-        split_by="word",
-        split_length=800,
-        split_overlap=200,
-        split_threshold=10
-    )
+    for doc in raw_docs:
+        doc.meta["episode"] = ep["episode"]
+        doc.meta["guest"] = ep["guest"]
     
+    split_docs = text_splitter.run(documents=raw_docs)["documents"]
+    for doc in split_docs:
+        doc.id = chunk_id(ep, doc)
+    return split_docs
+
+
+_worker_embedder = None
+
+
+def _init_embed_worker(torch_threads=None):
+    global _worker_embedder
+    if torch_threads:
+        import torch
+        torch.set_num_threads(torch_threads)
+    _worker_embedder = embedding_backend.document_embedder(EMBEDDING_MODEL, progress_bar=False)
+    _worker_embedder.warm_up()
+
+
+def _embed_batch(docs):
+    return _worker_embedder.run(documents=docs)["documents"]
+
+
+def create_executor(workers):
+    # Export/check the configured backend once here rather than racing in every worker
+    embedding_backend.resolve(EMBEDDING_MODEL)
+    if workers <= 1:
+        return ThreadPoolExecutor(max_workers=1, initializer=_init_embed_worker)
+    torch_threads = max(1, (os.cpu_count() or workers) // workers)
+    return ProcessPoolExecutor(max_workers=workers, initializer=_init_embed_worker, initargs=(torch_threads,))
+
+
+# Yields (file, batch, is_last) for every chunk that still has to be embedded. The manifest
+# entry of a changed episode is marked in progress ("committed" lists chunk IDs already in the
+# store), so an interrupted run resumes after the last written batch instead of re-embedding.
+def iter_pending_batches(manifest, txt_converter, text_splitter, batch_size):
     for ep in EPISODES:
         file_path = DATA_DIR / ep["file"]
         if not file_path.exists():
             print(f"[!] Skipping Episode {ep['episode']} - file not found: {ep['file']}")
             continue
         
-        raw_docs = txt_converter.run(sources=[str(file_path)])["documents"]
+        file_hash = file_sha256(file_path)
+        previous = manifest["episodes"].get(ep["file"])
+        if (previous and previous["hash"] == file_hash and "committed" not in previous
+                and previous["episode"] == ep["episode"] and previous["guest"] == ep["guest"]):
+            continue
+        
+        split_docs = split_episode(ep, file_path, txt_converter, text_splitter)
+        chunk_ids = [doc.id for doc in split_docs]
+        
+        if previous is None:
+            in_store = set()
+        elif "committed" in previous:
+            in_store = set(previous["committed"]) | set(previous["stale"])
+        else:
+            in_store = set(previous["chunks"])
+        committed = in_store & set(chunk_ids)
+        stale = in_store - set(chunk_ids)
+        
+        manifest["episodes"][ep["file"]] = {
+            "episode": ep["episode"],
+            "guest": ep["guest"],
+            "hash": file_hash,
+            "chunks": chunk_ids,
+            "committed": sorted(committed),
+            "stale": sorted(stale),
+        }
+        save_manifest(manifest)
         
-        for doc in raw_docs:
-            doc.meta["episode"] = ep["episode"]
-            doc.meta["guest"] = ep["guest"]
+        new_docs = [doc for doc in split_docs if doc.id not in committed]
+        print(f"[+] Episode {ep['episode']} ({ep['guest']}): {len(split_docs)} chunks, "
+              f"{len(new_docs)} to embed, {len(stale)} to remove")
         
-        split_docs = text_splitter.run(documents=raw_docs)["documents"]
-        print(f"[+] Episode {ep['episode']} ({ep['guest']}): {len(split_docs)} chunks")
-        all_docs.extend(split_docs)
-    
-    print(f"\n[*] Embedding {len(all_docs)} chunks...")
-    doc_embedder = SentenceTransformersDocumentEmbedder(model=EMBEDDING_MODEL)
-    doc_embedder.warm_up()
-    embedded_docs = doc_embedder.run(documents=all_docs)["documents"]
-    
-    print(f"[*] Writing to ChromaDB...")
-    document_store.write_documents(embedded_docs)
-    print(f"[✓] Ingested {len(embedded_docs)} chunks from {len(EPISODES)} episodes")
+        if not new_docs:
+            yield ep["file"], [], True
+        for start in range(0, len(new_docs), batch_size):
+            yield ep["file"], new_docs[start:start + batch_size], start + batch_size >= len(new_docs)
+
+
+def finish_episode(document_store, manifest, file_name):
+    entry = manifest["episodes"][file_name]
+    if entry["stale"]:
+        document_store.delete_documents(document_ids=entry["stale"])
+    del entry["committed"]
+    del entry["stale"]
+    save_manifest(manifest)
+
+
+def keyword_index_is_current(manifest):
+    return KEYWORD_INDEX_PATH.exists() and KeywordIndex.load(KEYWORD_INDEX_PATH).version == manifest["version"]
+
+
+def build_keyword_index(all_docs, manifest):
+    index = KeywordIndex.build(all_docs, version=manifest["version"])
+    index.save(KEYWORD_INDEX_PATH)
+    print(f"[*] Keyword index: {len(index)} chunks, {len(index.postings)} terms")
+
+
+# Vectors for unchanged chunks are reused from the previous index file and new ones come from
+# this run's batches; only chunks found in neither (e.g. a store ingested before the NumPy
+# index existed) are embedded again.
+def build_vector_index(all_docs, manifest, new_embeddings):
+    embeddings = {}
+    if NumpyIndex.exists(NUMPY_INDEX_PATH):
+        embeddings = NumpyIndex.load(NUMPY_INDEX_PATH, mmap=False).embeddings()
+    embeddings.update(new_embeddings)
+    
+    missing = [doc for doc in all_docs if doc.id not in embeddings]
+    if missing:
+        print(f"[*] Embedding {len(missing)} chunks missing from the NumPy index...")
+        doc_embedder = embedding_backend.document_embedder(EMBEDDING_MODEL, progress_bar=False)
+        doc_embedder.warm_up()
+        for doc in doc_embedder.run(documents=missing)["documents"]:
+            embeddings[doc.id] = doc.embedding
+    
+    index = NumpyIndex.build(all_docs, embeddings, version=manifest["version"], quantization=EMBEDDING_QUANTIZATION)
+    index.save(NUMPY_INDEX_PATH)
+    print(f"[*] NumPy index: {len(index)} x {index.vectors.shape[1] if len(index) else 0} float32 matrix"
+          f", quantization: {index.quantization}")
+    if index.quantization != "none" and len(index):
+        report_quantization(index)
+
+
+# Chunk vectors with a little noise stand in for questions here; benchmark/quantization.py
+# measures the same thing with real questions through the query embedder.
+def report_quantization(index, top_k=5):
+    rng = np.random.default_rng(0)
+    rows = rng.choice(len(index), size=min(QUANTIZATION_EVAL_QUERIES, len(index)), replace=False)
+    queries = index.vectors[np.sort(rows)] + rng.normal(scale=0.02, size=(len(rows), index.vectors.shape[1]))
+    report = evaluate_quantization(index, queries, top_k=top_k, modes=(index.quantization,))
+    for mode, r in report.items():
+        print(f"    [*] {mode:<6} recall@{top_k}={r['recall']:.3f} p50={r['p50_ms']:.2f}ms "
+              f"p95={r['p95_ms']:.2f}ms resident={r['resident_mb']:.1f}MB")
+
+
+def build_search_indexes(document_store, manifest, new_embeddings):
+    keyword_current = keyword_index_is_current(manifest)
+    vector_current = False
+    if NumpyIndex.exists(NUMPY_INDEX_PATH):
+        existing = NumpyIndex.load(NUMPY_INDEX_PATH)
+        vector_current = existing.version == manifest["version"] and existing.quantization == EMBEDDING_QUANTIZATION
+    if keyword_current and vector_current:
+        return
+    
+    all_docs = document_store.filter_documents()
+    if not keyword_current:
+        build_keyword_index(all_docs, manifest)
+    if not vector_current:
+        build_vector_index(all_docs, manifest, new_embeddings)
+
+
+# Re-runs only split, embed and upsert episodes whose file hash (or registry entry) changed
+# since the last run, using the manifest stored next to the Chroma collection. Changing the
+# splitter settings, the embedding model or its backend invalidates the manifest and rebuilds
+# everything.
+def create_database(workers: int = EMBED_WORKERS, batch_size: int = EMBED_BATCH_SIZE):
+    if EMBEDDING_QUANTIZATION not in QUANTIZATION_MODES:
+        raise ValueError(f"EMBEDDING_QUANTIZATION must be one of {', '.join(QUANTIZATION_MODES)}")
+    
+    document_store = ChromaDocumentStore(
+        persist_path=CHROMA_PERSIST_PATH,
+        collection_name=CHROMA_COLLECTION_NAME
+    )
+    
+    settings = ingest_settings()
+    manifest = load_manifest()
+    
+    if manifest is None or manifest.get("settings") != settings:
+        existing = document_store.count_documents()
+        if existing > 0:
+            reason = "no ingest manifest found" if manifest is None else "ingest settings changed"
+            print(f"[*] Rebuilding: {reason}, removing {existing} existing chunks")
+            stale_ids = [doc.id for doc in document_store.filter_documents()]
+            document_store.delete_documents(document_ids=stale_ids)
+        # Cached vectors may come from another embedding model
+        shutil.rmtree(NUMPY_INDEX_PATH, ignore_errors=True)
+        manifest = {"settings": settings, "episodes": {}}
+    
+    txt_converter = TextFileToDocument()
+    text_splitter = DocumentSplitter(
+        split_by=SPLIT_BY,
+        split_length=SPLIT_LENGTH,
+        split_overlap=SPLIT_OVERLAP,
+        split_threshold=SPLIT_THRESHOLD
+    )
+    
+    registered = {ep["file"] for ep in EPISODES}
+    for file_name in [f for f in manifest["episodes"] if f not in registered]:
+        removed = manifest["episodes"].pop(file_name)
+        document_store.delete_documents(document_ids=removed["chunks"] + removed.get("stale", []))
+        save_manifest(manifest)
+        print(f"[-] Episode {removed['episode']} ({removed['guest']}): removed {len(removed['chunks'])} chunks")
+    
+    executor = None
+    in_flight = deque()
+    new_embeddings = {}
+    embedded = 0
+    started = time.perf_counter()
+    
+    def commit_oldest():
+        nonlocal embedded
+        file_name, future, is_last = in_flight.popleft()
+        if future is not None:
+            docs = future.result()
+            document_store.write_documents(docs, policy=DuplicatePolicy.OVERWRITE)
+            new_embeddings.update((doc.id, doc.embedding) for doc in docs)
+            entry = manifest["episodes"][file_name]
+            entry["committed"] = sorted(set(entry["committed"]) | {doc.id for doc in docs})
+            save_manifest(manifest)
+            embedded += len(docs)
+            elapsed = time.perf_counter() - started
+            print(f"    [*] {embedded} chunks embedded and written ({embedded / elapsed:.1f} chunks/s)")
+        if is_last:
+            finish_episode(document_store, manifest, file_name)
+    
+    try:
+        for file_name, batch, is_last in iter_pending_batches(manifest, txt_converter, text_splitter, batch_size):
+            future = None
+            if batch:
+                if executor is None:
+                    executor = create_executor(workers)
+                future = executor.submit(_embed_batch, batch)
+            in_flight.append((file_name, future, is_last))
+            while len(in_flight) > MAX_BATCHES_IN_FLIGHT:
+                commit_oldest()
+        while in_flight:
+            commit_oldest()
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+    
+    save_manifest(manifest)
+    build_search_indexes(document_store, manifest, new_embeddings)
+    # Written last: a running app reloads it and serves the new counts and index version
+    write_catalog(build_catalog(manifest, EPISODES, DATA_DIR), CATALOG_PATH)
+    total = sum(len(ep["chunks"]) for ep in manifest["episodes"].values())
+    if embedded:
+        elapsed = time.perf_counter() - started
+        print(f"[✓] Embedded {embedded} chunks in {elapsed:.1f}s, index has {total} chunks")
+    else:
+        print(f"[✓] Up to date: {total} chunks, nothing to re-embed")
     
     return document_store
 
@@ -0,0 +1,106 @@
+import os
+import json
+import functools
+from pathlib import Path
+import numpy as np
+from haystack.components.embedders import SentenceTransformersTextEmbedder, SentenceTransformersDocumentEmbedder
+
+# Embedding inference backend for the query and document embedders:
+#   "torch"     - the PyTorch model as downloaded (reference)
+#   "onnx"      - the same weights exported to ONNX Runtime
+#   "onnx-int8" - the ONNX export with dynamic int8 quantization (fastest on CPU)
+# ONNX exports are written once to EMBEDDING_CACHE_DIR and loaded from there afterwards.
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+EMBEDDING_CACHE_DIR = Path(os.getenv("EMBEDDING_CACHE_DIR", "model_cache"))
+# Instruction set the int8 kernels are tuned for: "arm64", "avx2", "avx512" or "avx512_vnni"
+ONNX_QUANTIZATION_CONFIG = os.getenv("ONNX_QUANTIZATION_CONFIG", "avx2")
+BACKENDS = ("torch", "onnx", "onnx-int8")
+
+# Minimum cosine similarity to the PyTorch embedding of every check sentence
+TOLERANCE = {"onnx": 0.999, "onnx-int8": 0.98}
+CHECK_SENTENCES = [
+    "Veri bilimi alanında kariyere nasıl başlanır?",
+    "Makine öğrenmesi modellerini production ortamına almak için neler gerekir?",
+    "Büyük dil modelleri iş süreçlerini nasıl değiştiriyor?",
+    "Junior bir data scientist ilk işinde nelere dikkat etmeli?",
+    "Kaggle yarışmaları gerçek projelerden ne kadar farklı?",
+]
+CHECK_FILE = "backend_check.json"
+
+
+def _export_dir(model: str) -> Path:
+    return EMBEDDING_CACHE_DIR / (model.replace("/", "__") + "-onnx")
+
+
+def _int8_file() -> str:
+    return f"onnx/model_qint8_{ONNX_QUANTIZATION_CONFIG}.onnx"
+
+
+def _export(model: str, backend: str) -> Path:
+    from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+
+    path = _export_dir(model)
+    if not (path / "onnx" / "model.onnx").exists():
+        print(f"[*] Exporting {model} to ONNX in {path}...")
+        SentenceTransformer(model, backend="onnx", device="cpu").save_pretrained(str(path))
+    if backend == "onnx-int8" and not (path / _int8_file()).exists():
+        print(f"[*] Quantizing the ONNX export to int8 ({ONNX_QUANTIZATION_CONFIG})...")
+        onnx_model = SentenceTransformer(str(path), backend="onnx", device="cpu")
+        export_dynamic_quantized_onnx_model(onnx_model, ONNX_QUANTIZATION_CONFIG, str(path))
+    return path
+
+
+def _model_kwargs(backend: str):
+    return {"file_name": _int8_file()} if backend == "onnx-int8" else None
+
+
+def compare_to_reference(model: str, model_path: str, backend: str, model_kwargs=None, texts=CHECK_SENTENCES):
+    """Cosine similarity between each text's embedding from `backend` and from PyTorch."""
+    from sentence_transformers import SentenceTransformer
+
+    reference = SentenceTransformer(model, device="cpu").encode(texts, normalize_embeddings=True)
+    candidate = SentenceTransformer(model_path, backend="onnx", device="cpu", model_kwargs=model_kwargs)
+    embeddings = candidate.encode(texts, normalize_embeddings=True)
+    return np.sum(reference * embeddings, axis=1)
+
+
+def _check(model: str, path: Path, backend: str) -> bool:
+    checks_path = path / CHECK_FILE
+    checks = json.loads(checks_path.read_text()) if checks_path.exists() else {}
+    key = backend if backend == "onnx" else f"{backend}:{ONNX_QUANTIZATION_CONFIG}"
+    if key not in checks:
+        similarity = compare_to_reference(model, str(path), backend, _model_kwargs(backend))
+        checks[key] = {"min_cosine": float(similarity.min()), "mean_cosine": float(similarity.mean()),
+                       "tolerance": TOLERANCE[backend]}
+        checks_path.write_text(json.dumps(checks, indent=2))
+    result = checks[key]
+    print(f"[*] {backend} vs torch: min cosine {result['min_cosine']:.4f} (tolerance {result['tolerance']})")
+    return result["min_cosine"] >= result["tolerance"]
+
+
+# Returns (model, backend, model_kwargs) for the Haystack embedders. Runs the export and the
+# tolerance check the first time a backend is used; a backend that drifts too far from the
+# PyTorch vectors falls back to "torch" so queries stay comparable to the stored chunks.
+@functools.lru_cache(maxsize=None)
+def resolve(model: str, backend: str = EMBEDDING_BACKEND):
+    if backend not in BACKENDS:
+        raise ValueError(f"EMBEDDING_BACKEND must be one of {', '.join(BACKENDS)}, got {backend!r}")
+    if backend == "torch":
+        return model, "torch", None
+    path = _export(model, backend)
+    if not _check(model, path, backend):
+        print(f"[!] {backend} embeddings are outside tolerance, falling back to torch")
+        return model, "torch", None
+    return str(path), "onnx", _model_kwargs(backend)
+
+
+def text_embedder(model: str, backend: str = EMBEDDING_BACKEND, **kwargs):
+    model_path, st_backend, model_kwargs = resolve(model, backend)
+    return SentenceTransformersTextEmbedder(model=model_path, backend=st_backend, model_kwargs=model_kwargs,
+                                            **kwargs)
+
+
+def document_embedder(model: str, backend: str = EMBEDDING_BACKEND, **kwargs):
+    model_path, st_backend, model_kwargs = resolve(model, backend)
+    return SentenceTransformersDocumentEmbedder(model=model_path, backend=st_backend, model_kwargs=model_kwargs,
+                                                **kwargs)
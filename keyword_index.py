@@ -0,0 +1,140 @@
+import os
+import re
+import json
+import math
+from collections import Counter, defaultdict
+from typing import List, Optional
+from haystack import Document, component
+
+TURKISH_FOLD = str.maketrans("ığüşöçâîû", "igusocaiu")
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+STOPWORDS = {
+    "ve", "veya", "ile", "bir", "bu", "su", "o", "da", "de", "ki", "mi", "mu", "ne", "ya",
+    "yani", "iste", "icin", "gibi", "cok", "daha", "en", "ama", "ben", "sen", "biz", "siz",
+    "onlar", "olan", "olarak", "var", "yok", "sey", "her", "hem", "nasil", "neden", "diye",
+}
+
+
+def turkish_lower(text: str) -> str:
+    return text.replace("I", "ı").replace("İ", "i").lower()
+
+
+# Lowercases with Turkish dotted/dotless I rules, then folds diacritics so "nasıl",
+# "NASIL" and "nasil" all index to the same term.
+def tokenize(text: str) -> List[str]:
+    folded = turkish_lower(text).translate(TURKISH_FOLD)
+    return [t for t in TOKEN_RE.findall(folded) if len(t) > 1 and t not in STOPWORDS]
+
+
+def matches_filters(meta: dict, filters: Optional[dict]) -> bool:
+    if not filters:
+        return True
+    conditions = filters["conditions"] if filters.get("operator") == "AND" else [filters]
+    for cond in conditions:
+        value = meta.get(cond["field"].removeprefix("meta."))
+        if cond["operator"] == "==" and value != cond["value"]:
+            return False
+        if cond["operator"] == "in" and value not in cond["value"]:
+            return False
+        if cond["operator"] not in ("==", "in"):
+            raise ValueError(f"Unsupported filter operator: {cond['operator']}")
+    return True
+
+
+class KeywordIndex:
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.version = None
+        self.docs = []
+        self.doc_lengths = []
+        self.postings = {}
+        self.idf = {}
+        self.avg_length = 0.0
+
+    @classmethod
+    def build(cls, documents: List[Document], version: str = None, **kwargs):
+        index = cls(**kwargs)
+        index.version = version
+        postings = defaultdict(list)
+        for i, doc in enumerate(documents):
+            terms = Counter(tokenize(doc.content or ""))
+            for term, tf in terms.items():
+                postings[term].append((i, tf))
+            index.docs.append({"id": doc.id, "content": doc.content, "meta": doc.meta})
+            index.doc_lengths.append(sum(terms.values()))
+        index.postings = dict(postings)
+        index._finalize()
+        return index
+
+    def _finalize(self):
+        n = len(self.docs)
+        self.avg_length = sum(self.doc_lengths) / n if n else 0.0
+        self.idf = {
+            term: math.log(1 + (n - len(plist) + 0.5) / (len(plist) + 0.5))
+            for term, plist in self.postings.items()
+        }
+
+    def __len__(self):
+        return len(self.docs)
+
+    def search(self, query: str, top_k: int = 5, filters: Optional[dict] = None):
+        allowed = None
+        if filters:
+            allowed = {i for i, doc in enumerate(self.docs) if matches_filters(doc["meta"], filters)}
+
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for i, tf in self.postings[term]:
+                if allowed is not None and i not in allowed:
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[i] / self.avg_length)
+                scores[i] += idf * tf * (self.k1 + 1) / (tf + norm)
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+        return [
+            Document(id=self.docs[i]["id"], content=self.docs[i]["content"],
+                     meta=dict(self.docs[i]["meta"]), score=score)
+            for i, score in ranked
+        ]
+
+    def save(self, path: str):
+        payload = {
+            "version": self.version,
+            "k1": self.k1,
+            "b": self.b,
+            "docs": self.docs,
+            "doc_lengths": self.doc_lengths,
+            "postings": self.postings,
+        }
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str):
+        with open(path, "r", encoding="utf-8") as f:
+            payload = json.load(f)
+        index = cls(k1=payload["k1"], b=payload["b"])
+        index.version = payload["version"]
+        index.docs = payload["docs"]
+        index.doc_lengths = payload["doc_lengths"]
+        index.postings = {term: [tuple(p) for p in plist] for term, plist in payload["postings"].items()}
+        index._finalize()
+        return index
+
+
+@component
+class KeywordRetriever:
+    def __init__(self, index: KeywordIndex, top_k: int = 5):
+        self.index = index
+        self.top_k = top_k
+
+    @component.output_types(documents=List[Document])
+    def run(self, query: str, filters: Optional[dict] = None, top_k: Optional[int] = None):
+        return {"documents": self.index.search(query, top_k=top_k or self.top_k, filters=filters)}
@@ -0,0 +1,175 @@
+import os
+import time
+import bisect
+import threading
+import contextvars
+from collections import defaultdict
+from contextlib import contextmanager
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+PREFIX = "datacommit"
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+_lock = threading.Lock()
+_histograms = {}
+_counters = defaultdict(float)
+_collectors = []
+_request_timings = contextvars.ContextVar("request_timings", default=None)
+_request_usage = contextvars.ContextVar("request_usage", default=None)
+
+
+class _Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _labels(labels):
+    return ",".join(f'{k}="{v}"' for k, v in sorted(labels.items()))
+
+
+def observe(name, value, **labels):
+    if not METRICS_ENABLED:
+        return
+    key = (name, _labels(labels))
+    with _lock:
+        hist = _histograms.get(key)
+        if hist is None:
+            hist = _histograms[key] = _Histogram()
+        hist.observe(value)
+
+
+def inc(name, value=1, **labels):
+    if not METRICS_ENABLED:
+        return
+    with _lock:
+        _counters[(name, _labels(labels))] += value
+
+
+@contextmanager
+def _timed(stage):
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        inc("stage_errors_total", stage=stage)
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        observe("stage_duration_seconds", elapsed, stage=stage)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings.append((stage, elapsed))
+
+
+@contextmanager
+def _noop():
+    yield
+
+
+def timed(stage):
+    return _timed(stage) if METRICS_ENABLED else _noop()
+
+
+# prompt_token_count includes the cached part; cached tokens are the input-token savings
+def count_tokens(usage):
+    if not METRICS_ENABLED or usage is None:
+        return
+    counts = {
+        "in": getattr(usage, "prompt_token_count", None) or 0,
+        "cached": getattr(usage, "cached_content_token_count", None) or 0,
+        "out": getattr(usage, "candidates_token_count", None) or 0,
+    }
+    for direction, count in counts.items():
+        if count:
+            inc("llm_tokens_total", count, direction=direction)
+    totals = _request_usage.get()
+    if totals is not None:
+        for direction, count in counts.items():
+            totals[direction] += count
+
+
+# Collectors are called at scrape time and return [(name, type, labels, value)], so stats
+# that components already keep (cache hit counters etc.) cost nothing on the hot path.
+def register_collector(fn):
+    _collectors.append(fn)
+
+
+def begin_request():
+    if METRICS_ENABLED:
+        _request_timings.set([])
+        _request_usage.set({"in": 0, "cached": 0, "out": 0})
+
+
+# Gemini tokens used by the current request: {"input_tokens", "cached_tokens", "output_tokens"}
+def request_usage():
+    totals = _request_usage.get()
+    if not totals:
+        return None
+    return {"input_tokens": totals["in"], "cached_tokens": totals["cached"], "output_tokens": totals["out"]}
+
+
+def server_timing():
+    timings = _request_timings.get()
+    if not timings:
+        return None
+    totals = defaultdict(float)
+    for stage, elapsed in timings:
+        totals[stage] += elapsed
+    return ", ".join(f"{stage};dur={elapsed * 1000:.1f}" for stage, elapsed in totals.items())
+
+
+# Full precision: "%g" rounds to 6 digits, so a large counter would stop moving between scrapes
+def _format_value(value):
+    if isinstance(value, bool) or isinstance(value, int):
+        return str(int(value))
+    value = float(value)
+    if value != value:
+        return "NaN"
+    if value in (float("inf"), float("-inf")):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(value)
+
+
+def render_prometheus():
+    lines = []
+    with _lock:
+        histograms = sorted(_histograms.items())
+        counters = sorted(_counters.items())
+
+    typed = set()
+    for (name, labels), hist in histograms:
+        metric = f"{PREFIX}_{name}"
+        if metric not in typed:
+            lines.append(f"# TYPE {metric} histogram")
+            typed.add(metric)
+        sep = "," if labels else ""
+        cumulative = 0
+        for bound, count in zip(BUCKETS + ("+Inf",), hist.counts):
+            cumulative += count
+            lines.append(f'{metric}_bucket{{{labels}{sep}le="{bound}"}} {cumulative}')
+        lines.append(f"{metric}_sum{{{labels}}} {hist.sum}")
+        lines.append(f"{metric}_count{{{labels}}} {hist.count}")
+
+    for (name, labels), value in counters:
+        metric = f"{PREFIX}_{name}"
+        if metric not in typed:
+            lines.append(f"# TYPE {metric} counter")
+            typed.add(metric)
+        lines.append(f"{metric}{{{labels}}} {_format_value(value)}")
+
+    for collector in _collectors:
+        for name, kind, labels, value in collector():
+            metric = f"{PREFIX}_{name}"
+            if metric not in typed:
+                lines.append(f"# TYPE {metric} {kind}")
+                typed.add(metric)
+            lines.append(f"{metric}{{{_labels(labels)}}} {_format_value(value)}")
+
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,281 @@
+import os
+import copy
+import json
+import time
+from typing import Any, Dict, List, Optional
+import numpy as np
+from haystack import Document, component
+
+VECTORS_FILE = "vectors.npy"
+META_FILE = "meta.json"
+CODES_FILES = {"int8": "codes_int8.npy", "binary": "codes_binary.npy"}
+SCALES_FILE = "scales_int8.npy"
+
+# "none" keeps only the float32 matrix; "int8" (1 byte/dim) and "binary" (1 bit/dim) keep
+# compact codes in RAM for a candidate scan and read float rows from disk only for rescoring
+QUANTIZATION_MODES = ("none", "int8", "binary")
+RESCORE_FACTOR = 10
+SCAN_BLOCK_ROWS = 65536
+# Queries scored per matrix product in search_batch; bounds the (chunks x queries) score block
+QUERY_BLOCK = 64
+
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def _normalize(matrix):
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+def quantize(vectors, mode: str):
+    """Returns (codes, scales) for normalized float vectors; scales is only used by int8."""
+    if mode == "none":
+        return None, None
+    if mode == "int8":
+        # Symmetric per-dimension scale so every dimension uses the full [-127, 127] range
+        scales = np.maximum(np.abs(vectors).max(axis=0), 1e-12) / 127
+        codes = np.clip(np.rint(vectors / scales), -127, 127).astype(np.int8)
+        return codes, scales.astype(np.float32)
+    if mode == "binary":
+        return np.packbits(np.asarray(vectors) > 0, axis=1), None
+    raise ValueError(f"Unknown quantization mode: {mode} (expected one of {', '.join(QUANTIZATION_MODES)})")
+
+
+class NumpyIndex:
+    """Exact cosine search over all chunk embeddings held in one float32 matrix.
+
+    Vectors are L2-normalized at build time and stored as a .npy file that is
+    memory-mapped on load, so forked workers share the same pages. Metadata lives in
+    arrays parallel to the matrix rows.
+
+    With quantization enabled, search is two-stage: the int8 or binary codes are scanned
+    for top_k * rescore_factor candidates, and only those rows of the float matrix are read
+    to compute the exact cosine scores that decide the final ranking.
+    """
+
+    def __init__(self, vectors, ids, contents, metas, version=None, quantization="none", codes=None,
+                 scales=None, rescore_factor: int = RESCORE_FACTOR):
+        self.vectors = vectors
+        self.ids = ids
+        self.contents = contents
+        self.metas = metas
+        self.version = version
+        self.quantization = quantization
+        self.codes = codes
+        self.scales = scales
+        self.rescore_factor = rescore_factor
+        self.episodes = np.array([m.get("episode", -1) for m in metas], dtype=np.int32)
+        self.guests = np.array([m.get("guest", "") for m in metas], dtype=object)
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def build(cls, documents: List[Document], embeddings: Dict[str, List[float]], version: str = None,
+              quantization: str = "none"):
+        docs = [doc for doc in documents if doc.id in embeddings]
+        vectors = _normalize(np.asarray([embeddings[doc.id] for doc in docs], dtype=np.float32).reshape(len(docs), -1))
+        codes, scales = quantize(vectors, quantization)
+        return cls(
+            vectors=vectors,
+            ids=[doc.id for doc in docs],
+            contents=[doc.content for doc in docs],
+            metas=[dict(doc.meta) for doc in docs],
+            version=version,
+            quantization=quantization,
+            codes=codes,
+            scales=scales
+        )
+
+    # Same rows and metadata, different candidate stage; used to compare modes side by side
+    def quantized(self, mode: str):
+        clone = copy.copy(self)
+        clone.quantization = mode
+        clone.codes, clone.scales = quantize(self.vectors, mode)
+        return clone
+
+    def embeddings(self) -> Dict[str, np.ndarray]:
+        return {doc_id: self.vectors[i] for i, doc_id in enumerate(self.ids)}
+
+    # Bytes that stay hot in RAM for a query: the codes when quantized, the float matrix otherwise
+    def resident_bytes(self):
+        if self.quantization == "none":
+            return self.vectors.nbytes
+        return self.codes.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def save(self, path: str):
+        os.makedirs(path, exist_ok=True)
+        arrays = {VECTORS_FILE: np.ascontiguousarray(self.vectors, dtype=np.float32)}
+        if self.quantization != "none":
+            arrays[CODES_FILES[self.quantization]] = self.codes
+        if self.quantization == "int8":
+            arrays[SCALES_FILE] = self.scales
+        for name, array in arrays.items():
+            with open(os.path.join(path, name + ".tmp"), "wb") as f:
+                np.save(f, array)
+        tmp_meta = os.path.join(path, META_FILE + ".tmp")
+        with open(tmp_meta, "w", encoding="utf-8") as f:
+            json.dump({"version": self.version, "quantization": self.quantization, "ids": self.ids,
+                       "contents": self.contents, "metas": self.metas}, f, ensure_ascii=False)
+        for name in arrays:
+            os.replace(os.path.join(path, name + ".tmp"), os.path.join(path, name))
+        os.replace(tmp_meta, os.path.join(path, META_FILE))
+        for name in set(CODES_FILES.values()) | {SCALES_FILE}:
+            if name not in arrays and os.path.exists(os.path.join(path, name)):
+                os.remove(os.path.join(path, name))
+
+    # The float matrix stays memory-mapped (only rescored rows are paged in when quantized);
+    # the codes are read fully into memory since every query scans all of them.
+    @classmethod
+    def load(cls, path: str, mmap: bool = True):
+        vectors = np.load(os.path.join(path, VECTORS_FILE), mmap_mode="r" if mmap else None)
+        with open(os.path.join(path, META_FILE), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        quantization = meta.get("quantization", "none")
+        codes = scales = None
+        if quantization != "none":
+            codes = np.load(os.path.join(path, CODES_FILES[quantization]))
+        if quantization == "int8":
+            scales = np.load(os.path.join(path, SCALES_FILE))
+        return cls(vectors, meta["ids"], meta["contents"], meta["metas"], version=meta.get("version"),
+                   quantization=quantization, codes=codes, scales=scales)
+
+    @staticmethod
+    def exists(path: str):
+        return os.path.exists(os.path.join(path, VECTORS_FILE)) and os.path.exists(os.path.join(path, META_FILE))
+
+    # Supports the Haystack filter shapes this app produces: a single comparison or an AND of
+    # comparisons on meta.episode / meta.guest with "==" or "in".
+    def mask(self, filters: Optional[Dict[str, Any]]):
+        if not filters:
+            return None
+        conditions = filters["conditions"] if filters.get("operator") == "AND" else [filters]
+        mask = np.ones(len(self.ids), dtype=bool)
+        for cond in conditions:
+            field = cond["field"].removeprefix("meta.")
+            column = {"episode": self.episodes, "guest": self.guests}.get(field)
+            if column is None:
+                raise ValueError(f"Unsupported filter field: {cond['field']}")
+            if cond["operator"] == "==":
+                mask &= column == cond["value"]
+            elif cond["operator"] == "in":
+                mask &= np.isin(column, list(cond["value"]))
+            else:
+                raise ValueError(f"Unsupported filter operator: {cond['operator']}")
+        return mask
+
+    # Approximate scores from the codes, scanned in blocks so the upcast copy stays small.
+    # int8: codes . (query * scales) approximates the float dot product; binary: negated
+    # Hamming distance between sign bits.
+    def _candidate_scores(self, query):
+        blocks = range(0, len(self.ids), SCAN_BLOCK_ROWS)
+        if self.quantization == "int8":
+            weights = query * self.scales
+            return np.concatenate([self.codes[i:i + SCAN_BLOCK_ROWS].astype(np.float32) @ weights for i in blocks])
+        bits = np.packbits(query > 0)
+        distances = [_POPCOUNT[np.bitwise_xor(self.codes[i:i + SCAN_BLOCK_ROWS], bits)].sum(axis=1, dtype=np.int32)
+                     for i in blocks]
+        return -np.concatenate(distances).astype(np.float32)
+
+    def search(self, query_embedding, top_k: int = 5, filters: Optional[Dict[str, Any]] = None):
+        if len(self.ids) == 0:
+            return []
+        query = _normalize(np.asarray(query_embedding, dtype=np.float32))
+
+        mask = self.mask(filters)
+        allowed = len(self.ids) if mask is None else int(mask.sum())
+        top_k = min(top_k, allowed)
+        if top_k <= 0:
+            return []
+
+        if self.quantization == "none":
+            rows = np.arange(len(self.ids))
+            scores = self.vectors @ query
+            if mask is not None:
+                scores = np.where(mask, scores, -np.inf)
+        else:
+            candidates = self._candidate_scores(query)
+            if mask is not None:
+                candidates = np.where(mask, candidates, -np.inf)
+            n_candidates = min(allowed, top_k * self.rescore_factor)
+            # Sorted row order keeps the reads from the memory-mapped float matrix sequential
+            rows = np.sort(np.argpartition(-candidates, n_candidates - 1)[:n_candidates])
+            scores = self.vectors[rows] @ query
+
+        top = np.argpartition(-scores, top_k - 1)[:top_k]
+        top = top[np.argsort(-scores[top])]
+        return self._documents(rows[top], scores[top])
+
+    def _documents(self, rows, scores):
+        return [
+            Document(id=self.ids[i], content=self.contents[i], meta=dict(self.metas[i]), score=float(score))
+            for i, score in zip(rows, scores)
+        ]
+
+    # Scores a block of queries with one matrix product instead of one pass over the matrix per
+    # query. Quantized indexes already touch only a few float rows per query, so they fall back
+    # to per-query two-stage search.
+    def search_batch(self, query_embeddings, top_k: int = 5, filters: Optional[Dict[str, Any]] = None):
+        if self.quantization != "none" or len(self.ids) == 0:
+            return [self.search(q, top_k=top_k, filters=filters) for q in query_embeddings]
+        queries = _normalize(np.asarray(query_embeddings, dtype=np.float32).reshape(len(query_embeddings), -1))
+
+        mask = self.mask(filters)
+        top_k = min(top_k, len(self.ids) if mask is None else int(mask.sum()))
+        if top_k <= 0:
+            return [[] for _ in query_embeddings]
+
+        results = []
+        for start in range(0, len(queries), QUERY_BLOCK):
+            scores = self.vectors @ queries[start:start + QUERY_BLOCK].T
+            if mask is not None:
+                scores[~mask] = -np.inf
+            tops = np.argpartition(-scores, top_k - 1, axis=0)[:top_k]
+            for j in range(scores.shape[1]):
+                column, rows = scores[:, j], tops[:, j]
+                rows = rows[np.argsort(-column[rows])]
+                results.append(self._documents(rows, column[rows]))
+        return results
+
+
+def _percentile_ms(values, q):
+    return float(np.percentile(values, q)) * 1000 if values else None
+
+
+# Recall@k of each quantized mode against exact float search over the same rows, plus
+# per-query latency and the bytes each mode keeps in RAM
+def evaluate_quantization(index: NumpyIndex, queries, top_k: int = 5, modes=("int8", "binary")):
+    report = {}
+    truth = None
+    for mode in ("none",) + tuple(m for m in modes if m != "none"):
+        variant = index if index.quantization == mode else index.quantized(mode)
+        found, latencies = [], []
+        for query in queries:
+            start = time.perf_counter()
+            docs = variant.search(query, top_k=top_k)
+            latencies.append(time.perf_counter() - start)
+            found.append({doc.id for doc in docs})
+        if truth is None:
+            truth = found
+        expected = sum(len(ids) for ids in truth)
+        report[mode] = {
+            "recall": sum(len(a & b) for a, b in zip(found, truth)) / expected if expected else None,
+            "p50_ms": _percentile_ms(latencies, 50),
+            "p95_ms": _percentile_ms(latencies, 95),
+            "resident_mb": variant.resident_bytes() / 2 ** 20,
+        }
+    return report
+
+
+@component
+class NumpyEmbeddingRetriever:
+    def __init__(self, index: NumpyIndex, top_k: int = 5, filters: Optional[Dict[str, Any]] = None):
+        self.index = index
+        self.top_k = top_k
+        self.filters = filters
+
+    @component.output_types(documents=List[Document])
+    def run(self, query_embedding: List[float], filters: Optional[Dict[str, Any]] = None,
+            top_k: Optional[int] = None):
+        return {"documents": self.index.search(query_embedding, top_k=top_k or self.top_k,
+                                               filters=filters or self.filters)}
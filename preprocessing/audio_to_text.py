@@ -2,16 +2,19 @@ import whisper
 import os
 import torch
 
-def audio_to_text(audio_file_path, output_path="transcriptions", model_size="turbo"):
+def audio_to_text(audio_file_path, output_path="transcriptions", model_size="turbo", model=None):
     os.makedirs(output_path, exist_ok=True)
 
     audio_file_path = os.path.abspath(audio_file_path)
 
-    DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
-    print(f"Using device: {DEVICE}")
+    if model is None:
+        DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
+        print(f"Using device: {DEVICE}")
 
-    print(f"Loading Whisper {model_size} model on {DEVICE}...")
-    model = whisper.load_model(model_size, device=DEVICE)
+        print(f"Loading Whisper {model_size} model on {DEVICE}...")
+        model = whisper.load_model(model_size, device=DEVICE)
+    else:
+        DEVICE = model.device.type
 
     print(f"Transcribing with timestamps: {audio_file_path}")
 
@@ -3,9 +3,19 @@ import os
 import torch
 import librosa
 import numpy as np
+from itertools import permutations
+from concurrent.futures import ProcessPoolExecutor
 from sklearn.cluster import KMeans
 from sklearn.preprocessing import StandardScaler
 
+# librosa defaults used by mfcc / spectral_centroid / spectral_rolloff / zero_crossing_rate
+N_FFT = 2048
+HOP_LENGTH = 512
+MIN_SEGMENT_SAMPLES = 512
+# Frames per STFT block, so the whole-file spectrogram is never held as one complex matrix
+BLOCK_FRAMES = 8192
+
+
 def extract_speaker_features(audio_path, start_time, end_time, sr=16000):
     y, _ = librosa.load(audio_path, sr=sr, offset=start_time, duration=end_time-start_time)
 
@@ -28,21 +38,147 @@ def extract_speaker_features(audio_path, start_time, end_time, sr=16000):
 
     return features
 
-def audio_to_text_with_speakers(audio_file_path, output_path="transcriptions", model_size="turbo", n_speakers=2):
+
+def decode_audio(audio_path, sr=16000, cache_dir=None):
+    """Decodes the whole file once to mono float32 at `sr` and caches it as a memory-mapped .npy."""
+    name = os.path.splitext(os.path.basename(audio_path))[0]
+    cache_path = os.path.join(cache_dir or os.path.dirname(audio_path), f"{name}.{sr}hz.npy")
+    if not os.path.exists(cache_path) or os.path.getmtime(cache_path) < os.path.getmtime(audio_path):
+        print(f"Decoding {audio_path} once at {sr} Hz...")
+        y, _ = librosa.load(audio_path, sr=sr)
+        with open(cache_path + ".tmp", "wb") as f:
+            np.save(f, y.astype(np.float32))
+        os.replace(cache_path + ".tmp", cache_path)
+    return cache_path
+
+
+# Samples [start, stop) of the signal zero-padded by N_FFT // 2 on both sides, i.e. the
+# framing librosa uses with center=True
+def _padded_slice(y, start, stop):
+    pad = N_FFT // 2
+    out = np.zeros(stop - start, dtype=np.float32)
+    src_start, src_stop = max(start - pad, 0), min(stop - pad, len(y))
+    if src_stop > src_start:
+        out[src_start - (start - pad):src_stop - (start - pad)] = y[src_start:src_stop]
+    return out
+
+
+_worker_audio = None
+
+
+def _init_feature_worker(decoded_path):
+    global _worker_audio
+    _worker_audio = np.load(decoded_path, mmap_mode="r")
+
+
+def _block_features(frame_range, sr=16000):
+    first, last = frame_range
+    block = _padded_slice(_worker_audio, first * HOP_LENGTH, (last - 1) * HOP_LENGTH + N_FFT)
+    magnitude = np.abs(librosa.stft(block, n_fft=N_FFT, hop_length=HOP_LENGTH, center=False))
+    mel_power = librosa.feature.melspectrogram(S=magnitude ** 2, sr=sr)
+    centroid = librosa.feature.spectral_centroid(S=magnitude, sr=sr)[0]
+    rolloff = librosa.feature.spectral_rolloff(S=magnitude, sr=sr)[0]
+    zcr = librosa.feature.zero_crossing_rate(block, frame_length=N_FFT, hop_length=HOP_LENGTH, center=False)[0]
+    return mel_power, np.stack([centroid, rolloff, zcr])
+
+
+def frame_features(decoded_path, sr=16000, workers=1):
+    """Mel power spectrogram and centroid/rolloff/ZCR for every frame of the file, computed once.
+
+    Blocks of BLOCK_FRAMES frames are framed exactly like one centered pass over the whole
+    signal, so the result does not depend on the block size or on `workers`.
+    """
+    n_samples = len(np.load(decoded_path, mmap_mode="r"))
+    n_frames = 1 + n_samples // HOP_LENGTH
+    blocks = [(first, min(first + BLOCK_FRAMES, n_frames)) for first in range(0, n_frames, BLOCK_FRAMES)]
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_feature_worker,
+                                 initargs=(decoded_path,)) as pool:
+            results = list(pool.map(_block_features, blocks, [sr] * len(blocks)))
+    else:
+        _init_feature_worker(decoded_path)
+        results = [_block_features(block, sr) for block in blocks]
+    return np.concatenate([r[0] for r in results], axis=1), np.concatenate([r[1] for r in results], axis=1), n_samples
+
+
+def segment_features(segments, mel_power, spectral, n_samples, sr=16000):
+    """Per-segment features from the precomputed frames; same layout as extract_speaker_features().
+
+    Centroid/rolloff/ZCR means come from prefix sums for all segments at once. MFCCs are taken
+    from each segment's slice of the mel spectrogram, with the dB floor relative to that
+    segment's loudest frame, as a per-segment mfcc() call would do.
+    """
+    starts = np.array([int(round(seg["start"] * sr)) for seg in segments])
+    ends = np.minimum(np.array([int(round(seg["end"] * sr)) for seg in segments]), n_samples)
+    lengths = ends - starts
+    valid = lengths >= MIN_SEGMENT_SAMPLES
+
+    n_frames = mel_power.shape[1]
+    first = np.clip(np.rint(starts / HOP_LENGTH).astype(int), 0, n_frames - 1)
+    last = np.minimum(first + 1 + np.maximum(lengths, 0) // HOP_LENGTH, n_frames)
+
+    prefix = np.concatenate([np.zeros((3, 1)), np.cumsum(spectral, axis=1, dtype=np.float64)], axis=1)
+    spectral_means = ((prefix[:, last] - prefix[:, first]) / (last - first)).T
+
+    features = []
+    for i in np.flatnonzero(valid):
+        mfcc = librosa.feature.mfcc(S=librosa.power_to_db(mel_power[:, first[i]:last[i]]), n_mfcc=13)
+        features.append(np.concatenate([mfcc.mean(axis=1), mfcc.std(axis=1), spectral_means[i]]))
+    return features, [segments[i] for i in np.flatnonzero(valid)]
+
+
+def cluster_speakers(features_list, n_speakers):
+    features_array = np.array(features_list)
+
+    scaler = StandardScaler()
+    features_scaled = scaler.fit_transform(features_array)
+
+    print(f"Clustering into {n_speakers} speakers using K-Means...")
+    kmeans = KMeans(n_clusters=n_speakers, random_state=42, n_init=10)
+    return kmeans.fit_predict(features_scaled)
+
+
+# Runs the original per-segment extraction (re-decoding the file for every segment) and
+# reports how many segments end up with a different speaker label than the fast path.
+def verify_against_per_segment(audio_file_path, segments, speakers, n_speakers, sr=16000):
+    features_list, valid_segments = [], []
+    for segment in segments:
+        features = extract_speaker_features(audio_file_path, segment["start"], segment["end"], sr=sr)
+        if features is not None:
+            features_list.append(features)
+            valid_segments.append(segment)
+    reference = cluster_speakers(features_list, n_speakers) if len(features_list) >= n_speakers \
+        else [0] * len(valid_segments)
+    if [s["id"] for s in valid_segments] != [s["id"] for s in segments]:
+        print("Verify: the two paths kept different segments")
+        return False
+    mismatches = sum(int(a) != int(b) for a, b in zip(reference, speakers))
+    relabelled = min(sum(perm[int(a)] != int(b) for a, b in zip(reference, speakers))
+                     for perm in permutations(range(n_speakers)))
+    print(f"Verify: {mismatches} of {len(speakers)} segments labelled differently from the per-segment path "
+          f"({relabelled} if speaker numbers are swapped)")
+    return mismatches == 0
+
+
+def audio_to_text_with_speakers(audio_file_path, output_path="transcriptions", model_size="turbo", n_speakers=2,
+                                workers=1, verify=False, model=None):
     os.makedirs(output_path, exist_ok=True)
 
     audio_file_path = os.path.abspath(audio_file_path)
 
-    DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
-    print(f"=" * 60)
-    print(f"WHISPER MODEL: Using {DEVICE.upper()} device")
-    if DEVICE == "cuda":
-        print(f"GPU Name: {torch.cuda.get_device_name(0)}")
-        print(f"GPU Memory: {torch.cuda.get_device_properties(0).total_memory / 1024**3:.2f} GB")
-    print(f"=" * 60)
+    if model is None:
+        DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
+        print(f"=" * 60)
+        print(f"WHISPER MODEL: Using {DEVICE.upper()} device")
+        if DEVICE == "cuda":
+            print(f"GPU Name: {torch.cuda.get_device_name(0)}")
+            print(f"GPU Memory: {torch.cuda.get_device_properties(0).total_memory / 1024**3:.2f} GB")
+        print(f"=" * 60)
 
-    print(f"\nLoading Whisper '{model_size}' model on {DEVICE.upper()}...")
-    model = whisper.load_model(model_size, device=DEVICE)
+        print(f"\nLoading Whisper '{model_size}' model on {DEVICE.upper()}...")
+        model = whisper.load_model(model_size, device=DEVICE)
+    else:
+        DEVICE = model.device.type
 
     print(f"Transcribing audio with GPU acceleration: {audio_file_path}\n")
 
@@ -59,32 +195,20 @@ def audio_to_text_with_speakers(audio_file_path, output_path="transcriptions", m
     print(f"{'='*60}\n")
 
     print(f"Extracting speaker features from {len(result['segments'])} segments...")
-    features_list = []
-    valid_segments = []
-
-    for segment in result["segments"]:
-        start = segment["start"]
-        end = segment["end"]
-
-        features = extract_speaker_features(audio_file_path, start, end)
-        if features is not None:
-            features_list.append(features)
-            valid_segments.append(segment)
+    decoded_path = decode_audio(audio_file_path)
+    mel_power, spectral, n_samples = frame_features(decoded_path, workers=workers)
+    features_list, valid_segments = segment_features(result["segments"], mel_power, spectral, n_samples)
 
     if len(features_list) < n_speakers:
         print(f"Warning: Not enough segments ({len(features_list)}) for {n_speakers} speakers. Using all segments as single speaker.")
         speakers = [0] * len(valid_segments)
     else:
-        features_array = np.array(features_list)
-
-        scaler = StandardScaler()
-        features_scaled = scaler.fit_transform(features_array)
-
-        print(f"Clustering into {n_speakers} speakers using K-Means...")
-        kmeans = KMeans(n_clusters=n_speakers, random_state=42, n_init=10)
-        speakers = kmeans.fit_predict(features_scaled)
+        speakers = cluster_speakers(features_list, n_speakers)
         print(f"✓ Successfully identified {len(set(speakers))} speakers\n")
 
+    if verify:
+        verify_against_per_segment(audio_file_path, valid_segments, speakers, n_speakers)
+
     filename = os.path.splitext(os.path.basename(audio_file_path))[0]
 
     output_file_full = f"{output_path}/{filename}_full.txt"
@@ -0,0 +1,159 @@
+import os
+import json
+import glob
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+AUDIO_EXTENSIONS = (".mp3", ".wav", ".m4a", ".flac", ".ogg")
+MANIFEST_NAME = "transcription_manifest.json"
+
+
+def collect_audio_files(inputs):
+    files = []
+    for path in inputs:
+        if os.path.isdir(path):
+            files.extend(sorted(f for f in glob.glob(os.path.join(path, "*")) if f.lower().endswith(AUDIO_EXTENSIONS)))
+        elif os.path.isfile(path):
+            files.append(path)
+        else:
+            print(f"Skipping {path}: not found")
+    return list(dict.fromkeys(os.path.abspath(f) for f in files))
+
+
+def load_manifest(path):
+    if not os.path.exists(path):
+        return {"episodes": {}}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(manifest, path):
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+# Size + mtime identify the audio file; re-downloading an episode changes both
+def file_signature(path):
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def job_settings(model_size="turbo", speakers=False, n_speakers=2):
+    return {"model_size": model_size, "speakers": speakers, "n_speakers": n_speakers if speakers else None}
+
+
+def is_done(manifest, audio_path, settings):
+    entry = manifest["episodes"].get(audio_path)
+    return (entry is not None and entry.get("status") == "done" and entry.get("settings") == settings
+            and entry.get("source") == file_signature(audio_path)
+            and all(os.path.exists(out) for out in entry.get("outputs", [])))
+
+
+_worker_model = None
+
+
+def load_model(model_size, device=None, torch_threads=None):
+    import torch
+    import whisper
+    if torch_threads:
+        torch.set_num_threads(torch_threads)
+    device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+    print(f"[pid {os.getpid()}] Loading Whisper '{model_size}' model on {device.upper()}...")
+    return whisper.load_model(model_size, device=device)
+
+
+def _init_worker(model_size, device, torch_threads):
+    global _worker_model
+    _worker_model = load_model(model_size, device, torch_threads)
+
+
+def transcribe_one(audio_path, output_path, settings):
+    started = time.perf_counter()
+    filename = os.path.splitext(os.path.basename(audio_path))[0]
+    if settings["speakers"]:
+        from preprocessing.audio_to_text_with_speakers import audio_to_text_with_speakers
+        audio_to_text_with_speakers(audio_path, output_path, settings["model_size"], n_speakers=settings["n_speakers"],
+                                    model=_worker_model)
+        suffixes = ("_full.txt", "_with_speakers.txt", "_speakers.txt")
+    else:
+        from preprocessing.audio_to_text import audio_to_text
+        audio_to_text(audio_path, output_path, settings["model_size"], model=_worker_model)
+        suffixes = ("_full.txt", "_timestamps.txt")
+    return {
+        "outputs": [os.path.abspath(os.path.join(output_path, filename + suffix)) for suffix in suffixes],
+        "seconds": round(time.perf_counter() - started, 1),
+    }
+
+
+# One model per process: in-process (GPU or a single CPU worker) or N CPU worker processes,
+# each loading its own copy once and then pulling episodes from the shared queue. The manifest
+# is only written here in the parent, after each finished episode.
+def batch_transcribe(audio_files, output_path="transcriptions", manifest=None, workers=1, model_size="turbo",
+                     speakers=False, n_speakers=2):
+    os.makedirs(output_path, exist_ok=True)
+    manifest_path = manifest or os.path.join(output_path, MANIFEST_NAME)
+    manifest = load_manifest(manifest_path)
+    settings = job_settings(model_size, speakers, n_speakers)
+
+    pending = [f for f in audio_files if not is_done(manifest, f, settings)]
+    print(f"{len(audio_files)} audio files, {len(audio_files) - len(pending)} already transcribed, "
+          f"{len(pending)} to go")
+    if not pending:
+        return manifest
+
+    def record(audio_path, outcome=None, error=None):
+        entry = {"settings": settings, "source": file_signature(audio_path), "finished_at": time.time()}
+        if error is None:
+            entry.update(status="done", **outcome)
+            print(f"✓ {os.path.basename(audio_path)} ({outcome['seconds']}s)")
+        else:
+            entry.update(status="failed", error=error)
+            print(f"✗ {os.path.basename(audio_path)}: {error}")
+        manifest["episodes"][audio_path] = entry
+        save_manifest(manifest, manifest_path)
+
+    if workers <= 1:
+        _init_worker(model_size, None, None)
+        for audio_path in pending:
+            try:
+                record(audio_path, transcribe_one(audio_path, output_path, settings))
+            except Exception as e:
+                record(audio_path, error=str(e))
+        return manifest
+
+    torch_threads = max(1, (os.cpu_count() or workers) // workers)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(model_size, "cpu", torch_threads)) as pool:
+        futures = {pool.submit(transcribe_one, audio_path, output_path, settings): audio_path for audio_path in pending}
+        for future in as_completed(futures):
+            try:
+                record(futures[future], future.result())
+            except Exception as e:
+                record(futures[future], error=str(e))
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Transcribe many episodes with one Whisper model load")
+    parser.add_argument("inputs", nargs="+", help="audio files and/or directories of audio files")
+    parser.add_argument("--output", default="transcriptions")
+    parser.add_argument("--model-size", default="turbo")
+    parser.add_argument("--speakers", action="store_true", help="also run speaker diarization")
+    parser.add_argument("--n-speakers", type=int, default=2)
+    parser.add_argument("--workers", type=int, default=1,
+                        help="CPU worker processes, each with its own model (1 = in-process, uses GPU if present)")
+    parser.add_argument("--manifest", help=f"manifest path (default: <output>/{MANIFEST_NAME})")
+    args = parser.parse_args()
+
+    audio_files = collect_audio_files(args.inputs)
+    manifest = batch_transcribe(audio_files, args.output, manifest=args.manifest, workers=args.workers,
+                                model_size=args.model_size, speakers=args.speakers, n_speakers=args.n_speakers)
+    failed = [path for path in audio_files if manifest["episodes"].get(path, {}).get("status") == "failed"]
+    if failed:
+        print(f"{len(failed)} episode(s) failed; rerun the same command to retry them")
+
+
+if __name__ == "__main__":
+    main()
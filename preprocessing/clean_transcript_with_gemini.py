@@ -1,13 +1,30 @@
 import os
+import re
+import json
 import time
+import random
+import hashlib
+import argparse
+import threading
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-import google.generativeai as genai
+from rate_limit import RateLimiter
 
 load_dotenv()
 
-GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
-genai.configure(api_key=GEMINI_API_KEY)
+GEMINI_MODEL = 'gemini-2.5-flash'
+GENERATION_CONFIG = {
+    'temperature': 0.3,
+    'top_p': 0.95,
+}
+
+# Gemini calls started per minute (the old fixed 4.5 s pause was ~13/min), calls in flight, and
+# retries per chunk before a lane gives up
+REQUESTS_PER_MINUTE = 13
+CONCURRENCY = 4
+MAX_RETRIES = 3
+CONTEXT_LINES = 10
 
 SYSTEM_PROMPT = """You are an expert Turkish transcript editor specializing in conversation analysis and correction.
 
@@ -94,18 +111,7 @@ def chunk_transcript(content, chunk_size=40):
     return chunks
 
 
-def clean_chunk_with_gemini(chunk, previous_context="", is_first_chunk=False):
-    model = genai.GenerativeModel(
-        'gemini-2.5-flash',
-        generation_config={
-            'temperature': 0.3,
-            'top_p': 0.95,
-        }
-    )
-    
-    first_chunk_instruction = ""
-    if is_first_chunk:
-        first_chunk_instruction = """
+FIRST_CHUNK_INSTRUCTION = """
 SPECIAL INSTRUCTION FOR FIRST CHUNK:
 - This is the beginning of the conversation
 - Identify who is the MAIN HOST (the person who welcomes everyone, introduces the show/topic)
@@ -113,15 +119,25 @@ SPECIAL INSTRUCTION FOR FIRST CHUNK:
 - Assign other participant(s) as [Speaker 2]:
 - IGNORE the original speaker labels completely - reassign based on who is actually speaking
 """
+
+LANE_START_INSTRUCTION = """
+NOTE ON CONTEXT:
+- The previous context above is the raw, uncleaned transcript (its speaker labels may be wrong)
+- The MAIN HOST of the show is always [Speaker 1]:, the guest is [Speaker 2]:
+"""
+
+
+def build_prompt(chunk, previous_context="", is_first_chunk=False, raw_context=False):
+    instruction = FIRST_CHUNK_INSTRUCTION if is_first_chunk else (LANE_START_INSTRUCTION if raw_context else "")
     
-    prompt = f"""{SYSTEM_PROMPT}
+    return f"""{SYSTEM_PROMPT}
 
 Previous context (for continuity):
 {previous_context}
 
 Current transcript to clean:
 {chunk}
-{first_chunk_instruction}
+{instruction}
 
 IMPORTANT ANALYSIS STEPS:
 1. Read the entire chunk first
@@ -136,9 +152,45 @@ IMPORTANT ANALYSIS STEPS:
 6. Only switch speakers at genuine conversation turns
 
 Output only the cleaned transcript with [Speaker 1]: and [Speaker 2]: labels."""
+
+
+class GeminiModel:
+    """One configured Gemini model shared by all chunks and threads."""
+    
+    def __init__(self, model_name=GEMINI_MODEL):
+        import google.generativeai as genai
+        genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
+        self.model = genai.GenerativeModel(model_name, generation_config=GENERATION_CONFIG)
+    
+    def generate(self, prompt):
+        return self.model.generate_content(prompt).text.strip()
+
+
+class FakeModel:
+    """Offline stand-in: echoes the chunk after a delay, for dry runs and tests of the engine."""
+    
+    def __init__(self, latency=0.2, fail_rate=0.0):
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.calls = 0
     
-    response = model.generate_content(prompt)
-    return response.text.strip()
+    def generate(self, prompt):
+        self.calls += 1
+        time.sleep(self.latency)
+        if random.random() < self.fail_rate:
+            raise RuntimeError("fake model failure")
+        chunk = prompt.split("Current transcript to clean:\n", 1)[1].split("\nIMPORTANT ANALYSIS STEPS:", 1)[0]
+        return re.sub(r"\n(SPECIAL INSTRUCTION|NOTE ON CONTEXT).*", "", chunk, flags=re.S).strip()
+
+
+_default_model = None
+
+
+def clean_chunk_with_gemini(chunk, previous_context="", is_first_chunk=False):
+    global _default_model
+    if _default_model is None:
+        _default_model = GeminiModel()
+    return _default_model.generate(build_prompt(chunk, previous_context, is_first_chunk))
 
 
 def get_last_lines(text, num_lines=10):
@@ -146,7 +198,109 @@ def get_last_lines(text, num_lines=10):
     return '\n'.join(lines[-num_lines:]) if lines else ""
 
 
-def process_transcript(input_file, output_file):
+def checkpoint_key(chunk, prompt):
+    digest = lambda text: hashlib.sha256(text.encode('utf-8')).hexdigest()[:16]
+    return f"{digest(chunk)}:{digest(prompt)}"
+
+
+class CheckpointJournal:
+    """Append-only JSONL of cleaned chunks keyed by chunk hash + prompt hash.
+    
+    The prompt includes the previous chunk's cleaned tail, so a rerun that replays the same
+    earlier outputs regenerates the same keys and skips every chunk that already finished,
+    while any change to the prompt or the input invalidates exactly the affected chunks.
+    """
+    
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # line cut short by a crash
+                    self.entries[entry['key']] = entry['output']
+        self._file = open(path, 'a+', encoding='utf-8')
+        if self._file.tell() > 0:
+            self._file.seek(self._file.tell() - 1)
+            if self._file.read(1) != '\n':
+                self._file.write('\n')  # terminate a line cut short by a crash
+    
+    def get(self, key):
+        return self.entries.get(key)
+    
+    def record(self, key, index, output):
+        with self._lock:
+            self.entries[key] = output
+            self._file.write(json.dumps({'key': key, 'chunk': index, 'output': output}, ensure_ascii=False) + '\n')
+            self._file.flush()
+            os.fsync(self._file.fileno())
+    
+    def close(self):
+        self._file.close()
+
+
+def _generate_with_retries(model, prompt, limiter, retries):
+    for attempt in range(retries + 1):
+        limiter.acquire()
+        try:
+            return model.generate(prompt)
+        except Exception as e:
+            if attempt == retries:
+                raise
+            delay = min(60, 2 ** attempt * 5) * (0.5 + random.random())
+            print(f"  retrying in {delay:.1f}s after error: {e}")
+            time.sleep(delay)
+
+
+# Chunks are split into `lanes` contiguous runs. Inside a lane each chunk still gets the cleaned
+# tail of the chunk before it; a lane's first chunk gets the raw tail of the preceding chunk
+# instead, so all lanes run side by side under the shared rate limit.
+def clean_chunks(chunks, model, concurrency=CONCURRENCY, lanes=None, requests_per_minute=REQUESTS_PER_MINUTE,
+                 journal=None, retries=MAX_RETRIES):
+    total = len(chunks)
+    lanes = max(1, min(lanes or concurrency, total))
+    bounds = [round(k * total / lanes) for k in range(lanes + 1)]
+    results = [None] * total
+    errors = {}
+    limiter = RateLimiter.per_minute(requests_per_minute)
+    
+    def run_lane(start, stop):
+        for i in range(start, stop):
+            if i == start and i > 0:
+                context, raw_context = get_last_lines(chunks[i - 1], CONTEXT_LINES), True
+            else:
+                context = get_last_lines("\n\n".join(results[max(start, i - CONTEXT_LINES):i]), CONTEXT_LINES)
+                raw_context = False
+            prompt = build_prompt(chunks[i], context, is_first_chunk=(i == 0), raw_context=raw_context)
+            key = checkpoint_key(chunks[i], prompt)
+            
+            output = journal.get(key) if journal else None
+            if output is None:
+                try:
+                    output = _generate_with_retries(model, prompt, limiter, retries)
+                except Exception as e:
+                    errors[i] = e
+                    print(f"Error processing chunk {i+1}: {e}")
+                    return
+                if journal:
+                    journal.record(key, i, output)
+                print(f"Cleaned chunk {i+1}/{total}")
+            else:
+                print(f"Chunk {i+1}/{total} already cleaned, skipping")
+            results[i] = output
+    
+    with ThreadPoolExecutor(max_workers=max(1, min(concurrency, lanes))) as pool:
+        for future in [pool.submit(run_lane, bounds[k], bounds[k + 1]) for k in range(lanes)]:
+            future.result()
+    return results, errors
+
+
+def process_transcript(input_file, output_file, model=None, concurrency=CONCURRENCY, lanes=None,
+                       requests_per_minute=REQUESTS_PER_MINUTE):
     print(f"Reading transcript from: {input_file}")
     content = read_transcript(input_file)
     
@@ -154,43 +308,46 @@ def process_transcript(input_file, output_file):
     total_chunks = len(chunks)
     print(f"Split into {total_chunks} chunks for processing")
     
-    cleaned_content = ""
+    journal = CheckpointJournal(f"{output_file}.journal.jsonl")
+    try:
+        results, errors = clean_chunks(chunks, model or GeminiModel(), concurrency=concurrency, lanes=lanes,
+                                       requests_per_minute=requests_per_minute, journal=journal)
+    finally:
+        journal.close()
     
-    for i, chunk in enumerate(chunks):
-        print(f"Processing chunk {i+1}/{total_chunks}...")
-        
-        previous_context = get_last_lines(cleaned_content, num_lines=10)
-        is_first_chunk = (i == 0)
-        
-        try:
-            cleaned_chunk = clean_chunk_with_gemini(chunk, previous_context, is_first_chunk)
-            cleaned_content += cleaned_chunk + "\n\n"
-            
-            write_progress(output_file, cleaned_content)
-            print(f"Saved progress after chunk {i+1}")
-            
-            if i < total_chunks - 1:
-                time.sleep(4.5)
-            
-        except Exception as e:
-            print(f"Error processing chunk {i+1}: {e}")
-            print("Progress saved. You can resume by running the script again.")
-            raise
+    done = next((i for i, r in enumerate(results) if r is None), total_chunks)
+    cleaned_content = "".join(r + "\n\n" for r in results[:done])
+    write_progress(output_file, cleaned_content)
+    
+    if errors:
+        print(f"\n{len(errors)} chunk(s) failed; {sum(r is not None for r in results)}/{total_chunks} are saved "
+              f"in the journal. Run the script again to resume from there.")
+        raise next(iter(errors.values()))
     
     print(f"\nCleaning complete! Output saved to: {output_file}")
     return cleaned_content
 
+
 def main():
-    input_file = Path("data\data_commit_7\datacommit_7_murat_sahin_speakers.txt")
-    output_file = Path("data\data_commit_7\datacommit_7_murat_sahin_speakers_cleaned.txt")
+    parser = argparse.ArgumentParser(description="Clean a speaker transcript with Gemini (resumable)")
+    parser.add_argument("input", nargs="?", default="data/data_commit_7/datacommit_7_murat_sahin_speakers.txt")
+    parser.add_argument("output", nargs="?", default="data/data_commit_7/datacommit_7_murat_sahin_speakers_cleaned.txt")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY, help="Gemini calls in flight")
+    parser.add_argument("--lanes", type=int, help="independent context chains (default: --concurrency)")
+    parser.add_argument("--rpm", type=float, default=REQUESTS_PER_MINUTE, help="Gemini calls per minute")
+    parser.add_argument("--fake", action="store_true", help="use an offline echo model instead of Gemini")
+    args = parser.parse_args()
+    
+    input_file = Path(args.input)
+    output_file = Path(args.output)
     
     if not input_file.exists():
         print(f"Error: Input file not found at {input_file}")
         return
     
-    process_transcript(input_file, output_file)
+    process_transcript(input_file, output_file, model=FakeModel() if args.fake else None,
+                       concurrency=args.concurrency, lanes=args.lanes, requests_per_minute=args.rpm)
 
 
 if __name__ == "__main__":
     main()
-
@@ -0,0 +1,79 @@
+import re
+from create_database import EPISODES
+from keyword_index import turkish_lower, TURKISH_FOLD
+
+# Guest first names and surnames that are also everyday Turkish words, places or very common
+# names ("olgun" = mature, "bilge" = wise, "Aydın" = a city and "bright", "şahin" = hawk,
+# "akbaba" = vulture) only count as part of the full name when detected in free text
+AMBIGUOUS_NAMES = {"olgun", "bilge", "murat", "aydin", "sahin", "akbaba", "eren"}
+
+EPISODE_PATTERNS = [
+    re.compile(r"\bbolum\s*(\d+)\b"),
+    re.compile(r"\b(\d+)\s*\.?\s*bolum"),
+]
+
+
+def _fold(text: str) -> str:
+    return turkish_lower(text).translate(TURKISH_FOLD)
+
+
+def _guest_aliases(skip=()):
+    aliases = {}
+    for ep in EPISODES:
+        name = _fold(ep["guest"])
+        aliases.setdefault(name, set()).add(ep["episode"])
+        for part in name.split():
+            if len(part) >= 4 and part not in skip:
+                aliases.setdefault(part, set()).add(ep["episode"])
+    # A first name or surname shared by several guests is not a reliable signal on its own
+    return {alias: episodes for alias, episodes in aliases.items() if len(episodes) == 1 or " " in alias}
+
+
+GUEST_ALIASES = _guest_aliases(skip=AMBIGUOUS_NAMES)
+EXPLICIT_GUEST_ALIASES = _guest_aliases()
+KNOWN_EPISODES = {ep["episode"] for ep in EPISODES}
+
+
+# Finds episodes the question is explicitly about: guest names (full, first or last name,
+# including suffixed forms like "Alara'nın") and "Bölüm 3" / "3. bölüm" mentions.
+def detect_episodes(query: str):
+    folded = _fold(query)
+    words = set(re.findall(r"\w+", folded))
+    found = set()
+    for alias, episodes in GUEST_ALIASES.items():
+        if (" " in alias and alias in folded) or alias in words:
+            found |= episodes
+    for pattern in EPISODE_PATTERNS:
+        found |= {int(n) for n in pattern.findall(folded) if int(n) in KNOWN_EPISODES}
+    return sorted(found) or None
+
+
+def resolve_episodes(query: str, episodes=None, guests=None, detect: bool = True):
+    selected = set()
+    for episode in episodes or []:
+        if int(episode) not in KNOWN_EPISODES:
+            raise ValueError(f"Unknown episode: {episode}")
+        selected.add(int(episode))
+    for guest in guests or []:
+        matches = EXPLICIT_GUEST_ALIASES.get(_fold(guest).strip())
+        if not matches:
+            raise ValueError(f"Unknown guest: {guest}")
+        selected |= matches
+    if selected:
+        return sorted(selected)
+    return detect_episodes(query) if detect else None
+
+
+# Optional "episode"/"episodes" and "guest"/"guests" fields of a request restrict retrieval;
+# without them, guest names or "Bölüm N" mentions in the query are used. Raises ValueError on
+# unknown values.
+def request_episodes(data, query):
+    episodes = data.get("episodes") or ([data["episode"]] if data.get("episode") is not None else None)
+    guests = data.get("guests") or ([data["guest"]] if data.get("guest") else None)
+    return resolve_episodes(query, episodes, guests)
+
+
+def build_filters(episodes):
+    if not episodes:
+        return None
+    return {"field": "meta.episode", "operator": "in", "value": list(episodes)}
@@ -1,28 +1,135 @@
 import os
+import json
+import time
+import random
+import asyncio
+import functools
+import itertools
+import threading
+import contextvars
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+import httpx
 from dotenv import load_dotenv
 from haystack import Pipeline, component
 from haystack.components.builders import PromptBuilder
-from haystack.components.embedders import SentenceTransformersTextEmbedder
+from haystack.components.joiners import DocumentJoiner
 from haystack_integrations.document_stores.chroma import ChromaDocumentStore
 from haystack_integrations.components.retrievers.chroma import ChromaEmbeddingRetriever
 from google import genai
 from google.genai import types
+import admission
+import embedding_backend
+from answer_cache import AnswerCache
+from catalog import CatalogStore
+from create_database import EPISODES
+from batching_embedder import BatchingTextEmbedder
+from keyword_index import KeywordIndex, KeywordRetriever
+from numpy_index import NumpyIndex, NumpyEmbeddingRetriever
+from query_filters import resolve_episodes, build_filters
+from context_assembly import ContextAssembler
+from reranker import CrossEncoderReranker
+from conversation import ConversationMemory
+import metrics
 
 load_dotenv()
 
 # Configuration
 CHROMA_PERSIST_PATH = "chroma_db"
 CHROMA_COLLECTION_NAME = "datacommit_all"
+INGEST_MANIFEST_PATH = os.path.join(CHROMA_PERSIST_PATH, "ingest_manifest.json")
+KEYWORD_INDEX_PATH = os.path.join(CHROMA_PERSIST_PATH, "keyword_index.json")
+NUMPY_INDEX_PATH = os.path.join(CHROMA_PERSIST_PATH, "numpy_index")
+CATALOG_PATH = os.path.join(CHROMA_PERSIST_PATH, "catalog.json")
 EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
 GEMINI_MODEL = "gemini-3-flash-preview"
 
-TEMPLATE = '''
-Sen DataCommit podcast serisinin içeriklerinden sorulara cevap veren bir asistansın.
+# Dense retrieval backend: "chroma" (HNSW via ChromaDB) or "numpy" (exact search over the
+# memory-mapped matrix written by create_database.py, no external DB needed)
+INDEX_BACKEND = os.getenv("INDEX_BACKEND", "chroma")
+
+# Answer cache (exact + near-duplicate queries); set ANSWER_CACHE_PATH to persist it across restarts
+ANSWER_CACHE_SIZE = 512
+ANSWER_CACHE_TTL = 6 * 3600
+ANSWER_CACHE_SIMILARITY = 0.95
+ANSWER_CACHE_PATH = os.getenv("ANSWER_CACHE_PATH")
+
+# Query embedder: LRU of recent query embeddings + micro-batching of concurrent requests
+QUERY_EMBEDDING_CACHE_SIZE = 1024
+QUERY_BATCH_WINDOW_MS = 5
+
+# Hybrid retrieval: BM25 keyword hits fused with dense hits by reciprocal rank fusion
+HYBRID_RETRIEVAL = True
+HYBRID_CANDIDATES = 10
+
+# Optional cross-encoder reranking (RERANK=1): RERANK_CANDIDATES retrieved chunks are scored
+# against the query and only the best RERANK_TOP_K reach the prompt. When scoring would take
+# longer than RERANK_BUDGET_MS the retriever order is kept instead.
+RERANK = os.getenv("RERANK", "0") == "1"
+RERANK_MODEL = os.getenv("RERANK_MODEL", "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1")
+RERANK_CANDIDATES = 10
+RERANK_TOP_K = 3
+RERANK_BUDGET_MS = float(os.getenv("RERANK_BUDGET_MS", 250))
+
+# Retrieved chunks are merged where they overlap and packed under this many (estimated) tokens.
+# An 800-word Turkish chunk is ~5,500 characters (~1,400 tokens), so this fits the top 5.
+CONTEXT_TOKEN_BUDGET = 7500
+
+# Conversation sessions: last SESSION_RECENT_TURNS turns verbatim, older ones folded into a
+# rolling summary; at most SESSION_MAX_COUNT sessions, dropped after SESSION_TTL idle seconds
+SESSION_MAX_COUNT = 1000
+SESSION_TTL = 2 * 3600
+SESSION_RECENT_TURNS = 3
+
+# Prompt-prefix caching (PROMPT_CACHE=1): SYSTEM_PROMPT is stored once as Gemini cached content
+# and referenced by name, refreshed before PROMPT_CACHE_TTL runs out. Off by default: the current
+# prompt is below the model's minimum cacheable size, and a refused prefix is sent inline for the
+# rest of the process.
+PROMPT_CACHE = os.getenv("PROMPT_CACHE", "0") == "1"
+PROMPT_CACHE_TTL = 3600
+
+# Admission control (app.py / asgi_app.py): at most ADMISSION_MAX_ACTIVE chats run at once and,
+# if set, ADMISSION_MAX_PER_CLIENT per client (0 = no cap; behind a proxy every user shares one
+# address unless TRUST_FORWARDED_FOR=1). ADMISSION_QUEUE_SIZE more wait up to
+# ADMISSION_QUEUE_TIMEOUT seconds for a slot, anything beyond gets 429 with Retry-After. A chat has REQUEST_DEADLINE
+# seconds in total; each Gemini attempt gets LLM_TIMEOUT (REWRITE_TIMEOUT for follow-up
+# rewriting) and transient errors are retried LLM_RETRIES times with jittered backoff.
+ADMISSION_MAX_ACTIVE = int(os.getenv("ADMISSION_MAX_ACTIVE", 32))
+ADMISSION_MAX_PER_CLIENT = int(os.getenv("ADMISSION_MAX_PER_CLIENT", 0))
+ADMISSION_QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", 64))
+ADMISSION_QUEUE_TIMEOUT = 10
+REQUEST_DEADLINE = float(os.getenv("REQUEST_DEADLINE", 60))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", 30))
+REWRITE_TIMEOUT = 8
+LLM_RETRIES = 2
+
+# Hedged Gemini calls (LLM_HEDGE=1, off by default): a call still unanswered after the
+# LLM_HEDGE_PERCENTILE of recent latencies gets a second request, to LLM_FALLBACK_MODEL if set,
+# and the first answer wins
+LLM_HEDGE = os.getenv("LLM_HEDGE", "0") == "1"
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", 0.95))
+LLM_FALLBACK_MODEL = os.getenv("LLM_FALLBACK_MODEL") or None
+
+# Async serving (asgi_app.py): concurrent Gemini calls per process, and threads for embedding/retrieval
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 16))
+RETRIEVAL_THREADS = int(os.getenv("RETRIEVAL_THREADS", 4))
+
+# The prompt is split in two: SYSTEM_PROMPT never changes between requests and goes first as
+# the system instruction (cached server-side with PROMPT_CACHE=1), TEMPLATE is the per-request
+# part with the retrieved context, history and question.
+SYSTEM_PROMPT = '''Sen DataCommit podcast serisinin içeriklerinden sorulara cevap veren bir asistansın.
 
 DataCommit, veri bilimi alanında deneyimli uzmanların kariyer yolculuklarını ve teknik bilgilerini paylaştığı bir platformdur.
 
-Aşağıdaki bölümlerden gelen bilgilere dayanarak soruyu cevapla.
+Sana verilen bölümlerden gelen bilgilere dayanarak soruyu cevapla.
+
+Cevabını verirken:
+1. İlgili bilgileri sentezle
+2. Her önemli bilgi için kaynak göster: (Bölüm X, Konuk adı)
+3. Birden fazla bölümden bilgi varsa hepsini belirt
+'''
 
+TEMPLATE = '''
 Context:
 {% for doc in documents %}
 ---
@@ -31,65 +138,621 @@ Context:
 ---
 {% endfor %}
 
+{% if history %}
+Önceki konuşma (soru bu konuşmanın devamı olabilir):
+{{ history }}
+{% endif %}
 Soru: {{question}}
 
-Cevabını verirken:
-1. İlgili bilgileri sentezle
-2. Her önemli bilgi için kaynak göster: (Bölüm X, Konuk adı)
-3. Birden fazla bölümden bilgi varsa hepsini belirt
-
 Cevap:
 '''
 
 
+# Retry-worthy failures: timeouts, dropped connections, rate limiting and server-side errors
+def _transient(error):
+    if isinstance(error, (httpx.TimeoutException, httpx.TransportError, asyncio.TimeoutError)):
+        return True
+    return getattr(error, "code", None) in (408, 429, 500, 502, 503, 504)
+
+
+def _cache_rejected(error):
+    # 4xx other than rate limiting: the cached content expired, was deleted or is not usable
+    code = getattr(error, "code", None)
+    return isinstance(code, int) and 400 <= code < 500 and code not in (408, 429)
+
+
+_client_lock = threading.Lock()
+_shared_client = None
+_shared_client_pid = None
+
+
+# One genai.Client per process, shared by every generator so they reuse one keep-alive
+# connection pool. Re-created in forked workers, whose inherited HTTP connections can't be
+# shared with the parent process.
+def gemini_client():
+    global _shared_client, _shared_client_pid
+    with _client_lock:
+        if _shared_client is None or _shared_client_pid != os.getpid():
+            _shared_client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
+            _shared_client_pid = os.getpid()
+        return _shared_client
+
+
+# Blocking Gemini calls run here when hedged, so a second request can start while the first waits
+hedge_executor = ThreadPoolExecutor(max_workers=2 * ADMISSION_MAX_ACTIVE, thread_name_prefix="llm-hedge")
+
+
+# Close a hedged call's losing stream so its connection is released
+def _discard(result):
+    close = getattr(result[0] if isinstance(result, tuple) else result, "close", None)
+    if close is not None:
+        close()
+
+
 @component
 class GeminiGenerator:
-    def __init__(self, model: str = "gemini-3-flash-preview", temperature: float = 0.5):
+    """Gemini text generation with an optional static system prompt.
+
+    With `cache_prefix=True` the system prompt is stored as cached content and requests
+    reference it by name, so its tokens are billed at the cached rate. The cache is renewed
+    `refresh_margin` seconds before it expires; when it can't be created the prompt is sent
+    inline and creation is retried after `retry_after` seconds. `client` replaces the
+    genai.Client, e.g. with a local stand-in.
+
+    Each attempt is bounded by `timeout` seconds, or by what is left of the request
+    deadline (see admission.deadline) if that is sooner. Transient failures are retried up
+    to `retries` times with jittered exponential backoff, as long as the deadline allows.
+
+    With `hedge=True`, an attempt that hasn't answered (or, when streaming, produced its
+    first chunk) after the `hedge_percentile` of recent call latencies gets a second request,
+    to `fallback_model` if set. The first to succeed is used and the other is cancelled.
+    Only full (non-streaming) replies are sampled, so a stream is hedged only when its first
+    chunk is slower than most whole answers. Until `hedge_min_samples` latencies are known
+    the delay is `hedge_delay` seconds, by default half of `timeout` (no hedging without one).
+    """
+
+    def __init__(self, model: str = "gemini-3-flash-preview", temperature: float = 0.5,
+                 system_prompt: str = None, cache_prefix: bool = False, cache_ttl: float = 3600,
+                 refresh_margin: float = 60, retry_after: float = 600, timeout: float = None,
+                 retries: int = 0, backoff: float = 0.5, hedge: bool = False, hedge_percentile: float = 0.95,
+                 hedge_delay: float = None, hedge_min_delay: float = 0.5, hedge_min_samples: int = 20,
+                 fallback_model: str = None, client=None):
         self.model = model
         self.temperature = temperature
-        self.client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.system_prompt = system_prompt
+        self.cache_prefix = cache_prefix and bool(system_prompt)
+        self.cache_ttl = cache_ttl
+        self.refresh_margin = refresh_margin
+        self.retry_after = retry_after
+        self.caches_created = 0
+        self.caches_refreshed = 0
+        self.cache_fallbacks = 0
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.hedge_delay = hedge_delay
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_min_samples = hedge_min_samples
+        self.fallback_model = fallback_model
+        self.calls = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self._latencies = deque(maxlen=200)
+        self._fixed_client = client
+        self._client_pid = None
+        self._cache = None
+        self._cache_expires = 0
+        self._cache_retry_at = 0
+        self._cache_lock = threading.Lock()
 
-    @component.output_types(replies=list)
-    def run(self, parts: str):
-        response = self.client.models.generate_content(
+    @property
+    def client(self):
+        if self._fixed_client is not None:
+            return self._fixed_client
+        if self._client_pid != os.getpid():
+            # Cached content belongs to the process that created it
+            self._cache = None
+            self._client_pid = os.getpid()
+        return gemini_client()
+
+    def _config(self, cached_content: str = None, timeout: float = None):
+        return types.GenerateContentConfig(
+            temperature=self.temperature,
+            thinking_config=types.ThinkingConfig(thinking_budget=0),
+            system_instruction=None if cached_content else self.system_prompt,
+            cached_content=cached_content,
+            http_options=types.HttpOptions(timeout=max(1, int(timeout * 1000))) if timeout else None
+        )
+
+    def _cache_usable(self):
+        return self._cache is not None and time.time() < self._cache_expires - self.refresh_margin
+
+    def _create_or_refresh(self):
+        now = time.time()
+        ttl = f"{int(self.cache_ttl)}s"
+        if self._cache is not None:
+            try:
+                self.client.caches.update(name=self._cache, config=types.UpdateCachedContentConfig(ttl=ttl))
+                self._cache_expires = now + self.cache_ttl
+                self.caches_refreshed += 1
+                return
+            except Exception:
+                self._cache = None
+        cache = self.client.caches.create(
             model=self.model,
-            contents=parts,
-            config=types.GenerateContentConfig(
-                temperature=self.temperature,
-                thinking_config=types.ThinkingConfig(thinking_budget=0)
-            )
+            config=types.CreateCachedContentConfig(system_instruction=self.system_prompt, ttl=ttl,
+                                                   display_name="datacommit-system-prompt")
         )
+        self._cache, self._cache_expires = cache.name, now + self.cache_ttl
+        self.caches_created += 1
+
+    # Name of the cached prefix to reference, or None to send the prefix inline
+    def _cached_content(self):
+        if not self.cache_prefix:
+            return None
+        if self._cache_usable():
+            return self._cache
+        if time.time() < self._cache_retry_at:
+            return None
+        # Another request is already creating the cache; send this one inline rather than wait
+        if not self._cache_lock.acquire(blocking=False):
+            return None
+        try:
+            if self._cache_usable():
+                return self._cache
+            if time.time() < self._cache_retry_at:
+                return None
+            try:
+                self._create_or_refresh()
+            except Exception as e:
+                self._cache = None
+                self.cache_fallbacks += 1
+                if _cache_rejected(e):
+                    # A refused prefix (too small, unsupported model) will not be accepted later
+                    self._cache_retry_at = float("inf")
+                    print(f"[!] Prompt cache refused, sending the system prompt inline from now on: {e}")
+                else:
+                    self._cache_retry_at = time.time() + self.retry_after
+                    print(f"[!] Prompt cache unavailable, sending the system prompt inline: {e}")
+                return None
+            return self._cache
+        finally:
+            self._cache_lock.release()
+
+    async def _cached_content_async(self):
+        if not self.cache_prefix or self._cache_usable():
+            return self._cached_content()
+        return await asyncio.to_thread(self._cached_content)
+
+    def _drop_cache(self, name):
+        with self._cache_lock:
+            if self._cache == name:
+                self._cache = None
+                self.cache_fallbacks += 1
+
+    # Seconds to wait before the next attempt; raises when giving up
+    def _retry_delay(self, attempt: int, error):
+        delay = self.backoff * 2 ** attempt * (0.5 + random.random())
+        left = admission.remaining()
+        if attempt < self.retries and _transient(error) and (left is None or left > delay):
+            metrics.inc("llm_retries_total")
+            return delay
+        if isinstance(error, (httpx.TimeoutException, asyncio.TimeoutError)):
+            metrics.inc("deadline_exceeded_total", stage="llm")
+            raise admission.DeadlineExceeded("Gemini call ran out of time") from error
+        raise error
+
+    def current_hedge_delay(self):
+        latencies = sorted(self._latencies)
+        if len(latencies) < self.hedge_min_samples:
+            if self.hedge_delay is not None:
+                return self.hedge_delay
+            return self.timeout / 2 if self.timeout else float("inf")
+        return max(self.hedge_min_delay, latencies[int(self.hedge_percentile * (len(latencies) - 1))])
+
+    def _measured(self, kind, request, model, config):
+        started = time.perf_counter()
+        result = request(model, config)
+        if kind == "run":
+            self._latencies.append(time.perf_counter() - started)
+        return result
+
+    async def _measured_async(self, kind, request, model, config):
+        started = time.perf_counter()
+        result = await request(model, config)
+        if kind == "run":
+            self._latencies.append(time.perf_counter() - started)
+        return result
+
+    # The hedge goes to the fallback model if there is one; cached content is per model
+    def _hedge_args(self, cached, timeout):
+        model = self.fallback_model or self.model
+        return model, self._config(cached if model == self.model else None, timeout)
+
+    def _hedged(self, kind, request, cached, timeout):
+        self.calls += 1
+        config = self._config(cached, timeout)
+        delay = self.current_hedge_delay()
+        if not self.hedge or delay == float("inf") or (timeout is not None and delay >= timeout):
+            return self._measured(kind, request, self.model, config)
+
+        primary = hedge_executor.submit(contextvars.copy_context().run, self._measured, kind, request,
+                                        self.model, config)
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            return primary.result()
+        self.hedges += 1
+        hedge = hedge_executor.submit(contextvars.copy_context().run, self._measured, kind, request,
+                                      *self._hedge_args(cached, timeout))
+        pending, error = {primary, hedge}, None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    self.hedge_wins += future is hedge
+                    # A blocking call can't be interrupted; its result is dropped when it lands
+                    for loser in pending:
+                        if not loser.cancel():
+                            loser.add_done_callback(lambda f: f.exception() is None and _discard(f.result()))
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    async def _hedged_async(self, kind, request, cached, timeout):
+        self.calls += 1
+        config = self._config(cached, timeout)
+        delay = self.current_hedge_delay()
+        if not self.hedge or delay == float("inf") or (timeout is not None and delay >= timeout):
+            return await self._measured_async(kind, request, self.model, config)
+
+        primary = asyncio.ensure_future(self._measured_async(kind, request, self.model, config))
+        tasks, winner = [primary], None
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                self.hedges += 1
+                hedge_args = self._hedge_args(cached, timeout)
+                tasks.append(asyncio.ensure_future(self._measured_async(kind, request, *hedge_args)))
+            pending, error = set(tasks), None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        winner = task
+                        self.hedge_wins += task is not primary
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                if task is winner:
+                    continue
+                if not task.done():
+                    task.cancel()
+                elif not task.cancelled() and task.exception() is None:
+                    result = task.result()
+                    if isinstance(result, tuple) and hasattr(result[0], "aclose"):
+                        await result[0].aclose()
+
+    # Runs `request(model, config)` with the cached prefix, per-attempt timeouts, hedging and retries
+    def _call(self, request, kind: str = "run"):
+        cached = self._cached_content()
+        attempt = 0
+        while True:
+            # Outside the try: a spent deadline is final, not an error to retry
+            timeout = admission.stage_budget("llm", self.timeout)
+            try:
+                return self._hedged(kind, request, cached, timeout)
+            except Exception as e:
+                if cached is not None and _cache_rejected(e):
+                    self._drop_cache(cached)
+                    cached = None
+                    continue
+                delay = self._retry_delay(attempt, e)
+                attempt += 1
+                time.sleep(delay)
+
+    async def _call_async(self, request, kind: str = "run"):
+        cached = await self._cached_content_async()
+        attempt = 0
+        while True:
+            timeout = admission.stage_budget("llm", self.timeout)
+            try:
+                # Cancels the in-flight call(s) once the budget is spent
+                return await asyncio.wait_for(self._hedged_async(kind, request, cached, timeout), timeout)
+            except Exception as e:
+                if cached is not None and _cache_rejected(e):
+                    self._drop_cache(cached)
+                    cached = None
+                    continue
+                delay = self._retry_delay(attempt, e)
+                attempt += 1
+                await asyncio.sleep(delay)
+
+    @component.output_types(replies=list)
+    def run(self, parts: str):
+        response = self._call(lambda model, config: self.client.models.generate_content(
+            model=model, contents=parts, config=config))
+        metrics.count_tokens(response.usage_metadata)
+        return {"replies": [response.text]}
+
+    # Errors surface on the first chunk; only before it is it safe to retry or hedge
+    def _open_stream(self, parts: str, model: str, config):
+        response = self.client.models.generate_content_stream(model=model, contents=parts, config=config)
+        return response, next(response, None)
+
+    def stream(self, parts: str):
+        response, first = self._call(lambda model, config: self._open_stream(parts, model, config), "stream")
+        usage = None
+        for chunk in itertools.chain([first] if first is not None else [], response):
+            usage = chunk.usage_metadata or usage
+            if chunk.text:
+                yield chunk.text
+            # Stop reading once the request deadline has passed
+            admission.stage_budget("llm")
+        metrics.count_tokens(usage)
+
+    async def run_async(self, parts: str):
+        response = await self._call_async(lambda model, config: self.client.aio.models.generate_content(
+            model=model, contents=parts, config=config))
+        metrics.count_tokens(response.usage_metadata)
         return {"replies": [response.text]}
 
+    async def _open_stream_async(self, parts: str, model: str, config):
+        response = await self.client.aio.models.generate_content_stream(model=model, contents=parts,
+                                                                        config=config)
+        iterator = response.__aiter__()
+        try:
+            first = await iterator.__anext__()
+        except StopAsyncIteration:
+            first = None
+        return iterator, first
+
+    async def stream_async(self, parts: str):
+        response, first = await self._call_async(
+            lambda model, config: self._open_stream_async(parts, model, config), "stream")
+        usage = None
+        if first is not None:
+            usage = first.usage_metadata
+            if first.text:
+                yield first.text
+            while True:
+                # A stalled stream is cut off at the request deadline
+                try:
+                    chunk = await asyncio.wait_for(response.__anext__(), admission.stage_budget("llm"))
+                except StopAsyncIteration:
+                    break
+                except asyncio.TimeoutError:
+                    metrics.inc("deadline_exceeded_total", stage="llm")
+                    raise admission.DeadlineExceeded("Request deadline exceeded during generation")
+                usage = chunk.usage_metadata or usage
+                if chunk.text:
+                    yield chunk.text
+        metrics.count_tokens(usage)
+
+
+# Components are created by init() rather than at import time, so importing this module is
+# cheap. With RAG_PRELOAD=1 (and gunicorn --preload) the master process loads the model and
+# indexes once and forked workers share them copy-on-write; only the Chroma client is
+# reconnected per process.
+document_store = None
+retriever = None
+query_embedder = None
+vector_index = None
+keyword_index = None
+keyword_retriever = None
+reranker = None
+joiner = None
+context_assembler = None
+prompt_builder = None
+generator = None
+rewriter = None
+rag_pipeline = None
+answer_cache = None
+conversations = ConversationMemory(max_sessions=SESSION_MAX_COUNT, ttl=SESSION_TTL, recent_turns=SESSION_RECENT_TURNS)
+# Episode metadata and corpus counts, written by create_database.py and reloaded when rebuilt
+corpus_catalog = CatalogStore(CATALOG_PATH, EPISODES)
+chat_admission = admission.AdmissionController(max_active=ADMISSION_MAX_ACTIVE, max_per_client=ADMISSION_MAX_PER_CLIENT,
+                                               max_queue=ADMISSION_QUEUE_SIZE, queue_timeout=ADMISSION_QUEUE_TIMEOUT)
+metrics.register_collector(chat_admission.collect)
+
+_init_lock = threading.Lock()
+_ready = False
+init_error = None
+
+
+def get_index_version():
+    try:
+        with open(INGEST_MANIFEST_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)["version"]
+    except (OSError, ValueError, KeyError):
+        return f"{CHROMA_COLLECTION_NAME}:{EMBEDDING_MODEL}:{document_store.count_documents()}"
+
+
+def load_keyword_index():
+    version = get_index_version()
+    if os.path.exists(KEYWORD_INDEX_PATH):
+        index = KeywordIndex.load(KEYWORD_INDEX_PATH)
+        if index.version == version:
+            return index
+    # Missing or stale on disk (e.g. the store was filled before keyword indexing existed)
+    return KeywordIndex.build(document_store.filter_documents(), version=version)
+
+
+def load_vector_index():
+    if not NumpyIndex.exists(NUMPY_INDEX_PATH):
+        raise FileNotFoundError(f"{NUMPY_INDEX_PATH} not found, run 'python create_database.py' first")
+    index = NumpyIndex.load(NUMPY_INDEX_PATH)
+    if os.path.exists(INGEST_MANIFEST_PATH) and index.version != get_index_version():
+        print("[!] NumPy index is out of date, re-run 'python create_database.py'")
+    return index
+
+
+def _connect_store():
+    global document_store, retriever
+    document_store = ChromaDocumentStore(
+        persist_path=CHROMA_PERSIST_PATH,
+        collection_name=CHROMA_COLLECTION_NAME
+    )
+    if INDEX_BACKEND == "numpy":
+        retriever = NumpyEmbeddingRetriever(index=vector_index, top_k=5)
+    else:
+        retriever = ChromaEmbeddingRetriever(document_store=document_store, top_k=5)
+
 
-# Initialize components
-document_store = ChromaDocumentStore(
-    persist_path=CHROMA_PERSIST_PATH,
-    collection_name=CHROMA_COLLECTION_NAME
-)
+def _build_pipeline():
+    global rag_pipeline
+    rag_pipeline = Pipeline()
+    rag_pipeline.add_component("query_embedder", query_embedder)
+    rag_pipeline.add_component("retriever", retriever)
+    rag_pipeline.add_component("keyword_retriever", keyword_retriever)
+    rag_pipeline.add_component("joiner", joiner)
+    if reranker is not None:
+        rag_pipeline.add_component("reranker", reranker)
+    rag_pipeline.add_component("context_assembler", context_assembler)
+    rag_pipeline.add_component("prompt_builder", prompt_builder)
+    rag_pipeline.add_component("llm", generator)
+    
+    rag_pipeline.connect("query_embedder.embedding", "retriever.query_embedding")
+    rag_pipeline.connect("retriever.documents", "joiner.documents")
+    rag_pipeline.connect("keyword_retriever.documents", "joiner.documents")
+    if reranker is not None:
+        rag_pipeline.connect("joiner.documents", "reranker.documents")
+        rag_pipeline.connect("reranker.documents", "context_assembler.documents")
+    else:
+        rag_pipeline.connect("joiner.documents", "context_assembler.documents")
+    rag_pipeline.connect("context_assembler.documents", "prompt_builder.documents")
+    rag_pipeline.connect("prompt_builder.prompt", "llm.parts")
 
-query_embedder = SentenceTransformersTextEmbedder(model=EMBEDDING_MODEL)
-query_embedder.warm_up()
 
-retriever = ChromaEmbeddingRetriever(document_store=document_store, top_k=5)
-prompt_builder = PromptBuilder(template=TEMPLATE, required_variables=["documents", "question"])
-generator = GeminiGenerator(model=GEMINI_MODEL, temperature=0.5)
+def init():
+    global query_embedder, vector_index, keyword_index, keyword_retriever, joiner, reranker, context_assembler
+    global prompt_builder, generator, rewriter, answer_cache, _ready, init_error
+    if _ready:
+        return
+    with _init_lock:
+        if _ready:
+            return
+        try:
+            if INDEX_BACKEND == "numpy":
+                vector_index = load_vector_index()
+            _connect_store()
+            
+            query_embedder = BatchingTextEmbedder(
+                embedding_backend.text_embedder(EMBEDDING_MODEL),
+                cache_size=QUERY_EMBEDDING_CACHE_SIZE,
+                batch_window_ms=QUERY_BATCH_WINDOW_MS
+            )
+            query_embedder.warm_up()
+            
+            keyword_index = load_keyword_index()
+            keyword_retriever = KeywordRetriever(index=keyword_index, top_k=HYBRID_CANDIDATES)
+            joiner = DocumentJoiner(join_mode="reciprocal_rank_fusion", top_k=RERANK_CANDIDATES if RERANK else 5)
+            if RERANK:
+                reranker = CrossEncoderReranker(model=RERANK_MODEL, top_k=RERANK_TOP_K,
+                                                time_budget_ms=RERANK_BUDGET_MS)
+                reranker.warm_up()
+            context_assembler = ContextAssembler(token_budget=CONTEXT_TOKEN_BUDGET)
+            prompt_builder = PromptBuilder(template=TEMPLATE, required_variables=["documents", "question"])
+            generator = GeminiGenerator(model=GEMINI_MODEL, temperature=0.5, system_prompt=SYSTEM_PROMPT,
+                                        cache_prefix=PROMPT_CACHE, cache_ttl=PROMPT_CACHE_TTL,
+                                        timeout=LLM_TIMEOUT, retries=LLM_RETRIES, hedge=LLM_HEDGE,
+                                        hedge_percentile=LLM_HEDGE_PERCENTILE, fallback_model=LLM_FALLBACK_MODEL)
+            # Follow-up rewriting has its own instructions, so no answering system prompt
+            rewriter = GeminiGenerator(model=GEMINI_MODEL, temperature=0.5, timeout=REWRITE_TIMEOUT)
+            
+            answer_cache = AnswerCache(
+                max_size=ANSWER_CACHE_SIZE,
+                ttl=ANSWER_CACHE_TTL,
+                similarity_threshold=ANSWER_CACHE_SIMILARITY,
+                persist_path=ANSWER_CACHE_PATH,
+                index_version=get_index_version()
+            )
+            
+            _build_pipeline()
+            metrics.register_collector(_cache_metrics)
+            init_error = None
+            _ready = True
+        except Exception as e:
+            init_error = e
+            raise
 
-# Build pipeline
-rag_pipeline = Pipeline()
-rag_pipeline.add_component("query_embedder", query_embedder)
-rag_pipeline.add_component("retriever", retriever)
-rag_pipeline.add_component("prompt_builder", prompt_builder)
-rag_pipeline.add_component("llm", generator)
 
-rag_pipeline.connect("query_embedder.embedding", "retriever.query_embedding")
-rag_pipeline.connect("retriever.documents", "prompt_builder.documents")
-rag_pipeline.connect("prompt_builder.prompt", "llm.parts")
+def _cache_metrics():
+    stats = answer_cache.stats()
+    return [
+        ("cache_events_total", "counter", {"cache": "answer", "result": "hit"}, stats["hits"]),
+        ("cache_events_total", "counter", {"cache": "answer", "result": "near_hit"}, stats["near_hits"]),
+        ("cache_events_total", "counter", {"cache": "answer", "result": "miss"}, stats["misses"]),
+        ("cache_events_total", "counter", {"cache": "embedding", "result": "hit"}, query_embedder.hits),
+        ("cache_events_total", "counter", {"cache": "embedding", "result": "miss"}, query_embedder.misses),
+        ("cache_entries", "gauge", {"cache": "answer"}, stats["size"]),
+        ("sessions", "gauge", {}, conversations.stats()["sessions"]),
+        ("session_evictions_total", "counter", {}, conversations.evictions),
+        ("query_rewrites_total", "counter", {"result": "ok"}, conversations.rewrites),
+        ("query_rewrites_total", "counter", {"result": "failed"}, conversations.rewrite_failures),
+        ("prompt_cache_events_total", "counter", {"event": "created"}, generator.caches_created),
+        ("prompt_cache_events_total", "counter", {"event": "refreshed"}, generator.caches_refreshed),
+        ("prompt_cache_events_total", "counter", {"event": "fallback"}, generator.cache_fallbacks),
+        ("llm_calls_total", "counter", {}, generator.calls),
+        ("llm_hedge_outcomes_total", "counter", {"result": "hedged"}, generator.hedges),
+        ("llm_hedge_outcomes_total", "counter", {"result": "hedge_won"}, generator.hedge_wins),
+        ("llm_hedge_delay_seconds", "gauge", {}, generator.current_hedge_delay()),
+    ] + ([
+        ("rerank_total", "counter", {"result": "reranked"}, reranker.reranked),
+        ("rerank_total", "counter", {"result": "fallback"}, reranker.fallbacks),
+    ] if reranker is not None else [])
 
 
-def show_retrieved_chunks(query: str, top_k: int = 5):
-    embedding = query_embedder.run(text=query)["embedding"]
-    docs = retriever.run(query_embedding=embedding, top_k=top_k)["documents"]
+def init_in_background():
+    if _ready or _init_lock.locked():
+        return
+    
+    def run():
+        try:
+            init()
+        except Exception as e:
+            print(f"[!] RAG pipeline initialization failed: {e}")
+    
+    threading.Thread(target=run, name="rag-init", daemon=True).start()
+
+
+def is_ready():
+    return _ready
+
+
+def preload():
+    import gc
+    init()
+    # Keep the loaded objects out of the collector's generations so that GC passes in the
+    # forked workers don't write to (and un-share) their pages
+    gc.freeze()
+
+
+# Only the Chroma client holds per-process state. The Pipeline is not rebuilt: Haystack refuses
+# to add the already-wired components to a second one, and requests call the components directly.
+def _after_fork_in_child():
+    global _init_lock
+    _init_lock = threading.Lock()
+    if _ready:
+        _connect_store()
+
+
+os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def count_documents():
+    init()
+    if INDEX_BACKEND == "numpy":
+        return len(vector_index)
+    return document_store.count_documents()
+
+
+def show_retrieved_chunks(query: str, top_k: int = 5, episodes=None, guests=None):
+    init()
+    docs = retrieve(query, top_k=top_k, filters=build_filters(resolve_episodes(query, episodes, guests)))
     
     print(f"Query: {query}\n")
     print(f"Retrieved {len(docs)} chunks:\n" + "=" * 80)
@@ -105,16 +768,98 @@ def show_retrieved_chunks(query: str, top_k: int = 5):
     return docs
 
 
-def respond_with_sources(query: str, top_k: int = 5):
-    if not query.strip():
-        return "", []
-    
-    embedding = query_embedder.run(text=query)["embedding"]
-    docs = retriever.run(query_embedding=embedding, top_k=top_k)["documents"]
-    
-    prompt = prompt_builder.run(documents=docs, question=query)["prompt"]
-    response = generator.run(parts=prompt)["replies"][0]
+def embed_query(query: str):
+    init()
+    with metrics.timed("embedding"):
+        return query_embedder.run(text=query)["embedding"]
+
+
+# `filters` (see query_filters.build_filters) is passed down to both retrievers, so an
+# episode/guest restriction shrinks the search space before scoring.
+def retrieve(query: str, top_k: int = 5, embedding=None, filters=None):
+    init()
+    if embedding is None:
+        embedding = embed_query(query)
+    with metrics.timed("retrieval"):
+        dense_docs = retriever.run(query_embedding=embedding, filters=filters, top_k=_dense_top_k(top_k))["documents"]
+    return _rank_candidates(query, dense_docs, top_k, filters)
+
+
+def _use_hybrid():
+    return HYBRID_RETRIEVAL and len(keyword_index) > 0
+
+
+def _candidate_count(top_k):
+    return top_k if reranker is None else max(top_k, RERANK_CANDIDATES)
+
+
+def _dense_top_k(top_k):
+    candidates = _candidate_count(top_k)
+    return max(candidates, HYBRID_CANDIDATES) if _use_hybrid() else candidates
+
+
+# Everything after the dense search: BM25 hits fused in, then the optional reranker
+def _rank_candidates(query: str, dense_docs, top_k: int, filters):
+    candidates = _candidate_count(top_k)
+    docs = dense_docs[:candidates]
+    if _use_hybrid():
+        with metrics.timed("keyword"):
+            keyword_docs = keyword_retriever.run(query=query, filters=filters, top_k=_dense_top_k(top_k))["documents"]
+        with metrics.timed("fusion"):
+            docs = joiner.run(documents=[dense_docs, keyword_docs], top_k=candidates)["documents"]
+    if reranker is None:
+        return docs
+    with metrics.timed("rerank"):
+        return reranker.run(query=query, documents=docs, top_k=min(top_k, RERANK_TOP_K))["documents"]
+
+
+def embed_queries(queries):
+    init()
+    with metrics.timed("embedding"):
+        return query_embedder.embed_batch(queries)
+
+
+# Batch counterpart of retrieve(): questions sharing the same filters are searched together in
+# one matrix product (NumPy) or one multi-query call (Chroma); keyword search, fusion and
+# reranking stay per question. `filters` is a list parallel to `queries`.
+def retrieve_batch(queries, top_k: int = 5, embeddings=None, filters=None):
+    init()
+    if embeddings is None:
+        embeddings = embed_queries(queries)
+    filters = filters or [None] * len(queries)
+    groups = {}
+    for i, f in enumerate(filters):
+        groups.setdefault(json.dumps(f, sort_keys=True), []).append(i)
     
+    dense = [None] * len(queries)
+    with metrics.timed("retrieval"):
+        for rows in groups.values():
+            group_embeddings = [list(embeddings[i]) for i in rows]
+            if INDEX_BACKEND == "numpy":
+                results = vector_index.search_batch(group_embeddings, top_k=_dense_top_k(top_k), filters=filters[rows[0]])
+            else:
+                results = document_store.search_embeddings(group_embeddings, top_k=_dense_top_k(top_k),
+                                                           filters=filters[rows[0]])
+            for i, docs in zip(rows, results):
+                dense[i] = docs
+    return [_rank_candidates(q, docs, top_k, f) for q, docs, f in zip(queries, dense, filters)]
+
+
+def assemble_context(docs):
+    init()
+    with metrics.timed("context"):
+        return context_assembler.run(documents=docs)["documents"]
+
+
+# `context` comes from assemble_context(); collect sources from the same list so they only
+# name episodes the model actually saw
+def build_prompt(query: str, context, history: str = None):
+    init()
+    with metrics.timed("prompt"):
+        return prompt_builder.run(documents=context, question=query, history=history or "")["prompt"]
+
+
+def collect_sources(docs):
     sources = []
     seen = set()
     for doc in docs:
@@ -126,10 +871,193 @@ def respond_with_sources(query: str, top_k: int = 5):
                 "score": doc.score
             })
             seen.add(key)
+    return sources
+
+
+# A rebuilt index shows up as a new catalog version; answers cached for the old one are dropped
+def sync_index_version():
+    version = corpus_catalog.get().version
+    if version is not None:
+        answer_cache.set_index_version(version)
+
+
+def cache_scope(episodes):
+    return ",".join(str(ep) for ep in episodes) if episodes else ""
+
+
+# With a `session` (see conversations.get_or_create), a follow-up is first rewritten into a
+# standalone question that drives filtering and retrieval, and the session's bounded history
+# goes into the prompt. The turn is recorded in the session afterwards. An answer written with
+# history depends on more than the standalone question, so it neither reads nor fills the
+# answer cache.
+def prepare_turn(query: str, session=None, llm=None):
+    if session is None:
+        return query, None
+    with metrics.timed("rewrite"):
+        standalone = conversations.prepare(session, query, llm or rewriter)
+    return standalone, conversations.history(session)
+
+
+def respond_with_sources(query: str, top_k: int = 5, episodes=None, guests=None, session=None):
+    if not query.strip():
+        return "", []
     
+    init()
+    sync_index_version()
+    standalone, history = prepare_turn(query, session)
+    episodes = resolve_episodes(standalone, episodes, guests)
+    embedding = embed_query(standalone)
+    
+    def generate():
+        docs = retrieve(standalone, top_k=top_k, embedding=embedding, filters=build_filters(episodes))
+        context = assemble_context(docs)
+        prompt = build_prompt(standalone, context, history)
+        with metrics.timed("llm"):
+            response = generator.run(parts=prompt)["replies"][0]
+        return response, collect_sources(context)
+    
+    if history:
+        response, sources = generate()
+    else:
+        response, sources = answer_cache.get_or_compute(standalone, top_k, generate, embedding=embedding,
+                                                        scope=cache_scope(episodes))
+    if session is not None:
+        session.add_turn(query, response)
     return response, sources
 
 
+# Yields ("sources", [...]) right after retrieval, then ("token", text) as Gemini streams.
+# Any object with a `stream(parts)` generator can be passed as `llm` (e.g. a local fake).
+def stream_with_sources(query: str, top_k: int = 5, llm=None, episodes=None, guests=None, session=None):
+    if not query.strip():
+        return
+    
+    init()
+    sync_index_version()
+    standalone, history = prepare_turn(query, session, llm)
+    llm = llm or generator
+    episodes = resolve_episodes(standalone, episodes, guests)
+    scope = cache_scope(episodes)
+    embedding = embed_query(standalone)
+    cached = None if history else answer_cache.get(standalone, top_k, embedding, scope)
+    if cached is not None:
+        response, sources = cached
+        yield "sources", sources
+        yield "token", response
+        if session is not None:
+            session.add_turn(query, response)
+        return
+    
+    docs = retrieve(standalone, top_k=top_k, embedding=embedding, filters=build_filters(episodes))
+    context = assemble_context(docs)
+    sources = collect_sources(context)
+    yield "sources", sources
+    
+    prompt = build_prompt(standalone, context, history)
+    tokens = []
+    for token in llm.stream(parts=prompt):
+        tokens.append(token)
+        yield "token", token
+    if not history:
+        answer_cache.put(standalone, top_k, "".join(tokens), sources, embedding=embedding, scope=scope)
+    if session is not None:
+        session.add_turn(query, "".join(tokens))
+
+
+# Async variants for the ASGI app: CPU-bound embedding/retrieval runs on a bounded thread pool
+# so it never blocks the event loop, and in-flight Gemini calls are capped by a semaphore
+# sized to the LLM rate limit rather than by the number of worker threads.
+cpu_executor = ThreadPoolExecutor(max_workers=RETRIEVAL_THREADS, thread_name_prefix="retrieval")
+llm_semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+
+
+async def run_in_cpu_pool(fn, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    # Carry the request's context (per-request stage timings) into the worker thread
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(cpu_executor, functools.partial(ctx.run, fn, *args, **kwargs))
+
+
+async def prepare_turn_async(query: str, session=None, llm=None):
+    if session is None:
+        return query, None
+    async with llm_semaphore:
+        with metrics.timed("rewrite"):
+            standalone = await conversations.prepare_async(session, query, llm or rewriter)
+    return standalone, conversations.history(session)
+
+
+async def respond_with_sources_async(query: str, top_k: int = 5, llm=None, episodes=None, guests=None,
+                                     session=None):
+    if not query.strip():
+        return "", []
+    
+    await run_in_cpu_pool(init)
+    sync_index_version()
+    standalone, history = await prepare_turn_async(query, session, llm)
+    llm = llm or generator
+    episodes = resolve_episodes(standalone, episodes, guests)
+    embedding = await run_in_cpu_pool(embed_query, standalone)
+    
+    async def generate():
+        docs = await run_in_cpu_pool(retrieve, standalone, top_k=top_k, embedding=embedding,
+                                     filters=build_filters(episodes))
+        context = await run_in_cpu_pool(assemble_context, docs)
+        prompt = await run_in_cpu_pool(build_prompt, standalone, context, history)
+        async with llm_semaphore:
+            with metrics.timed("llm"):
+                response = (await llm.run_async(parts=prompt))["replies"][0]
+        return response, collect_sources(context)
+    
+    if history:
+        response, sources = await generate()
+    else:
+        response, sources = await answer_cache.get_or_compute_async(standalone, top_k, generate,
+                                                                    embedding=embedding, scope=cache_scope(episodes))
+    if session is not None:
+        session.add_turn(query, response)
+    return response, sources
+
+
+async def stream_with_sources_async(query: str, top_k: int = 5, llm=None, episodes=None, guests=None,
+                                    session=None):
+    if not query.strip():
+        return
+    
+    await run_in_cpu_pool(init)
+    sync_index_version()
+    standalone, history = await prepare_turn_async(query, session, llm)
+    llm = llm or generator
+    episodes = resolve_episodes(standalone, episodes, guests)
+    scope = cache_scope(episodes)
+    embedding = await run_in_cpu_pool(embed_query, standalone)
+    cached = None if history else answer_cache.get(standalone, top_k, embedding, scope)
+    if cached is not None:
+        response, sources = cached
+        yield "sources", sources
+        yield "token", response
+        if session is not None:
+            session.add_turn(query, response)
+        return
+    
+    docs = await run_in_cpu_pool(retrieve, standalone, top_k=top_k, embedding=embedding,
+                                 filters=build_filters(episodes))
+    context = await run_in_cpu_pool(assemble_context, docs)
+    sources = collect_sources(context)
+    yield "sources", sources
+    
+    prompt = await run_in_cpu_pool(build_prompt, standalone, context, history)
+    tokens = []
+    async with llm_semaphore:
+        async for token in llm.stream_async(parts=prompt):
+            tokens.append(token)
+            yield "token", token
+    if not history:
+        answer_cache.put(standalone, top_k, "".join(tokens), sources, embedding=embedding, scope=scope)
+    if session is not None:
+        session.add_turn(query, "".join(tokens))
+
+
 def query_datacommit(query: str, show_chunks: bool = False):
     print("\n" + "=" * 80)
     print(f"SORU: {query}")
@@ -152,7 +1080,7 @@ def query_datacommit(query: str, show_chunks: bool = False):
 
 
 if __name__ == "__main__":
-    doc_count = document_store.count_documents()
+    doc_count = count_documents()
     if doc_count == 0:
         print("No documents found! Run 'python create_database.py' first.")
     else:
@@ -0,0 +1,42 @@
+import time
+import asyncio
+import threading
+
+
+class RateLimiter:
+    """Token bucket allowing `rate` acquisitions per second on average, bursts up to `burst`.
+
+    Callers reserve a token under the lock and sleep outside it, so waiters are served in
+    arrival order and sleeping never blocks other threads. A rate of None or 0 disables it.
+    """
+
+    def __init__(self, rate: float = None, burst: int = 1):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def per_minute(cls, requests_per_minute: float = None, burst: int = 1):
+        return cls(requests_per_minute / 60 if requests_per_minute else None, burst)
+
+    def _reserve(self):
+        if not self.rate:
+            return 0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def acquire(self):
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        wait = self._reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
@@ -0,0 +1,84 @@
+import time
+import threading
+from typing import List, Optional
+from haystack import Document, component
+
+
+@component
+class CrossEncoderReranker:
+    """Re-orders retrieved chunks by a local cross-encoder's query/chunk relevance score.
+
+    Pairs are scored in batches against a per-call time budget. The running per-pair
+    average, seeded in warm_up() by timing a full batch of `max_length` pairs, sizes each
+    batch to what fits in the time left; when not even one pair fits, the call gives up and
+    returns the documents in retriever order, so reranking never adds more than about
+    `time_budget_ms` to a request.
+    """
+
+    def __init__(self, model: str, top_k: int = 3, batch_size: int = 8, time_budget_ms: float = 250,
+                 max_length: int = 512):
+        self.model = model
+        self.top_k = top_k
+        self.batch_size = batch_size
+        self.time_budget = time_budget_ms / 1000
+        self.max_length = max_length
+        self.reranked = 0
+        self.fallbacks = 0
+        self._encoder = None
+        self._pair_seconds = None
+        self._lock = threading.Lock()
+
+    def warm_up(self):
+        if self._encoder is None:
+            from sentence_transformers import CrossEncoder
+            self._encoder = CrossEncoder(self.model, device="cpu", max_length=self.max_length)
+            # First call pays for lazy initialization; keep it out of the budget estimate
+            self._encoder.predict([("warm up", "warm up")], show_progress_bar=False)
+        if self._pair_seconds is None:
+            # Time a worst-case batch (every pair at max_length) so the first request has an estimate
+            pairs = [("soru " * 16, "kelime " * self.max_length)] * self.batch_size
+            started = time.perf_counter()
+            self._encoder.predict(pairs, batch_size=self.batch_size, show_progress_bar=False)
+            self._pair_seconds = (time.perf_counter() - started) / len(pairs)
+
+    def _score(self, query: str, documents: List[Document]):
+        deadline = time.perf_counter() + self.time_budget
+        scores = []
+        while len(scores) < len(documents):
+            fits = int((deadline - time.perf_counter()) / self._pair_seconds)
+            if fits < 1:
+                # Decay the estimate so one slow spell doesn't disable reranking for good
+                with self._lock:
+                    self._pair_seconds *= 0.9
+                return None
+            batch = documents[len(scores):len(scores) + min(self.batch_size, fits)]
+            started = time.perf_counter()
+            scores.extend(self._encoder.predict([(query, doc.content) for doc in batch],
+                                                batch_size=len(batch), show_progress_bar=False))
+            per_pair = (time.perf_counter() - started) / len(batch)
+            with self._lock:
+                self._pair_seconds = 0.8 * self._pair_seconds + 0.2 * per_pair
+            if time.perf_counter() > deadline:
+                return None
+        return scores
+
+    @component.output_types(documents=List[Document])
+    def run(self, query: str, documents: List[Document], top_k: Optional[int] = None):
+        top_k = top_k or self.top_k
+        if len(documents) <= 1:
+            return {"documents": documents[:top_k]}
+        self.warm_up()
+
+        scores = self._score(query, documents)
+        if scores is None:
+            with self._lock:
+                self.fallbacks += 1
+            return {"documents": documents[:top_k]}
+
+        with self._lock:
+            self.reranked += 1
+        ranked = sorted(zip(scores, range(len(documents))), key=lambda pair: -pair[0])[:top_k]
+        return {"documents": [
+            Document(id=documents[i].id, content=documents[i].content, meta=documents[i].meta, score=float(score))
+            for score, i in ranked
+        ]}
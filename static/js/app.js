@@ -26,6 +26,10 @@ const statusText = document.querySelector('.status-text');
 const guestGrid = document.getElementById('guestGrid');
 const loadingTemplate = document.getElementById('loadingTemplate');
 
+// Conversation session on the server (follow-up questions are rewritten with its history);
+// lives for the page's lifetime
+let sessionId = null;
+
 // Configure marked for safe HTML rendering
 marked.setOptions({
     breaks: true,
@@ -73,6 +77,9 @@ async function checkStatus() {
         if (data.status === 'ok' && data.documents > 0) {
             statusDot.classList.add('online');
             statusText.textContent = `${data.documents} chunks loaded`;
+        } else if (data.status === 'starting') {
+            statusText.textContent = 'Loading...';
+            setTimeout(checkStatus, 2000);
         } else {
             statusText.textContent = 'No data loaded';
         }
@@ -135,34 +142,29 @@ function removeLoadingMessage() {
     if (loading) loading.remove();
 }
 
-function addAssistantMessage(response, sources) {
+function renderSources(sources) {
+    if (!sources || sources.length === 0) return '';
+    return `
+        <div class="sources-container">
+            <div class="sources-title">Kaynaklar</div>
+            <div class="source-chips">
+                ${sources.map(src => `
+                    <div class="source-chip">
+                        <img src="/static/images/${src.image}" 
+                             alt="${src.guest}"
+                             onerror="this.src='https://api.dicebear.com/7.x/initials/svg?seed=${encodeURIComponent(src.guest)}&backgroundColor=216e39'">
+                        <span class="source-episode">Bölüm ${src.episode}</span>
+                        <span class="source-guest">${src.guest}</span>
+                    </div>
+                `).join('')}
+            </div>
+        </div>
+    `;
+}
+
+function createAssistantMessage() {
     const messageDiv = document.createElement('div');
     messageDiv.className = 'message assistant-message';
-    
-    // Render markdown
-    const htmlContent = marked.parse(response);
-    
-    // Build sources HTML
-    let sourcesHtml = '';
-    if (sources && sources.length > 0) {
-        sourcesHtml = `
-            <div class="sources-container">
-                <div class="sources-title">Kaynaklar</div>
-                <div class="source-chips">
-                    ${sources.map(src => `
-                        <div class="source-chip">
-                            <img src="/static/images/${src.image}" 
-                                 alt="${src.guest}"
-                                 onerror="this.src='https://api.dicebear.com/7.x/initials/svg?seed=${encodeURIComponent(src.guest)}&backgroundColor=216e39'">
-                            <span class="source-episode">Bölüm ${src.episode}</span>
-                            <span class="source-guest">${src.guest}</span>
-                        </div>
-                    `).join('')}
-                </div>
-            </div>
-        `;
-    }
-    
     messageDiv.innerHTML = `
         <div class="message-avatar">
             <img src="/static/images/enes_fehmi_manan.jpg" 
@@ -170,13 +172,16 @@ function addAssistantMessage(response, sources) {
                  onerror="this.src='https://api.dicebear.com/7.x/bottts/svg?seed=datacommit'">
         </div>
         <div class="message-content">
-            ${htmlContent}
-            ${sourcesHtml}
+            <div class="message-body"></div>
+            <div class="message-sources"></div>
         </div>
     `;
-    
     chatMessages.appendChild(messageDiv);
     scrollToBottom();
+    return {
+        body: messageDiv.querySelector('.message-body'),
+        sources: messageDiv.querySelector('.message-sources')
+    };
 }
 
 function addErrorMessage(error) {
@@ -210,21 +215,7 @@ async function sendMessage() {
     addLoadingMessage();
     
     try {
-        const response = await fetch(`${API_BASE}/api/chat`, {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ query })
-        });
-        
-        removeLoadingMessage();
-        
-        if (!response.ok) {
-            throw new Error(`HTTP ${response.status}`);
-        }
-        
-        const data = await response.json();
-        addAssistantMessage(data.response, data.sources);
-        
+        await streamChat(query);
     } catch (error) {
         removeLoadingMessage();
         addErrorMessage(error.message);
@@ -232,6 +223,71 @@ async function sendMessage() {
     }
 }
 
+// Reads the text/event-stream body of /api/chat/stream: sources arrive first,
+// then tokens are appended and re-rendered as they come in.
+async function streamChat(query) {
+    const response = await fetch(`${API_BASE}/api/chat/stream`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json', 'Accept': 'text/event-stream' },
+        body: JSON.stringify({ query, session_id: sessionId })
+    });
+    
+    if (!response.ok) {
+        removeLoadingMessage();
+        throw new Error(`HTTP ${response.status}`);
+    }
+    
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let message = null;
+    let answer = '';
+    let sources = [];
+    
+    const ensureMessage = () => {
+        if (!message) {
+            removeLoadingMessage();
+            message = createAssistantMessage();
+        }
+        return message;
+    };
+    
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const rawEvent = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+            
+            let event = 'message';
+            let data = '';
+            for (const line of rawEvent.split('\n')) {
+                if (line.startsWith('event: ')) event = line.slice(7);
+                else if (line.startsWith('data: ')) data += line.slice(6);
+            }
+            const payload = data ? JSON.parse(data) : null;
+            
+            if (event === 'session') {
+                sessionId = payload.session_id;
+            } else if (event === 'sources') {
+                sources = payload;
+            } else if (event === 'token') {
+                answer += payload;
+                ensureMessage().body.innerHTML = marked.parse(answer);
+                scrollToBottom();
+            } else if (event === 'error') {
+                throw new Error(payload.error);
+            }
+        }
+    }
+    
+    ensureMessage().sources.innerHTML = renderSources(sources);
+    scrollToBottom();
+}
+
 function scrollToBottom() {
     chatMessages.scrollTop = chatMessages.scrollHeight;
 }
@@ -0,0 +1,133 @@
+import time
+import asyncio
+import threading
+import pytest
+import admission
+from admission import AdmissionController, Overloaded, DeadlineExceeded
+
+
+def acquire_in_thread(controller, client):
+    result = {}
+
+    def run():
+        try:
+            result["ticket"] = controller.acquire(client)
+        except Overloaded as e:
+            result["error"] = e
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread, result
+
+
+def wait_until(condition, timeout=2):
+    end = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < end, "condition not reached"
+        time.sleep(0.005)
+
+
+def test_queued_request_gets_the_freed_slot():
+    controller = AdmissionController(max_active=1, max_queue=1, queue_timeout=5)
+    first = controller.acquire("a")
+    thread, result = acquire_in_thread(controller, "b")
+    wait_until(lambda: controller.queued == 1)
+
+    controller.release(first)
+    thread.join(2)
+    assert "ticket" in result
+    assert (controller.active, controller.queued, controller.admitted) == (1, 0, 2)
+
+
+def test_full_queue_is_rejected_with_retry_after():
+    controller = AdmissionController(max_active=1, max_queue=0)
+    ticket = controller.acquire("a")
+    with pytest.raises(Overloaded) as excinfo:
+        controller.acquire("b")
+    assert excinfo.value.reason == "queue_full"
+    assert excinfo.value.retry_after >= 1
+    assert controller.rejected["queue_full"] == 1
+    controller.release(ticket)
+
+
+def test_queue_timeout():
+    controller = AdmissionController(max_active=1, max_queue=1, queue_timeout=0.05)
+    ticket = controller.acquire("a")
+    with pytest.raises(Overloaded) as excinfo:
+        controller.acquire("b")
+    assert excinfo.value.reason == "queue_timeout"
+    assert controller.queued == 0
+    controller.release(ticket)
+
+
+def test_client_over_its_cap_waits_instead_of_failing():
+    controller = AdmissionController(max_active=10, max_per_client=2, max_queue=10, queue_timeout=5)
+    tickets = [controller.acquire("proxy"), controller.acquire("proxy")]
+    thread, result = acquire_in_thread(controller, "proxy")
+    wait_until(lambda: controller.queued == 1)
+
+    # Other clients are not held up by the waiting one
+    other = controller.acquire("other")
+    assert controller.active == 3
+
+    controller.release(tickets[0])
+    thread.join(2)
+    assert "ticket" in result
+    for ticket in (tickets[1], other, result["ticket"]):
+        controller.release(ticket)
+    assert (controller.active, controller.queued) == (0, 0)
+
+
+def test_no_per_client_cap_by_default():
+    controller = AdmissionController(max_active=8)
+    tickets = [controller.acquire("proxy") for _ in range(8)]
+    assert controller.active == 8
+    for ticket in tickets:
+        controller.release(ticket)
+
+
+def test_async_cancelled_waiter_leaves_the_queue():
+    async def main():
+        controller = AdmissionController(max_active=1, max_queue=1, queue_timeout=5)
+        ticket = await controller.acquire_async("a")
+        waiter = asyncio.ensure_future(controller.acquire_async("b"))
+        await asyncio.sleep(0.01)
+        assert controller.queued == 1
+
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert controller.queued == 0
+
+        # The queue place is free again and the slot goes to the next caller
+        await controller.release_async(ticket)
+        async with controller.admit_async("c"):
+            assert controller.active == 1
+        assert controller.active == 0
+
+    asyncio.run(main())
+
+
+def test_async_per_client_cap_queues():
+    async def main():
+        controller = AdmissionController(max_active=4, max_per_client=1, queue_timeout=5)
+        ticket = await controller.acquire_async("a")
+        waiter = asyncio.ensure_future(controller.acquire_async("a"))
+        await asyncio.sleep(0.01)
+        assert not waiter.done()
+        await controller.release_async(ticket)
+        await controller.release_async(await asyncio.wait_for(waiter, 1))
+        assert (controller.active, controller.queued) == (0, 0)
+
+    asyncio.run(main())
+
+
+def test_stage_budget_follows_the_request_deadline():
+    assert admission.stage_budget("llm", 30) == 30
+    with admission.deadline(10):
+        assert admission.stage_budget("llm", 30) <= 10
+        assert admission.stage_budget("llm", 5) == 5
+    with admission.deadline(0.001):
+        time.sleep(0.01)
+        with pytest.raises(DeadlineExceeded):
+            admission.stage_budget("llm", 30)
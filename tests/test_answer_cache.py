@@ -0,0 +1,105 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from answer_cache import AnswerCache, normalize_query
+
+SOURCES = [{"episode": 1, "guest": "Konuk", "score": 0.9}]
+
+
+def test_normalize_query_folds_turkish_case_and_punctuation():
+    assert normalize_query("  İstanbul'da   NELER var? ") == normalize_query("istanbul da neler var")
+
+
+def test_get_put_and_scope():
+    cache = AnswerCache()
+    cache.put("Soru?", 5, "cevap", SOURCES)
+    assert cache.get("soru", 5) == ("cevap", SOURCES)
+    assert cache.get("soru", 3) is None
+    assert cache.get("soru", 5, scope="1,2") is None
+
+
+def test_near_duplicate_embedding_hit():
+    cache = AnswerCache(similarity_threshold=0.95)
+    cache.put("ilk soru", 5, "cevap", SOURCES, embedding=[1.0, 0.0])
+    assert cache.get("başka kelimeler", 5, embedding=[0.99, 0.05]) == ("cevap", SOURCES)
+    assert cache.get("başka kelimeler", 5, embedding=[0.0, 1.0]) is None
+    assert cache.stats()["near_hits"] == 1
+
+
+def test_set_index_version_drops_entries():
+    cache = AnswerCache(index_version="v1")
+    cache.put("soru", 5, "cevap", SOURCES)
+    cache.set_index_version("v1")
+    assert cache.get("soru", 5) is not None
+    cache.set_index_version("v2")
+    assert cache.get("soru", 5) is None
+
+
+def test_get_or_compute_runs_once_for_concurrent_callers():
+    cache = AnswerCache()
+    calls = []
+    release = threading.Event()
+
+    def compute():
+        calls.append(1)
+        release.wait(5)
+        return "cevap", SOURCES
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        futures = [pool.submit(cache.get_or_compute, "aynı soru", 5, compute) for _ in range(8)]
+        release.set()
+        results = [f.result(timeout=5) for f in futures]
+    assert len(calls) == 1
+    assert all(result == ("cevap", SOURCES) for result in results)
+
+
+def test_concurrent_puts_and_saves(tmp_path):
+    path = tmp_path / "answer_cache.json"
+    # Only the explicit saves below write the file; the background flush is not due yet
+    cache = AnswerCache(max_size=1000, persist_path=str(path), save_delay=60)
+
+    def writer(n):
+        for i in range(50):
+            cache.put(f"soru {n} {i}", 5, f"cevap {n} {i}", SOURCES)
+            if i % 10 == 0:
+                cache.save()
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    cache.save()
+
+    assert cache.stats()["size"] == 400
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+    reloaded = AnswerCache(max_size=1000, persist_path=str(path))
+    assert reloaded.stats()["size"] == 400
+    assert reloaded.get("soru 7 49", 5) == ("cevap 7 49", SOURCES)
+
+
+def test_load_ignores_other_index_version(tmp_path):
+    path = str(tmp_path / "answer_cache.json")
+    cache = AnswerCache(persist_path=path, index_version="v1")
+    cache.put("soru", 5, "cevap", SOURCES)
+    cache.save()
+    assert AnswerCache(persist_path=path, index_version="v1").get("soru", 5) == ("cevap", SOURCES)
+    assert AnswerCache(persist_path=path, index_version="v2").get("soru", 5) is None
+
+
+def test_unwritable_path_is_logged_not_raised(tmp_path, capsys):
+    cache = AnswerCache(persist_path=str(tmp_path / "missing" / "answer_cache.json"))
+    cache.put("soru", 5, "cevap", SOURCES)
+    cache.save()
+    assert "Could not save answer cache" in capsys.readouterr().out
+    cache.persist_path = None  # nothing left to flush at exit
+
+
+def test_failed_write_leaves_no_temp_file(tmp_path, capsys):
+    path = tmp_path / "answer_cache.json"
+    cache = AnswerCache(persist_path=str(path))
+    cache.put("soru", 5, object(), SOURCES)
+    cache.save()
+    assert "Could not save answer cache" in capsys.readouterr().out
+    assert os.listdir(tmp_path) == []
+    cache.persist_path = None
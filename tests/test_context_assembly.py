@@ -0,0 +1,58 @@
+import pytest
+
+pytest.importorskip("haystack")
+
+from haystack import Document
+from context_assembly import ContextAssembler, CHARS_PER_TOKEN, estimate_tokens
+
+TRANSCRIPT = " ".join(f"kelime{i}" for i in range(400))
+
+
+def chunk(doc_id, start, length, score, episode=1, source="ep1.txt"):
+    return Document(id=doc_id, content=TRANSCRIPT[start:start + length], score=score,
+                    meta={"episode": episode, "file_path": source, "split_idx_start": start})
+
+
+def test_overlapping_chunks_are_stitched_once():
+    first, second = chunk("a", 0, 300, 0.5), chunk("b", 200, 300, 0.9)
+    merged = ContextAssembler().merge([first, second])
+    assert len(merged) == 1
+    assert merged[0].content == TRANSCRIPT[0:500]
+    assert merged[0].meta["merged_ids"] == ["a", "b"]
+    assert merged[0].score == 0.9
+
+
+def test_disjoint_chunks_and_other_episodes_stay_apart():
+    docs = [chunk("a", 0, 100, 0.5), chunk("b", 500, 100, 0.6), chunk("c", 50, 100, 0.7, episode=2, source="ep2.txt")]
+    merged = ContextAssembler().merge(docs)
+    assert sorted(doc.id for doc in merged) == ["a", "b", "c"]
+
+
+def test_chunks_without_offsets_pass_through():
+    doc = Document(id="x", content="serbest metin", score=0.4, meta={"episode": 1})
+    assert ContextAssembler().merge([doc, doc]) == [doc]
+
+
+def test_pack_keeps_score_order_and_budget():
+    docs = [chunk("low", 0, 400, 0.1), chunk("high", 1000, 400, 0.9), chunk("mid", 2000, 400, 0.5)]
+    budget = estimate_tokens(docs[1].content) + estimate_tokens(docs[2].content)
+    packed = ContextAssembler(token_budget=budget, min_tail_tokens=1).pack(docs)
+    assert [doc.id for doc in packed] == ["high", "mid"]
+
+
+def test_pack_truncates_the_tail_on_a_word_boundary():
+    docs = [chunk("high", 0, 400, 0.9), chunk("tail", 1000, 2000, 0.5)]
+    budget = estimate_tokens(docs[0].content) + 100
+    packed = ContextAssembler(token_budget=budget, min_tail_tokens=50).pack(docs)
+    assert [doc.id for doc in packed] == ["high", "tail"]
+    tail = packed[1].content
+    assert len(tail) <= 100 * CHARS_PER_TOKEN
+    assert docs[1].content.startswith(tail) and docs[1].content[len(tail)] == " "
+
+
+def test_run_merges_before_packing():
+    docs = [chunk("a", 0, 300, 0.5), chunk("b", 200, 300, 0.9), chunk("c", 1500, 300, 0.2)]
+    budget = estimate_tokens(TRANSCRIPT[0:500])
+    documents = ContextAssembler(token_budget=budget, min_tail_tokens=1).run(documents=docs)["documents"]
+    assert len(documents) == 1
+    assert documents[0].meta["merged_ids"] == ["a", "b"]
@@ -0,0 +1,190 @@
+import time
+import asyncio
+import pytest
+
+pytest.importorskip("haystack")
+pytest.importorskip("google.genai")
+
+import admission
+import metrics
+from rag_pipeline import GeminiGenerator
+from benchmark.fake_llm import FakeAPIError, FakeGenaiClient
+
+SYSTEM_PROMPT = "Sen yardımcı bir asistansın ve kaynak gösterirsin"
+
+
+def generator(client, **kwargs):
+    return GeminiGenerator(system_prompt=SYSTEM_PROMPT, client=client, **kwargs)
+
+
+def deadline_count():
+    return metrics._counters.get(("deadline_exceeded_total", 'stage="llm"'), 0)
+
+
+def test_cached_prefix_is_referenced_by_name():
+    client = FakeGenaiClient()
+    llm = generator(client, cache_prefix=True)
+    assert llm.run(parts="soru")["replies"] == ["cevap"]
+    assert llm.run(parts="soru")["replies"] == ["cevap"]
+    assert client.caches_created == 1
+    assert [config.cached_content for config in client.requests] == ["cachedContents/1"] * 2
+    assert all(config.system_instruction is None for config in client.requests)
+
+
+def test_refused_cache_falls_back_inline_for_good(monkeypatch):
+    client = FakeGenaiClient(min_cache_tokens=10 ** 6)
+    llm = generator(client, cache_prefix=True, retry_after=0)
+    attempts = []
+    create = client.caches.create
+    monkeypatch.setattr(client.caches, "create", lambda **kw: attempts.append(1) or create(**kw))
+
+    for _ in range(3):
+        assert llm.run(parts="soru")["replies"] == ["cevap"]
+    assert len(attempts) == 1
+    assert llm.cache_fallbacks == 1
+    assert all(config.cached_content is None and config.system_instruction == SYSTEM_PROMPT
+               for config in client.requests)
+
+
+def test_expired_cache_is_retried_inline():
+    client = FakeGenaiClient()
+    llm = generator(client, cache_prefix=True)
+    llm.run(parts="soru")
+    client.cached.clear()  # deleted or expired on the server before the local refresh
+
+    assert llm.run(parts="soru")["replies"] == ["cevap"]
+    expired, retried = client.requests[-2:]
+    assert expired.cached_content == "cachedContents/1"
+    assert retried.cached_content is None and retried.system_instruction == SYSTEM_PROMPT
+    assert llm.cache_fallbacks == 1
+
+
+def test_transient_errors_are_retried():
+    client = FakeGenaiClient()
+    client.failures = [FakeAPIError(503, "unavailable"), FakeAPIError(429, "rate limited")]
+    llm = generator(client, retries=2, backoff=0.01)
+    assert llm.run(parts="soru")["replies"] == ["cevap"]
+    assert len(client.requests) == 3
+
+
+def test_client_errors_are_not_retried():
+    client = FakeGenaiClient()
+    client.failures = [FakeAPIError(400, "bad request")]
+    llm = generator(client, retries=2, backoff=0.01)
+    with pytest.raises(FakeAPIError):
+        llm.run(parts="soru")
+    assert len(client.requests) == 1
+
+
+def test_retries_stop_at_the_request_deadline():
+    client = FakeGenaiClient()
+    client.failures = [FakeAPIError(503, "unavailable")] * 20
+    llm = generator(client, retries=20, backoff=0.1)
+    started = time.monotonic()
+    with admission.deadline(0.5):
+        with pytest.raises(FakeAPIError):
+            llm.run(parts="soru")
+    assert time.monotonic() - started < 0.5
+    assert len(client.requests) < 20
+
+
+def test_spent_deadline_is_counted_once():
+    client = FakeGenaiClient()
+    llm = generator(client, retries=2)
+    before = deadline_count()
+    with admission.deadline(0.001):
+        time.sleep(0.01)
+        with pytest.raises(admission.DeadlineExceeded):
+            llm.run(parts="soru")
+    assert client.requests == []
+    if metrics.METRICS_ENABLED:
+        assert deadline_count() == before + 1
+
+
+def slow_primary(client, monkeypatch, primary_seconds, calls):
+    generate = client.models.generate_content
+
+    def generate_content(model, contents, config=None):
+        calls.append(model)
+        if model == "primary":
+            time.sleep(primary_seconds)
+        return generate(model=model, contents=contents, config=config)
+
+    monkeypatch.setattr(client.models, "generate_content", generate_content)
+
+
+def test_hedge_fires_and_wins(monkeypatch):
+    client, calls = FakeGenaiClient(), []
+    slow_primary(client, monkeypatch, 1.0, calls)
+    llm = generator(client, model="primary", fallback_model="fallback", hedge=True, hedge_delay=0.05, timeout=5)
+
+    started = time.monotonic()
+    assert llm.run(parts="soru")["replies"] == ["cevap"]
+    assert time.monotonic() - started < 0.5
+    assert calls == ["primary", "fallback"]
+    assert (llm.hedges, llm.hedge_wins) == (1, 1)
+
+
+def test_fast_primary_is_not_hedged(monkeypatch):
+    client, calls = FakeGenaiClient(), []
+    slow_primary(client, monkeypatch, 0, calls)
+    llm = generator(client, model="primary", fallback_model="fallback", hedge=True, hedge_delay=0.5, timeout=5)
+    llm.run(parts="soru")
+    assert calls == ["primary"]
+    assert llm.hedges == 0
+
+
+def test_no_hedge_during_warm_up_without_a_timeout():
+    llm = generator(FakeGenaiClient(), hedge=True)
+    assert llm.current_hedge_delay() == float("inf")
+    assert generator(FakeGenaiClient(), hedge=True, timeout=30).current_hedge_delay() == 15
+
+
+def test_only_full_replies_are_sampled():
+    llm = generator(FakeGenaiClient(), hedge_min_samples=1, hedge_min_delay=0)
+    assert "".join(llm.stream(parts="soru")) == "cevap "
+    assert len(llm._latencies) == 0
+    llm.run(parts="soru")
+    assert len(llm._latencies) == 1
+
+
+def test_losing_async_call_is_cancelled(monkeypatch):
+    client = FakeGenaiClient()
+    generate = client.aio.models.generate_content
+    cancelled = []
+
+    async def generate_content(model, contents, config=None):
+        if model == "primary":
+            try:
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                cancelled.append(model)
+                raise
+        return await generate(model=model, contents=contents, config=config)
+
+    monkeypatch.setattr(client.aio.models, "generate_content", generate_content)
+    llm = generator(client, model="primary", fallback_model="fallback", hedge=True, hedge_delay=0.05, timeout=10)
+
+    async def main():
+        started = time.monotonic()
+        result = await llm.run_async(parts="soru")
+        elapsed = time.monotonic() - started
+        await asyncio.sleep(0.01)
+        return result, elapsed
+
+    result, elapsed = asyncio.run(main())
+    assert result["replies"] == ["cevap"]
+    assert elapsed < 1
+    assert cancelled == ["primary"]
+    assert (llm.hedges, llm.hedge_wins) == (1, 1)
+
+
+def test_async_stream_reuses_the_cached_prefix():
+    client = FakeGenaiClient(reply="bir iki üç dört", chunks=2)
+    llm = generator(client, cache_prefix=True)
+
+    async def collect():
+        return [token async for token in llm.stream_async(parts="soru")]
+
+    assert asyncio.run(collect()) == ["bir iki ", "üç dört "]
+    assert client.requests[0].cached_content == "cachedContents/1"
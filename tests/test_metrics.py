@@ -0,0 +1,16 @@
+import pytest
+import metrics
+
+
+@pytest.mark.skipif(not metrics.METRICS_ENABLED, reason="METRICS_ENABLED=0")
+def test_large_counters_keep_full_precision():
+    metrics.inc("test_precision_total", 1234567, kind="input")
+    metrics.inc("test_precision_total", 1, kind="input")
+    assert 'datacommit_test_precision_total{kind="input"} 1234568.0' in metrics.render_prometheus()
+
+
+def test_format_value():
+    assert metrics._format_value(12345678) == "12345678"
+    assert metrics._format_value(0.1 + 0.2) == "0.30000000000000004"
+    assert metrics._format_value(float("inf")) == "+Inf"
+    assert metrics._format_value(float("nan")) == "NaN"
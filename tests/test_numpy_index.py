@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("haystack")
+
+from haystack import Document
+from numpy_index import NumpyIndex, QUANTIZATION_MODES, evaluate_quantization
+
+
+def make_corpus(n=300, dim=32, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(n, dim)).astype(np.float32)
+    docs = [Document(id=f"doc{i}", content=f"parça {i}", meta={"episode": i % 5 + 1, "guest": f"Konuk {i % 5 + 1}"})
+            for i in range(n)]
+    return docs, {doc.id: vectors[i].tolist() for i, doc in enumerate(docs)}, vectors
+
+
+def test_exact_search_ranks_by_cosine():
+    docs, embeddings, vectors = make_corpus()
+    index = NumpyIndex.build(docs, embeddings)
+    results = index.search(vectors[42] * 3, top_k=3)
+    assert results[0].id == "doc42"
+    assert results[0].score == pytest.approx(1.0, abs=1e-5)
+    assert [r.score for r in results] == sorted((r.score for r in results), reverse=True)
+
+
+def test_filters_restrict_rows():
+    docs, embeddings, vectors = make_corpus()
+    index = NumpyIndex.build(docs, embeddings)
+    filters = {"operator": "AND", "conditions": [{"field": "meta.episode", "operator": "in", "value": [2, 3]}]}
+    results = index.search(vectors[0], top_k=10, filters=filters)
+    assert len(results) == 10
+    assert {r.meta["episode"] for r in results} <= {2, 3}
+    with pytest.raises(ValueError):
+        index.search(vectors[0], filters={"field": "meta.year", "operator": "==", "value": 2024})
+
+
+def test_search_batch_matches_search():
+    docs, embeddings, vectors = make_corpus()
+    index = NumpyIndex.build(docs, embeddings)
+    batch = index.search_batch(vectors[:5], top_k=4)
+    assert [[d.id for d in docs] for docs in batch] == [[d.id for d in index.search(v, top_k=4)] for v in vectors[:5]]
+
+
+@pytest.mark.parametrize("mode", QUANTIZATION_MODES)
+def test_save_and_load_round_trip(tmp_path, mode):
+    docs, embeddings, vectors = make_corpus()
+    index = NumpyIndex.build(docs, embeddings, version="v1", quantization=mode)
+    index.save(str(tmp_path))
+    assert NumpyIndex.exists(str(tmp_path))
+
+    loaded = NumpyIndex.load(str(tmp_path))
+    assert (loaded.version, loaded.quantization, len(loaded)) == ("v1", mode, len(docs))
+    assert loaded.metas[7] == docs[7].meta
+    assert [d.id for d in loaded.search(vectors[7], top_k=5)] == [d.id for d in index.search(vectors[7], top_k=5)]
+
+
+def test_save_drops_codes_of_a_previous_mode(tmp_path):
+    docs, embeddings, _ = make_corpus()
+    NumpyIndex.build(docs, embeddings, quantization="int8").save(str(tmp_path))
+    NumpyIndex.build(docs, embeddings).save(str(tmp_path))
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["meta.json", "vectors.npy"]
+
+
+@pytest.mark.parametrize("mode", ["int8", "binary"])
+def test_quantized_search_rescored_with_float_vectors(mode):
+    docs, embeddings, vectors = make_corpus()
+    exact = NumpyIndex.build(docs, embeddings)
+    quantized = exact.quantized(mode)
+    assert quantized.resident_bytes() < exact.resident_bytes()
+
+    results = quantized.search(vectors[11], top_k=5)
+    assert results[0].id == "doc11"
+    # Final scores are exact cosines from the float matrix, not code approximations
+    expected = {d.id: d.score for d in exact.search(vectors[11], top_k=len(docs))}
+    for doc in results:
+        assert doc.score == pytest.approx(expected[doc.id], abs=1e-5)
+
+
+def test_evaluate_quantization_reports_recall():
+    docs, embeddings, vectors = make_corpus()
+    index = NumpyIndex.build(docs, embeddings)
+    queries = vectors[:20] + np.random.default_rng(1).normal(scale=0.05, size=vectors[:20].shape)
+    report = evaluate_quantization(index, queries, top_k=5)
+    assert report["none"]["recall"] == 1.0
+    assert report["int8"]["recall"] >= 0.9
+    assert set(report) == {"none", "int8", "binary"}
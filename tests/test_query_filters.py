@@ -0,0 +1,37 @@
+import pytest
+
+pytest.importorskip("haystack_integrations")
+
+from query_filters import build_filters, detect_episodes, resolve_episodes
+
+
+@pytest.mark.parametrize("query, episodes", [
+    ("Alara'nın önerdiği kaynaklar neler?", [3]),
+    ("Olgun Aydın veri bilimine nasıl başladı?", [4]),
+    ("Eren Akbaba ve Murat Şahin ne dedi?", [5, 7]),
+    ("3. bölümde neler konuşuldu?", [3]),
+])
+def test_detects_guests_and_episode_mentions(query, episodes):
+    assert detect_episodes(query) == episodes
+
+
+@pytest.mark.parametrize("query", [
+    "Aydın'da veri bilimi işi var mı?",
+    "Olgun bir veri ekibi nasıl kurulur?",
+    "Şahin gibi keskin bir analist olmak için ne gerekir?",
+    "Akbaba yatırımcılar girişimlere nasıl bakar?",
+    "Eren'in kariyer tavsiyesi ne olurdu?",
+])
+def test_common_words_do_not_restrict_retrieval(query):
+    assert detect_episodes(query) is None
+
+
+def test_explicit_guest_accepts_a_single_name():
+    assert resolve_episodes("herhangi bir soru", guests=["Aydın"]) == [4]
+    with pytest.raises(ValueError):
+        resolve_episodes("soru", episodes=[99])
+
+
+def test_build_filters():
+    assert build_filters(None) is None
+    assert build_filters([1, 2]) == {"field": "meta.episode", "operator": "in", "value": [1, 2]}
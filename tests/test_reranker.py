@@ -0,0 +1,63 @@
+import time
+import pytest
+
+pytest.importorskip("haystack")
+
+from haystack import Document
+from reranker import CrossEncoderReranker
+
+
+class FakeEncoder:
+    """Scores a pair by the length of its text; each pair costs `pair_seconds`."""
+
+    def __init__(self, pair_seconds):
+        self.pair_seconds = pair_seconds
+        self.batches = []
+
+    def predict(self, pairs, batch_size=None, show_progress_bar=False):
+        self.batches.append(len(pairs))
+        time.sleep(self.pair_seconds * len(pairs))
+        return [float(len(text)) for _, text in pairs]
+
+
+def make_reranker(pair_seconds, budget_ms, batch_size=4):
+    reranker = CrossEncoderReranker(model="fake", top_k=2, batch_size=batch_size, time_budget_ms=budget_ms)
+    reranker._encoder = FakeEncoder(pair_seconds)
+    return reranker
+
+
+DOCS = [Document(id=str(i), content="x" * (i + 1)) for i in range(6)]
+
+
+def test_warm_up_times_a_full_batch():
+    reranker = make_reranker(0.005, 1000)
+    reranker.warm_up()
+    assert reranker._encoder.batches == [4]
+    assert reranker._pair_seconds == pytest.approx(0.005, rel=0.5)
+
+
+def test_reranks_within_budget():
+    reranker = make_reranker(0.001, 1000)
+    documents = reranker.run(query="soru", documents=DOCS)["documents"]
+    assert [doc.id for doc in documents] == ["5", "4"]
+    assert reranker.reranked == 1
+
+
+def test_batches_are_cut_to_the_remaining_budget():
+    reranker = make_reranker(0.02, 100, batch_size=8)
+    reranker.warm_up()
+    reranker._encoder.batches.clear()
+    documents = reranker.run(query="soru", documents=DOCS)["documents"]
+    # About four pairs fit in 100ms; the rest does not, so retriever order is kept
+    assert max(reranker._encoder.batches) < 8
+    assert [doc.id for doc in documents] == ["0", "1"]
+    assert reranker.fallbacks == 1
+
+
+def test_gives_up_without_scoring_when_nothing_fits():
+    reranker = make_reranker(0.05, 10)
+    reranker.warm_up()
+    reranker._encoder.batches.clear()
+    documents = reranker.run(query="soru", documents=DOCS)["documents"]
+    assert reranker._encoder.batches == []
+    assert [doc.id for doc in documents] == ["0", "1"]
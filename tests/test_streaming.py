@@ -0,0 +1,66 @@
+import json
+import pytest
+
+pytest.importorskip("haystack")
+
+from haystack import Document
+import rag_pipeline
+from answer_cache import AnswerCache
+from benchmark.fake_llm import FakeGeminiGenerator
+
+QUERY = "Yapay zeka projelerinde en sık yapılan hata ne?"
+DOCS = [Document(id="a", content="birinci parça", meta={"episode": 1, "guest": "Konuk"}, score=0.9),
+        Document(id="b", content="ikinci parça", meta={"episode": 1, "guest": "Konuk"}, score=0.8)]
+
+
+@pytest.fixture
+def fake_pipeline(monkeypatch):
+    """Replaces the indexes and the model with local stand-ins; generation uses FakeGeminiGenerator."""
+    llm = FakeGeminiGenerator(latency_ms=0, per_token_ms=0, tokens=5)
+    monkeypatch.setattr(rag_pipeline, "_ready", True)
+    monkeypatch.setattr(rag_pipeline, "generator", llm)
+    monkeypatch.setattr(rag_pipeline, "answer_cache", AnswerCache())
+    monkeypatch.setattr(rag_pipeline, "sync_index_version", lambda: None)
+    monkeypatch.setattr(rag_pipeline, "embed_query", lambda query: [1.0, 0.0])
+    monkeypatch.setattr(rag_pipeline, "retrieve", lambda query, top_k=5, embedding=None, filters=None: DOCS)
+    monkeypatch.setattr(rag_pipeline, "assemble_context", lambda docs: docs)
+    monkeypatch.setattr(rag_pipeline, "build_prompt", lambda query, context, history=None: query)
+    return llm
+
+
+def test_sources_come_before_tokens(fake_pipeline):
+    events = list(rag_pipeline.stream_with_sources(QUERY))
+    assert events[0] == ("sources", [{"episode": 1, "guest": "Konuk", "score": 0.9}])
+    assert [kind for kind, _ in events[1:]] == ["token"] * 5
+    assert "".join(token for _, token in events[1:]) == fake_pipeline.run(QUERY)["replies"][0]
+
+
+def test_cached_answer_is_streamed_as_one_token(fake_pipeline):
+    first = list(rag_pipeline.stream_with_sources(QUERY))
+    second = list(rag_pipeline.stream_with_sources(QUERY))
+    assert second == [first[0], ("token", "".join(token for _, token in first[1:]))]
+    assert fake_pipeline.calls == 1
+
+
+def parse_sse(body):
+    events = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+def test_chat_stream_event_order(fake_pipeline, monkeypatch):
+    pytest.importorskip("flask")
+    import app
+
+    monkeypatch.setattr(app, "attach_images", lambda sources: sources)
+    response = app.app.test_client().post("/api/chat/stream", json={"query": QUERY, "episode": 1})
+    assert response.mimetype == "text/event-stream"
+    events = parse_sse(response.get_data(as_text=True))
+
+    kinds = [kind for kind, _ in events]
+    assert kinds == ["filters", "sources"] + ["token"] * 5 + ["done"]
+    assert events[0][1] == {"episodes": [1]}
+    response.close()  # the WSGI server's close() releases the admission slot
+    assert rag_pipeline.chat_admission.active == 0